@@ -1,15 +1,542 @@
+from contextlib import ExitStack
 from datetime import datetime
+from functools import reduce
 from urllib.parse import unquote
 import logging
+import os
+import random
+import time
+import uuid
 
-from flask import Flask, request, jsonify
+import numpy as np
+from flask import Flask, Response, g, request, jsonify, url_for
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.datastructures import MultiDict
 
-from modules.data_processing.data_loader import load_and_process_data
+from modules.data_processing.data_loader import (
+    check_engine_options,
+    current_dataset_generation,
+    latest_event_day,
+    load_and_process_all_data,
+    load_and_process_data,
+    load_and_process_range,
+    load_and_process_segmented_data,
+    load_and_process_window_sensitivity,
+    load_latency_sketches,
+    load_range_sketches,
+)
+from modules.data_processing.data_processor import resolve_time_windows
+from modules.data_processing.latency import LATENCY_KEYS, summarize_latency
 from modules.ab_testing.ab_test_manager import ABTestManager
-from modules.utils.utils import convert_to_serializable
+from modules.ab_testing.contamination import ContaminationIndex
+from modules.ab_testing.portfolio_health import PortfolioHealthChecker
+from modules.ab_testing.segmented_analyzer import (
+    SEGMENT_COLUMNS,
+    SegmentedABTestAnalyzer,
+)
+from modules.ab_testing.variant_aggregates import VariantAggregates
+from modules.serving.admission import AdmissionController, AdmissionRejectedError
+from modules.serving.analysis_cache import LRUCache
+from modules.serving.jobs import AnalysisJobManager, JobQueueFullError
+from modules.serving.result_store import ResultStore
+from modules.utils.logging_setup import configure_logging, current_request_id
+from modules.utils.profiling import profile_request, record_stages, stage
+from modules.utils.utils import (
+    dumps_json,
+    json_default,
+    parse_time_windows,
+    records_without_nan,
+    without_nan,
+)
 
 
-def create_ab_test_api():
+class ABTestJSONProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON de Flask que serializa tipos de NumPy, tuplas y NaN sin
+    recorrer recursivamente la respuesta antes de jsonify.
+    """
+
+    @staticmethod
+    def default(o):
+        try:
+            return json_default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return dumps_json(obj, default=self.default, **kwargs)
+
+
+def summarize_experiment(experiment_data, checks, results):
+    """
+    Construye el resumen de un experimento a partir de los datos procesados
+    y los resultados del análisis.
+
+    Args:
+        experiment_data (pd.DataFrame): Datos procesados del experimento.
+        checks (dict): Resultados de las verificaciones.
+        results (dict): Resultados de las pruebas estadísticas.
+
+    Returns:
+        dict: Resumen con participantes, checks, pruebas, ganador y variantes.
+    """
+    variants = experiment_data.groupby("variant_id", sort=False).agg(
+        number_of_purchases=("with_purchase", "sum")
+    )
+    return {
+        "number_of_participants": experiment_data["user_id"].nunique(),
+        "checks": checks,
+        "statistical_tests": without_nan(
+            {
+                k: int(v) if isinstance(v, bool) else v
+                for k, v in (results["tests"] or {}).items()
+            }
+        ),
+        "winner": results["winner"],
+        "variants": [
+            {"id": variant, "number_of_purchases": number_of_purchases}
+            for variant, number_of_purchases in zip(
+                variants.index.tolist(), variants["number_of_purchases"].tolist()
+            )
+        ],
+    }
+
+
+def scale_sampled_summary(summary, sample_rate, z=1.96):
+    """
+    Ajusta el resumen de un análisis calculado sobre una muestra de usuarios:
+    escala los conteos a la población y agrega su intervalo. Cada usuario está
+    en la muestra con probabilidad sample_rate, por lo que un conteo muestral n
+    estima n / sample_rate con error estándar sqrt(n * (1 - sample_rate)) / sample_rate.
+    Las pruebas estadísticas ya usan el tamaño de la muestra, por lo que sus
+    intervalos son más anchos que los del análisis completo.
+
+    Args:
+        summary (dict): Resumen obtenido con summarize_experiment.
+        sample_rate (float): Fracción de usuarios de la muestra.
+        z (float, opcional): Cuantil normal del intervalo (1.96 para 95%).
+
+    Returns:
+        dict: Resumen con los conteos escalados, sampled y sample.
+    """
+
+    def estimate(count):
+        center = count / sample_rate
+        margin = z * np.sqrt(count * (1 - sample_rate)) / sample_rate
+        return {
+            "sampled": count,
+            "estimate": center,
+            "lower": max(center - margin, float(count)),
+            "upper": center + margin,
+        }
+
+    participants = estimate(summary["number_of_participants"])
+    purchases = [
+        estimate(variant["number_of_purchases"]) for variant in summary["variants"]
+    ]
+    summary["sampled"] = True
+    summary["number_of_participants"] = int(round(participants["estimate"]))
+    summary["variants"] = [
+        {"id": variant["id"], "number_of_purchases": int(round(estimate["estimate"]))}
+        for variant, estimate in zip(summary["variants"], purchases)
+    ]
+    summary["sample"] = {
+        "rate": sample_rate,
+        "participants": participants,
+        "variants": [
+            {"id": variant["id"], "purchases": estimate}
+            for variant, estimate in zip(summary["variants"], purchases)
+        ],
+    }
+    return summary
+
+
+def summarize_sketches(sketches):
+    """
+    Construye el resumen aproximado de un experimento a partir de los sketches
+    HyperLogLog de participantes y compradores de cada variante.
+
+    Args:
+        sketches (dict): Por variante, los HyperLogLog participants y converters.
+
+    Returns:
+        dict: Participantes y, por variante, participantes, compradores y tasa de
+        conversión estimados con su intervalo del 95%.
+    """
+    participants = reduce(
+        lambda left, right: left.merge(right),
+        (variant["participants"] for variant in sketches.values()),
+    )
+    variants = []
+    for variant, variant_sketches in sketches.items():
+        variant_participants = variant_sketches["participants"].estimate()
+        converters = variant_sketches["converters"].estimate()
+        rate = (
+            converters["estimate"] / variant_participants["estimate"]
+            if variant_participants["estimate"]
+            else None
+        )
+        variants.append(
+            {
+                "id": variant,
+                "participants": variant_participants,
+                "converters": converters,
+                "conversion_rate": {
+                    "estimate": rate,
+                    "lower": (
+                        converters["lower"] / variant_participants["upper"]
+                        if rate is not None
+                        else None
+                    ),
+                    "upper": (
+                        min(converters["upper"] / variant_participants["lower"], 1.0)
+                        if rate is not None and variant_participants["lower"]
+                        else None
+                    ),
+                },
+            }
+        )
+    return {
+        "mode": "approx",
+        "number_of_participants": participants.estimate(),
+        "variants": variants,
+    }
+
+
+def parse_result_options(args):
+    """
+    Lee y valida los parámetros opcionales del análisis de un experimento.
+
+    Args:
+        args (MultiDict): Parámetros de la solicitud (query string o cuerpo JSON).
+
+    Returns:
+        dict: Opciones time_windows, sensitivity_windows, segment_by, contamination,
+        date_range (días from y to en formato YYYY-MM-DD, o None), mode,
+        sample_rate (fracción de usuarios, o None para usar todos) y
+        exclude_variants (variantes excluidas, ordenadas).
+
+    Raises:
+        ValueError: Si las ventanas de atribución, los segmentos, el rango de
+        fechas, el modo, la muestra o las variantes excluidas no son válidos, o
+        si el motor de procesamiento no soporta los segmentos o las ventanas.
+    """
+    try:
+        time_windows = args.get("time_windows")
+        time_windows = parse_time_windows(time_windows) if time_windows else None
+        sensitivity_windows = [
+            parse_time_windows(value) for value in args.getlist("sensitivity_windows")
+        ]
+    except ValueError:
+        raise ValueError("Invalid time windows, expected EVENT:MINUTES,...")
+
+    segment_by = [segment for segment in args.get("segment_by", "").split(",") if segment]
+    if any(segment not in SEGMENT_COLUMNS for segment in segment_by):
+        raise ValueError(
+            "Invalid segment_by, expected any of " + ", ".join(SEGMENT_COLUMNS)
+        )
+    check_engine_options(segment_by, sensitivity_windows)
+
+    date_range = None
+    if args.get("from") or args.get("to"):
+        try:
+            start = datetime.strptime(args.get("from", ""), "%Y-%m-%d")
+            end = datetime.strptime(args.get("to") or args.get("from"), "%Y-%m-%d")
+        except ValueError:
+            raise ValueError("Invalid date range, expected from=YYYY-MM-DD&to=YYYY-MM-DD")
+        if end < start:
+            raise ValueError("Invalid date range, from must not be after to")
+        if segment_by or sensitivity_windows:
+            raise ValueError(
+                "Date ranges do not support segment_by or sensitivity_windows"
+            )
+        date_range = [f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}"]
+
+    contamination = str(args.get("contamination", "")).lower() in ("1", "true", "yes")
+    mode = args.get("mode", "exact")
+    if mode not in ("exact", "approx", "sensitivity"):
+        raise ValueError("Invalid mode, expected exact, approx or sensitivity")
+    if mode == "approx" and (segment_by or sensitivity_windows or contamination):
+        raise ValueError(
+            "Approximate mode does not support segment_by, sensitivity_windows "
+            "or contamination"
+        )
+
+    sample_rate = None
+    if args.get("sample"):
+        try:
+            sample_rate = float(args["sample"])
+        except ValueError:
+            sample_rate = 0.0
+        if not 0 < sample_rate <= 1:
+            raise ValueError("Invalid sample, expected a fraction between 0 and 1")
+        if sample_rate == 1:
+            sample_rate = None
+        elif mode == "approx" or date_range:
+            raise ValueError(
+                "Sampling does not support approximate mode or date ranges"
+            )
+
+    exclude_variants = sorted(
+        {variant for variant in args.get("exclude_variants", "").split(",") if variant}
+    )
+    if mode == "sensitivity" and not exclude_variants:
+        raise ValueError("Sensitivity mode requires exclude_variants")
+    if exclude_variants and (
+        mode == "approx" or segment_by or sensitivity_windows or contamination
+    ):
+        raise ValueError(
+            "exclude_variants does not support approximate mode, segment_by, "
+            "sensitivity_windows or contamination"
+        )
+
+    return {
+        "time_windows": time_windows,
+        "sensitivity_windows": sensitivity_windows,
+        "segment_by": segment_by,
+        "contamination": contamination,
+        "date_range": date_range,
+        "mode": mode,
+        "sample_rate": sample_rate,
+        "exclude_variants": exclude_variants,
+    }
+
+
+def variant_exclusion_result(id, date, options, analysis_cache=None):
+    """
+    Calcula los resultados sin las variantes de exclude_variants (y, en modo
+    sensitivity, también con todas las variantes) a partir de los agregados por
+    variante del experimento, que se construyen una vez por combinación de
+    experimento, día, ventanas y muestra y se guardan en analysis_cache junto
+    con cada análisis calculado.
+
+    Args:
+        id (str): Identificador del experimento.
+        date (datetime): Día solicitado, o None si se indicó date_range.
+        options (dict): Opciones obtenidas con parse_result_options.
+        analysis_cache (LRUCache, opcional): Caché de agregados y análisis. Por
+        defecto no se reutilizan entre solicitudes.
+
+    Returns:
+        tuple: Diccionario de respuesta y código de estado HTTP.
+    """
+    analysis_cache = analysis_cache or LRUCache(max_entries=4)
+    sample_rate = options["sample_rate"]
+    base_key = aggregates_key(id, date, options)
+
+    def build_aggregates():
+        if options["date_range"]:
+            start, end = (
+                datetime.strptime(day, "%Y-%m-%d") for day in options["date_range"]
+            )
+            experiment_data = load_and_process_range(
+                id, start, end, time_windows=options["time_windows"]
+            )
+        else:
+            experiment_data = load_and_process_data(
+                id, date, time_windows=options["time_windows"], sample_rate=sample_rate
+            )
+        if experiment_data.empty:
+            return None
+        with stage("variant_aggregates"):
+            return VariantAggregates.from_data(experiment_data)
+
+    aggregates = analysis_cache.get_or_compute(("aggregates", base_key), build_aggregates)
+    if aggregates is None:
+        return {"error": "Experiment not found"}, 404
+
+    def analyze(excluded):
+        def compute():
+            reduced = aggregates.exclude(excluded)
+            if not reduced.variants:
+                return None
+            with stage("run_analysis"):
+                summary = reduced.summary(*reduced.run_analysis())
+            if sample_rate:
+                summary = scale_sampled_summary(summary, sample_rate)
+            return summary
+
+        summary = analysis_cache.get_or_compute(
+            ("summary", base_key, tuple(excluded)), compute
+        )
+        return summary and {"excluded_variants": list(excluded), **summary}
+
+    excluded = analyze(options["exclude_variants"])
+    if not excluded:
+        return {"error": "exclude_variants removes every variant"}, 400
+    if options["mode"] == "sensitivity":
+        return {"results": {id: {"variant_sensitivity": [analyze([]), excluded]}}}, 200
+    return {"results": {id: excluded}}, 200
+
+
+def compute_experiment_result(id, date, options, analysis_cache=None):
+    """
+    Calcula la respuesta del análisis de un experimento. Se usa tanto en el
+    endpoint síncrono como en los trabajos de análisis en segundo plano.
+
+    Args:
+        id (str): Identificador del experimento.
+        date (datetime): Día solicitado, o None si se indicó date_range.
+        options (dict): Opciones obtenidas con parse_result_options.
+        analysis_cache (LRUCache, opcional): Caché de agregados por variante
+        para las solicitudes con exclude_variants.
+
+    Returns:
+        tuple: Diccionario de respuesta y código de estado HTTP.
+    """
+    time_windows = options["time_windows"]
+    sensitivity_windows = options["sensitivity_windows"]
+    segment_by = options["segment_by"]
+    sample_rate = options["sample_rate"]
+
+    def summarize(experiment_data, checks, results):
+        summary = summarize_experiment(experiment_data, checks, results)
+        if sample_rate:
+            return scale_sampled_summary(summary, sample_rate)
+        return summary
+
+    if options["mode"] == "approx":
+        start, end = (
+            (datetime.strptime(day, "%Y-%m-%d") for day in options["date_range"])
+            if options["date_range"]
+            else (date, date)
+        )
+        sketches = load_range_sketches(id, start, end, time_windows=time_windows)
+        if not sketches:
+            return {"error": "Experiment not found"}, 404
+        return {"results": {id: summarize_sketches(sketches)}}, 200
+
+    if options["exclude_variants"]:
+        return variant_exclusion_result(id, date, options, analysis_cache)
+
+    if sensitivity_windows:
+        labeled_data = load_and_process_window_sensitivity(
+            id, date, sensitivity_windows, sample_rate=sample_rate
+        )
+        if all(experiment_data.empty for experiment_data in labeled_data):
+            return {"error": "Experiment not found"}, 404
+
+        window_results = []
+        for windows, experiment_data in zip(sensitivity_windows, labeled_data):
+            summary = {"time_windows": resolve_time_windows(windows)}
+            if not experiment_data.empty:
+                checks, results = ABTestManager(experiment_data).run_analysis()
+                summary.update(summarize(experiment_data, checks, results))
+            window_results.append(summary)
+        return {"results": {id: {"window_sensitivity": window_results}}}, 200
+
+    if options["date_range"]:
+        start, end = (
+            datetime.strptime(day, "%Y-%m-%d") for day in options["date_range"]
+        )
+        experiment_data = load_and_process_range(
+            id, start, end, time_windows=time_windows
+        )
+    elif segment_by:
+        experiment_data, segmented_data = load_and_process_segmented_data(
+            id, date, segment_by, time_windows=time_windows, sample_rate=sample_rate
+        )
+    else:
+        experiment_data = load_and_process_data(
+            id, date, time_windows=time_windows, sample_rate=sample_rate
+        )
+    if experiment_data.empty:
+        return {"error": "Experiment not found"}, 404
+
+    ab_test = ABTestManager(experiment_data)
+    with stage("run_analysis"):
+        checks, results = ab_test.run_analysis()
+
+    response = {"results": {id: summarize(experiment_data, checks, results)}}
+    if segment_by:
+        segments = SegmentedABTestAnalyzer(segmented_data, segment_by)
+        response["results"][id]["segments"] = records_without_nan(segments.run_tests())
+    if options["contamination"]:
+        sensitivity = ab_test.run_contamination_sensitivity()
+        clean_data = sensitivity.pop("data", None)
+        if clean_data is not None:
+            sensitivity["excluding_contaminated"] = summarize(
+                clean_data,
+                sensitivity.pop("checks"),
+                sensitivity.pop("results"),
+            )
+        response["results"][id]["contamination"] = sensitivity
+    return response, 200
+
+
+def aggregates_key(id, date, options):
+    """
+    Construye la llave de los agregados por variante de un análisis, igual para
+    todas las variantes excluidas y modos sobre los mismos datos.
+
+    Args:
+        id (str): Identificador del experimento.
+        date (datetime): Día solicitado, o None si se indicó date_range.
+        options (dict): Opciones obtenidas con parse_result_options.
+
+    Returns:
+        str: Llave de los agregados.
+    """
+    return analysis_key(id, date, {**options, "mode": "exact", "exclude_variants": []})
+
+
+def analysis_key(id, date, options):
+    """
+    Construye la llave normalizada de un análisis, que es igual para
+    solicitudes con los mismos parámetros aunque lleguen en distinto orden o
+    en distintas horas del mismo día (el procesamiento solo usa la fecha).
+
+    Args:
+        id (str): Identificador del experimento.
+        date (datetime): Día solicitado, o None si se indicó date_range.
+        options (dict): Opciones obtenidas con parse_result_options.
+
+    Returns:
+        str: Llave del análisis.
+    """
+    return dumps_json(
+        {
+            "id": id,
+            "day": date.strftime("%Y-%m-%d") if date else None,
+            **options,
+            "segment_by": sorted(options["segment_by"]),
+        }
+    )
+
+
+def precompute_results(date=None):
+    """
+    Calcula las respuestas por defecto (sin parámetros opcionales) de todos los
+    experimentos activos de un día, procesando los datos una sola vez.
+
+    Args:
+        date (datetime, opcional): Día a precalcular. Por defecto el último día
+        con eventos.
+
+    Returns:
+        dict: Respuestas serializadas en JSON (bytes) por llave de análisis.
+    """
+    date = date or latest_event_day()
+    if date is None:
+        return {}
+    processed_data = load_and_process_all_data(date)
+    if processed_data.empty:
+        return {}
+
+    options = parse_result_options(MultiDict())
+    payloads = {}
+    for id, experiment_data in processed_data.groupby("experiment_name", sort=False):
+        checks, results = ABTestManager(experiment_data).run_analysis()
+        response = {"results": {id: summarize_experiment(experiment_data, checks, results)}}
+        payloads[analysis_key(id, date, options)] = (
+            dumps_json(response, separators=(",", ":")) + "\n"
+        ).encode()
+    return payloads
+
+
+def create_ab_test_api(result_store=None):
     """
     Crea y configura una API Flask para realizar análisis de experimentos A/B.
 
@@ -19,79 +546,431 @@ def create_ab_test_api():
     los resultados en formato JSON.
 
     Args:
-        None
+        result_store (ResultStore, opcional): Almacén de resultados precalculados.
+        Por defecto se usa la carpeta RESULT_STORE_DIR.
 
     Returns:
         Flask: Una instancia de la aplicación Flask configurada para manejar 
         las solicitudes relacionadas con los experimentos A/B.
 
+    Query params:
+        day (str): Fecha y hora en formato YYYY-MM-DD HH.
+        time_windows (str, opcional): Ventanas de atribución por tipo de evento,
+            por ejemplo SEARCH:210,default:81.
+        sensitivity_windows (str, opcional, repetible): Cada valor es un conjunto de
+            ventanas con el mismo formato; devuelve los resultados de cada una lado a lado.
+        segment_by (str, opcional): Segmentos separados por coma (event_name, hour,
+            day_of_week, exposure, prior_purchase, recent_events,
+            time_since_previous); agrega los resultados por segmento en `segments`.
+        contamination (str, opcional): Si es 1, agrega en `contamination` los usuarios
+            expuestos a más de una variante y los resultados sin ellos.
+        X-Request-ID (header, opcional): Id de la solicitud para los logs; si no se
+            envía se genera uno. Se devuelve en el header X-Request-ID.
+        profile (str, opcional): Si es 1 y ENABLE_PROFILING está activo, agrega en
+            `profile` el tiempo y las filas de cada etapa y el árbol de llamadas
+            muestreado, y guarda las pilas plegadas en PROFILE_OUTPUT_DIR.
+        trace_memory (str, opcional): Con profile=1, si es 1 agrega a cada etapa su
+            pico de memoria medido con tracemalloc.
+        from, to (str, opcional): Rango de días en formato YYYY-MM-DD (to incluido,
+            por defecto igual a from). Reemplaza a `day` y se responde uniendo los
+            agregados diarios guardados en AGGREGATE_STORE_DIR.
+        sample (str, opcional): Fracción de usuarios (por ejemplo 0.05) para una
+            vista previa rápida. Los usuarios se eligen por hash de user_id, los
+            conteos se escalan a la población y la respuesta incluye sampled y sample
+            con los intervalos de los conteos.
+        mode (str, opcional): exact (por defecto), approx o sensitivity. En modo
+            approx la respuesta solo tiene participantes, compradores y tasa de
+            conversión por variante, estimados con sketches HyperLogLog y su intervalo
+            del 95%. En modo sensitivity devuelve en `variant_sensitivity` los
+            resultados con todas las variantes y sin las de exclude_variants.
+        exclude_variants (str, opcional): Variantes separadas por coma (por ejemplo
+            DEFAULT) que se excluyen del análisis. Se calcula desde los agregados por
+            variante guardados en memoria (ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL).
+
+    Endpoints de trabajos:
+        POST /analyses: Encola el análisis (cuerpo JSON con experiment_id, day y los
+            parámetros opcionales) y responde 202 con job_id. Solicitudes idénticas
+            reutilizan el mismo trabajo.
+        GET /analyses/<job_id>: Estado del trabajo y, al terminar, su resultado.
+
+    Otros endpoints:
+        GET /contamination?day=: Usuarios expuestos a más de una variante por experimento.
+        GET /portfolio/health?day=: Salud de todos los experimentos del día (SRM,
+            variantes, contaminación y tamaño de muestra).
+        GET /latency?from=&to=: Cuantiles p50/p75/p95 de los minutos hasta la compra
+            por tipo de evento (group_by, experiment y time_windows opcionales),
+            desde sketches por hora que se actualizan solo para los días nuevos.
+        GET /admission: Estado del control de admisión (ejecuciones en curso, cola
+            y solicitudes rechazadas).
+
+    Control de admisión:
+        Las ejecuciones que cargan y procesan datos se limitan a
+        ADMISSION_MAX_CONCURRENT simultáneas; hasta ADMISSION_MAX_WAITING solicitudes
+        esperan un cupo durante ADMISSION_WAIT_TIMEOUT segundos y el resto recibe 503
+        con Retry-After. Las respuestas precalculadas y los análisis con agregados
+        en caché no ocupan cupo, y los trabajos en segundo plano esperan su cupo.
+
     Raises:
-        400: Si falta el parámetro `day` o si el formato de la fecha es inválido.
+        400: Si falta el parámetro `day` (o `from`), si el formato de la fecha
+        o del rango es inválido o si las ventanas de atribución no son válidas.
+        403: Si se solicita profile sin ENABLE_PROFILING.
         404: Si el experimento no se encuentra en los datos procesados.
+        503: Si hay demasiados trabajos de análisis en curso, o si el control de
+        admisión está saturado (con el header Retry-After).
         500: Si ocurre un error inesperado durante el procesamiento de la solicitud.
     """
     app = Flask(__name__)
+    app.json = ABTestJSONProvider(app)
+    configure_logging()
     logger = logging.getLogger(__name__)
-    logger.setLevel(logging.DEBUG)
-    handler = logging.StreamHandler()
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_sample_rate = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
+    jobs = AnalysisJobManager(
+        max_workers=int(os.getenv("ANALYSIS_MAX_WORKERS", 2)),
+        max_pending=int(os.getenv("ANALYSIS_MAX_PENDING", 32)),
+        ttl_seconds=float(os.getenv("ANALYSIS_RESULT_TTL", 3600)),
     )
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    app.extensions["analysis_jobs"] = jobs
+    if result_store is None:
+        result_store = ResultStore(
+            os.getenv("RESULT_STORE_DIR", "./data/processed_data/results"),
+            generation_ttl_seconds=float(os.getenv("RESULT_STORE_GENERATION_TTL", 5)),
+        )
+    app.extensions["result_store"] = result_store
+    analysis_cache = LRUCache(
+        max_entries=int(os.getenv("ANALYSIS_CACHE_SIZE", 256)),
+        ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL", 900)),
+    )
+    app.extensions["analysis_cache"] = analysis_cache
+    admission = AdmissionController(
+        max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", 2)),
+        max_waiting=int(os.getenv("ADMISSION_MAX_WAITING", 8)),
+        wait_timeout=float(os.getenv("ADMISSION_WAIT_TIMEOUT", 10)),
+    )
+    app.extensions["admission"] = admission
+    profiling_enabled = os.getenv("ENABLE_PROFILING", "").lower() in ("1", "true", "yes")
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        g.request_start = time.perf_counter()
+        g.request_log_context = ExitStack()
+        g.request_log_context.callback(
+            current_request_id.reset, current_request_id.set(g.request_id)
+        )
+        g.stage_recorder = None
+        if random.random() < log_sample_rate:
+            g.stage_recorder = g.request_log_context.enter_context(record_stages())
+
+    @app.after_request
+    def log_request(response):
+        request_id = g.get("request_id")
+        if request_id is None:
+            return response
+        response.headers["X-Request-ID"] = request_id
+        recorder = g.get("stage_recorder")
+        if recorder is not None or response.status_code >= 500:
+            logger.info(
+                "%s %s %s",
+                request.method,
+                request.full_path.rstrip("?"),
+                response.status_code,
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "query": request.query_string.decode() or None,
+                    "status": response.status_code,
+                    "duration_ms": (time.perf_counter() - g.request_start) * 1000,
+                    "stages": recorder.report() if recorder is not None else None,
+                },
+            )
+        return response
+
+    @app.teardown_request
+    def end_request_log(error):
+        log_context = g.pop("request_log_context", None)
+        if log_context is not None:
+            log_context.close()
+
+    def is_enabled(name):
+        return request.args.get(name, "").lower() in ("1", "true", "yes")
+
+    def busy_response(error):
+        logger.warning(
+            "Request shed by admission control",
+            extra={"reason": error.reason, "retry_after": error.retry_after},
+        )
+        response = jsonify({"error": "Server is busy, retry later"})
+        response.headers["Retry-After"] = str(error.retry_after)
+        return response, 503
+
+    def run_admitted(function, *args):
+        with admission.admit(blocking=True):
+            return function(*args)
+
+    def parse_day_argument(day):
+        if not day:
+            return None, (jsonify({"error": "Day parameter is required"}), 400)
+        try:
+            return datetime.strptime(day, "%Y-%m-%d %H"), None
+        except ValueError:
+            return None, (
+                jsonify({"error": "Invalid date format, expected YYYY-MM-DD HH"}),
+                400,
+            )
 
     @app.route("/experiment/<path:id>/result", methods=["GET"])
     def get_experiment_result(id):
         try:
             id = unquote(id)
-            day = request.args.get("day")
-            if not day:
-                return jsonify({"error": "Day parameter is required"}), 400
             try:
-                date = datetime.strptime(day, "%Y-%m-%d %H")
+                options = parse_result_options(request.args)
+            except ValueError as error:
+                return jsonify({"error": str(error)}), 400
+            date = None
+            if not options["date_range"]:
+                date, error = parse_day_argument(request.args.get("day"))
+                if error:
+                    return error
+
+            if is_enabled("profile"):
+                if not profiling_enabled:
+                    return jsonify({"error": "Profiling is disabled"}), 403
+                with admission.admit(), profile_request(
+                    root_function="compute_experiment_result",
+                    output_dir=os.getenv("PROFILE_OUTPUT_DIR"),
+                    trace_memory=is_enabled("trace_memory"),
+                ) as profile:
+                    response, status = compute_experiment_result(id, date, options)
+                response["profile"] = profile.report()
+                return jsonify(response), status
+
+            payload = result_store.get(analysis_key(id, date, options))
+            if payload is not None:
+                return Response(payload, status=200, mimetype="application/json")
+
+            if (
+                options["exclude_variants"]
+                and analysis_cache.get(("aggregates", aggregates_key(id, date, options)))
+                is not None
+            ):
+                # Con los agregados en caché el análisis no carga datos.
+                response, status = compute_experiment_result(
+                    id, date, options, analysis_cache
+                )
+                return jsonify(response), status
+
+            with admission.admit():
+                response, status = compute_experiment_result(
+                    id, date, options, analysis_cache
+                )
+            return jsonify(response), status
+        except AdmissionRejectedError as error:
+            return busy_response(error)
+        except Exception:
+            logger.exception("An error occurred while processing the request:")
+            return jsonify({"error": "An unexpected error occurred"}), 500
+
+    @app.route("/analyses", methods=["POST"])
+    def submit_analysis():
+        """
+        Encola el análisis de un experimento y devuelve el id del trabajo. El cuerpo
+        JSON acepta experiment_id, day y los mismos parámetros opcionales que
+        /experiment/<id>/result.
+        """
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({"error": "A JSON object body is required"}), 400
+        id = body.get("experiment_id")
+        if not id:
+            return jsonify({"error": "experiment_id is required"}), 400
+
+        args = MultiDict()
+        for name, value in body.items():
+            for item in value if isinstance(value, list) else [value]:
+                args.add(name, str(item))
+        try:
+            options = parse_result_options(args)
+        except ValueError as error:
+            return jsonify({"error": str(error)}), 400
+        date = None
+        if not options["date_range"]:
+            date, error = parse_day_argument(args.get("day"))
+            if error:
+                return error
+
+        try:
+            # La generación en la llave evita reutilizar resultados de un
+            # dataset anterior.
+            job = jobs.submit(
+                f"{current_dataset_generation()}|{analysis_key(id, date, options)}",
+                run_admitted,
+                compute_experiment_result,
+                id,
+                date,
+                options,
+                analysis_cache,
+            )
+        except JobQueueFullError:
+            return jsonify({"error": "Too many analyses in progress"}), 503
+        response = job.to_dict()
+        response["status_url"] = url_for("get_analysis", job_id=job.id)
+        return jsonify(response), 202
+
+    @app.route("/analyses/<job_id>", methods=["GET"])
+    def get_analysis(job_id):
+        """
+        Consulta el estado de un trabajo de análisis y, si terminó, su resultado.
+        """
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Analysis not found"}), 404
+        return jsonify(job.to_dict()), 200
+
+    @app.route("/contamination", methods=["GET"])
+    def get_contamination_report():
+        """
+        Reporta para cada experimento del día la cantidad y proporción de usuarios
+        expuestos a más de una variante.
+        """
+        try:
+            date, error = parse_day_argument(request.args.get("day"))
+            if error:
+                return error
+
+            with admission.admit():
+                processed_data = load_and_process_all_data(date)
+            if processed_data.empty:
+                return jsonify({"error": "No data found for the requested day"}), 404
+
+            report = ContaminationIndex(processed_data).report()
+            return jsonify({"experiments": records_without_nan(report)}), 200
+        except AdmissionRejectedError as error:
+            return busy_response(error)
+        except Exception:
+            logger.exception("An error occurred while processing the request:")
+            return jsonify({"error": "An unexpected error occurred"}), 500
+
+    @app.route("/portfolio/health", methods=["GET"])
+    def get_portfolio_health():
+        """
+        Revisa en una sola pasada todos los experimentos del día: SRM, usuarios
+        por variante, contaminación, tamaño de muestra y experimentos con una
+        sola variante.
+        """
+        try:
+            date, error = parse_day_argument(request.args.get("day"))
+            if error:
+                return error
+
+            with admission.admit():
+                processed_data = load_and_process_all_data(date)
+            if processed_data.empty:
+                return jsonify({"error": "No data found for the requested day"}), 404
+
+            report = PortfolioHealthChecker(processed_data).report()
+            summary = {
+                "experiments": len(report),
+                "srm_detected": int(report["srm_detected"].sum()),
+                "single_variant": int(report["single_variant"].sum()),
+                "contaminated": int((report["contaminated_users"] > 0).sum()),
+                "inadequate_sample_size": int((~report["sample_size_adequate"]).sum()),
+            }
+            return (
+                jsonify(
+                    {"summary": summary, "experiments": records_without_nan(report)}
+                ),
+                200,
+            )
+        except AdmissionRejectedError as error:
+            return busy_response(error)
+        except Exception:
+            logger.exception("An error occurred while processing the request:")
+            return jsonify({"error": "An unexpected error occurred"}), 500
+
+    @app.route("/latency", methods=["GET"])
+    def get_latency_distribution():
+        """
+        Reporta la distribución de los minutos entre cada evento y su compra
+        (p50, p75 y p95) y la proporción de compras dentro de la ventana de
+        atribución vigente, para revalidar las ventanas sin reprocesar el dataset.
+        """
+        try:
+            try:
+                start = datetime.strptime(request.args.get("from", ""), "%Y-%m-%d")
+                end = datetime.strptime(
+                    request.args.get("to") or request.args.get("from"), "%Y-%m-%d"
+                )
+            except ValueError:
+                return (
+                    jsonify(
+                        {
+                            "error": "Invalid date range, expected "
+                            "from=YYYY-MM-DD&to=YYYY-MM-DD"
+                        }
+                    ),
+                    400,
+                )
+            if end < start:
+                return (
+                    jsonify({"error": "Invalid date range, from must not be after to"}),
+                    400,
+                )
+            group_by = request.args.get("group_by", "event_name").split(",")
+            if any(key not in LATENCY_KEYS for key in group_by):
+                return (
+                    jsonify(
+                        {
+                            "error": "Invalid group_by, expected any of "
+                            + ", ".join(LATENCY_KEYS)
+                        }
+                    ),
+                    400,
+                )
+            time_windows = request.args.get("time_windows")
+            try:
+                time_windows = parse_time_windows(time_windows) if time_windows else None
             except ValueError:
-                return jsonify(
-                    {"error": "Invalid date format, expected YYYY-MM-DD HH"}
-                ), 400
-
-            experiment_data = load_and_process_data(id, date)
-            if experiment_data.empty:
-                return jsonify({"error": "Experiment not found"}), 404
-
-            ab_test = ABTestManager(experiment_data)
-            checks, results = ab_test.run_analysis()
-
-            response = {
-                "results": {
-                    id: {
-                        "number_of_participants": int(
-                            experiment_data["user_id"].nunique()
+                return (
+                    jsonify({"error": "Invalid time windows, expected EVENT:MINUTES,..."}),
+                    400,
+                )
+
+            with admission.admit():
+                records = load_latency_sketches(start, end)
+            experiment = request.args.get("experiment")
+            if experiment:
+                records = [
+                    record
+                    for record in records
+                    if record["experiment_name"] == experiment
+                ]
+            if not records:
+                return jsonify({"error": "No data found for the requested range"}), 404
+
+            return (
+                jsonify(
+                    {
+                        "from": f"{start:%Y-%m-%d}",
+                        "to": f"{end:%Y-%m-%d}",
+                        "groups": summarize_latency(
+                            records, tuple(group_by), time_windows=time_windows
                         ),
-                        "checks":checks,
-                        "statistical_tests": {
-                            k: int(v) if isinstance(v, bool) else v
-                            for k, v in results["tests"].items()
-                        },
-                        "winner": results["winner"],
-                        "variants": [
-                            {
-                                "id": variant,
-                                "number_of_purchases": int(
-                                    experiment_data[
-                                        experiment_data["variant_id"] == variant
-                                    ]["with_purchase"].sum()
-                                ),
-                            }
-                            for variant in experiment_data["variant_id"].unique()
-                        ],
                     }
-                }
-            }
-            serializable_response = convert_to_serializable(response)
-            return jsonify(serializable_response), 200
-        except Exception as e:
+                ),
+                200,
+            )
+        except AdmissionRejectedError as error:
+            return busy_response(error)
+        except Exception:
             logger.exception("An error occurred while processing the request:")
             return jsonify({"error": "An unexpected error occurred"}), 500
 
+    @app.route("/admission", methods=["GET"])
+    def get_admission_stats():
+        """
+        Reporta el estado del control de admisión: ejecuciones en curso, cola de
+        espera, ejecuciones admitidas y solicitudes rechazadas.
+        """
+        return jsonify(admission.stats()), 200
+
     return app
@@ -1,15 +1,34 @@
 import os
+import json
 import logging
 import argparse
-from flask import request, jsonify
+import tracemalloc
+from flask import jsonify
 from dotenv import load_dotenv
 
-from api.ab_testing_api import create_ab_test_api
+from api.ab_testing_api import create_ab_test_api, precompute_results
+from modules.data_processing.data_loader import dataset_generation
+from modules.serving.load_test import run_load_test
+from modules.serving.result_store import ResultRefresher
+from modules.utils.logging_setup import configure_logging
+from modules.utils.parity import run_parity
+from modules.utils.utils import dumps_json
 
 
 def parse_arguments():
     load_dotenv()
     parser = argparse.ArgumentParser(description="Run A/B Test API")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="serve",
+        choices=["serve", "precompute", "loadtest", "parity"],
+        help=(
+            "serve: run the API (default); precompute: refresh the result store "
+            "and exit; loadtest: benchmark the API on a synthetic local dataset; "
+            "parity: compare the optimized labeling paths with the reference"
+        ),
+    )
     parser.add_argument(
         "--host",
         type=str,
@@ -22,13 +41,57 @@ def parse_arguments():
         default=int(os.getenv("PORT", 8080)),
         help="Port for the API server (default: 8080)",
     )
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=float(os.getenv("RESULT_REFRESH_INTERVAL", 0)),
+        help="Seconds between dataset checks to precompute results (default: 0, disabled)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Precompute even if the dataset generation did not change",
+    )
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=None,
+        help="loadtest/parity: synthetic users (default: 2000 / 150)",
+    )
+    parser.add_argument(
+        "--events",
+        type=int,
+        default=None,
+        help="loadtest/parity: synthetic events (default: 20000 / 2000)",
+    )
+    parser.add_argument(
+        "--days", type=int, default=3, help="loadtest: synthetic days"
+    )
+    parser.add_argument(
+        "--precompute",
+        action="store_true",
+        help="loadtest: publish precomputed results before running the scenarios",
+    )
+    parser.add_argument(
+        "--scenarios",
+        type=str,
+        default=None,
+        help=(
+            "loadtest: JSON file with a list of scenarios "
+            "(name, concurrency, requests, hot_share, params)"
+        ),
+    )
+    parser.add_argument(
+        "--runs", type=int, default=5, help="parity: synthetic datasets to compare"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="parity: seed of the first dataset"
+    )
     return parser.parse_args()
 
 
 def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-    )
+    configure_logging()
     return logging.getLogger(__name__)
 
 
@@ -39,12 +102,55 @@ def main():
     logger = setup_logging()
     args = parse_arguments()
 
+    if args.command == "loadtest":
+        scenarios = None
+        if args.scenarios:
+            with open(args.scenarios) as file:
+                scenarios = json.load(file)
+        report = run_load_test(
+            lambda store: create_ab_test_api(result_store=store),
+            scenarios=scenarios,
+            n_users=args.users or 2000,
+            n_events=args.events or 20000,
+            days=args.days,
+            precompute=precompute_results if args.precompute else None,
+        )
+        print(dumps_json(report, indent=2))
+        return
+
+    if args.command == "parity":
+        report = run_parity(
+            runs=args.runs,
+            n_users=args.users or 150,
+            n_events=args.events or 2000,
+            seed=args.seed,
+        )
+        print(dumps_json(report, indent=2))
+        if not report["passed"]:
+            raise SystemExit(1)
+        return
+
     app = create_ab_test_api()
-    logger.info(f"Starting API server on {args.host}:{args.port}")
+    refresher = ResultRefresher(
+        app.extensions["result_store"],
+        precompute_results,
+        dataset_generation,
+        interval_seconds=args.refresh_interval,
+    )
 
-    @app.before_request
-    def before_request():
-        logger.info(f"Received request: {request.url}")
+    if args.command == "precompute":
+        published = refresher.refresh(force=args.force)
+        logger.info("Results published" if published else "Results are up to date")
+        return
+
+    if os.getenv("TRACE_MEMORY", "").lower() in ("1", "true", "yes"):
+        logger.info("Tracing memory allocations, stage peaks are logged")
+        tracemalloc.start()
+
+    if args.refresh_interval > 0:
+        logger.info(f"Refreshing precomputed results every {args.refresh_interval}s")
+        refresher.start()
+    logger.info(f"Starting API server on {args.host}:{args.port}")
 
     @app.errorhandler(Exception)
     def handle_exception(e):
@@ -4,6 +4,8 @@ from scipy.stats import chi2_contingency, norm
 from statsmodels.stats.proportion import proportions_ztest
 from statsmodels.stats.multitest import multipletests
 
+from modules.utils.statistical_functions import variant_totals
+
 
 class ABTestAnalyzer:
     """
@@ -13,10 +15,21 @@ class ABTestAnalyzer:
     estadísticas como Chi-cuadrado y z-test, y ejecutar análisis más complejos como
     comparaciones por pares y análisis de efectos causales.
 
+    Las decisiones se toman sobre las observaciones y compras por variante
+    (totals), por lo que el mismo código sirve para los datos por usuario y para
+    los totales ya agregados de VariantAggregates.
+
     Args:
-        data (DataFrame): DataFrame de pandas que contiene los datos de las pruebas A/B.
+        data (DataFrame, opcional): DataFrame de pandas que contiene los datos de las pruebas A/B.
+        totals (DataFrame, opcional): Observaciones (rows) y compras (conversions) por
+        variante; por defecto se calculan a partir de data.
 
     Methods:
+        conversion_rates():
+            Calcula la tasa de conversión de cada variante.
+            Returns:
+                Series: Tasa de conversión por variante.
+
         create_contingency_table():
             Crea una tabla de contingencia que cruza la variante con el resultado de compra.
             Returns:
@@ -67,15 +80,32 @@ class ABTestAnalyzer:
                 dict: Resultados incluyendo la variante ganadora y pruebas estadísticas realizadas.
     """
 
-    def __init__(self, data):
+    def __init__(self, data=None, totals=None):
         """
         Inicializa la instancia de ABTestAnalyzer con los datos proporcionados.
 
+        Las pruebas solo dependen de las observaciones y compras de cada variante,
+        por lo que se pueden ejecutar directamente sobre totales ya agregados
+        (por ejemplo los de VariantAggregates) sin los datos por usuario.
+
         Args:
-            data (DataFrame): DataFrame que contiene los datos del experimento A/B.
+            data (DataFrame, opcional): DataFrame que contiene los datos del experimento A/B.
+            totals (DataFrame, opcional): Columnas rows y conversions por variante, en
+            el orden en que aparecen en los datos (ver variant_totals). Por defecto
+            se calculan a partir de data.
         """
         self.data = data
-        self.variants = data["variant_id"].unique()
+        self.totals = variant_totals(data) if totals is None else totals
+        self.variants = self.totals.index.to_numpy()
+
+    def conversion_rates(self):
+        """
+        Calcula la tasa de conversión de cada variante.
+
+        Returns:
+            Series: Tasa de conversión por variante, ordenada por variant_id.
+        """
+        return (self.totals["conversions"] / self.totals["rows"]).sort_index()
 
     def create_contingency_table(self):
         """
@@ -83,9 +113,16 @@ class ABTestAnalyzer:
 
         Returns:
             DataFrame: Tabla de contingencia de pandas que muestra la distribución de compras
-            por variante.
+            por variante. Como en pd.crosstab, solo incluye los resultados observados.
         """
-        return pd.crosstab(self.data["variant_id"], self.data["with_purchase"])
+        totals = self.totals.sort_index()
+        table = pd.DataFrame(
+            {
+                False: totals["rows"] - totals["conversions"],
+                True: totals["conversions"],
+            }
+        )
+        return table.loc[:, table.sum(axis=0) > 0]
 
     def chi_square_test(self, contingency_table):
         """
@@ -110,13 +147,10 @@ class ABTestAnalyzer:
         Returns:
             tuple: Estadístico z, p-valor y intervalo de confianza.
         """
-        data_v1 = self.data[self.data["variant_id"] == winner_id]
-        data_v2 = self.data[self.data["variant_id"] != winner_id]
-
-        conversions_v1 = data_v1["with_purchase"].sum()
-        total_v1 = data_v1["with_purchase"].count()
-        conversions_v2 = data_v2["with_purchase"].sum()
-        total_v2 = data_v2["with_purchase"].count()
+        conversions_v1 = self.totals.loc[winner_id, "conversions"]
+        total_v1 = self.totals.loc[winner_id, "rows"]
+        conversions_v2 = self.totals["conversions"].sum() - conversions_v1
+        total_v2 = self.totals["rows"].sum() - total_v1
 
         prop_v1 = conversions_v1 / total_v1
         prop_v2 = conversions_v2 / total_v2
@@ -155,9 +189,9 @@ class ABTestAnalyzer:
         pvals = []
         for i, v1 in enumerate(self.variants):
             for v2 in self.variants[i + 1 :]:
-                subset = self.data[self.data["variant_id"].isin([v1, v2])]
-                count = subset.groupby("variant_id")["with_purchase"].sum().values
-                nobs = subset.groupby("variant_id")["with_purchase"].count().values
+                pair = self.totals.loc[[v1, v2]].sort_index()
+                count = pair["conversions"].to_numpy()
+                nobs = pair["rows"].to_numpy()
                 if 0 in nobs:
                     continue
                 stat, pval = proportions_ztest(count, nobs)
@@ -175,8 +209,7 @@ class ABTestAnalyzer:
         Returns:
             dict: Un diccionario con la variante ganadora y sin pruebas estadísticas adicionales.
         """
-        rates = self.data.groupby("variant_id")["with_purchase"].mean()
-        winner = rates.idxmax()
+        winner = self.conversion_rates().idxmax()
 
         return {
             "winner": winner,
@@ -195,8 +228,7 @@ class ABTestAnalyzer:
             dict: Un diccionario con la variante ganadora y los resultados de las pruebas
             estadísticas realizadas.
         """
-        rates = self.data.groupby("variant_id")["with_purchase"].mean()
-        winner = rates.idxmax()
+        winner = self.conversion_rates().idxmax()
 
         z_stat, pval, ci = self.z_test(winner)
         significant_difference = pval < 0.05
@@ -228,7 +260,8 @@ class ABTestAnalyzer:
         chi2, pval = self.chi_square_test(contingency_table)
 
         significant_difference = pval < 0.05
-        winner = None
+        rates = self.conversion_rates()
+        winner = rates.idxmax()
 
         if significant_difference:
             reject, _ = self.post_hoc_test()
@@ -236,20 +269,13 @@ class ABTestAnalyzer:
                 significant_variants = [
                     self.variants[i] for i, r in enumerate(reject) if r
                 ]
+                winner = None
                 max_rate = 0
                 for variant in significant_variants:
-                    rate = self.data[self.data["variant_id"] == variant][
-                        "with_purchase"
-                    ].mean()
+                    rate = rates[variant]
                     if rate > max_rate:
                         max_rate = rate
                         winner = variant
-            else:
-                rates = self.data.groupby("variant_id")["with_purchase"].mean()
-                winner = rates.idxmax()
-        else:
-            rates = self.data.groupby("variant_id")["with_purchase"].mean()
-            winner = rates.idxmax()
 
         return {
             "winner": winner,
@@ -1,5 +1,9 @@
 from modules.ab_testing.ab_test_analyzer import ABTestAnalyzer
+from modules.ab_testing.bayesian_analyzer import BayesianABTestAnalyzer
 from modules.ab_testing.checks_processor import ChecksProcessor
+from modules.ab_testing.contamination import ContaminationIndex
+from modules.utils.profiling import stage
+from modules.utils.statistical_functions import variant_totals
 
 
 class ABTestManager:
@@ -20,6 +24,11 @@ class ABTestManager:
             Returns:
                 tuple: Resultados de las verificaciones (checks) y análisis (results) 
                 de las pruebas A/B.
+
+        run_contamination_sensitivity():
+            Ejecuta el análisis excluyendo a los usuarios expuestos a más de una variante.
+            Returns:
+                dict: Reporte de contaminación y resultados sin los usuarios contaminados.
     """
     def __init__(self, data):
         """
@@ -29,8 +38,10 @@ class ABTestManager:
             data (DataFrame): DataFrame que contiene los datos del experimento A/B.
         """
         self.data = data
-        self.analyzer = ABTestAnalyzer(data)
-        self.checks = ChecksProcessor(data)
+        self.totals = variant_totals(data)
+        self.contamination = ContaminationIndex(data)
+        self.analyzer = ABTestAnalyzer(data, self.totals)
+        self.checks = ChecksProcessor(data, self.totals, self.contamination)
 
     def run_analysis(self):
         """
@@ -38,12 +49,50 @@ class ABTestManager:
 
         Este método coordina la ejecución de las verificaciones de datos y el análisis
         estadístico para determinar qué variante del experimento A/B es la ganadora.
+        Con más de una variante, agrega a las pruebas el análisis bayesiano
+        (probabilidad de ser la mejor, pérdida esperada e intervalos de credibilidad).
 
         Returns:
             tuple: Contiene los resultados de las verificaciones (ab_checks) y los 
             resultados del análisis estadístico (ab_results).
         """
-        ab_checks = self.checks.run_all_checks()
-        ab_results = self.analyzer.determine_winner()
+        with stage("run_all_checks"):
+            ab_checks = self.checks.run_all_checks()
+        with stage("determine_winner"):
+            ab_results = self.analyzer.determine_winner()
+        if ab_results["tests"] is not None:
+            with stage("bayesian_analysis"):
+                ab_results["tests"]["bayesian"] = BayesianABTestAnalyzer(
+                    self.data, counts=self.totals
+                ).analyze()
+
+        return ab_checks, ab_results
+
+    def run_contamination_sensitivity(self):
+        """
+        Ejecuta el análisis de sensibilidad recomendado para la independencia de
+        usuarios: repite el análisis excluyendo a los usuarios expuestos a más de
+        una variante del experimento, usando el índice de contaminación ya
+        construido para los checks en lugar de reconstruirlo.
+
+        Returns:
+            dict: Diccionario con participants, contaminated_users, contaminated_share
+            y, si quedan datos, los datos sin contaminación (data) junto con sus
+            checks y results.
+        """
+        report = self.contamination.report()
+        sensitivity = {
+            "participants": int(report["participants"].sum()),
+            "contaminated_users": int(report["contaminated_users"].sum()),
+        }
+        sensitivity["contaminated_share"] = (
+            sensitivity["contaminated_users"] / sensitivity["participants"]
+            if sensitivity["participants"]
+            else None
+        )
 
-        return ab_checks, ab_results
\ No newline at end of file
+        clean_data = self.contamination.exclude_contaminated()
+        if not clean_data.empty:
+            checks, results = ABTestManager(clean_data).run_analysis()
+            sensitivity.update(data=clean_data, checks=checks, results=results)
+        return sensitivity
\ No newline at end of file
@@ -0,0 +1,127 @@
+import numpy as np
+from scipy.stats import beta
+
+
+class BayesianABTestAnalyzer:
+    """
+    Análisis bayesiano de la tasa de conversión con posteriores Beta-binomial
+    por variante. La probabilidad de ser la mejor variante y la pérdida esperada
+    se calculan con una única matriz de muestras (muestras x variantes), sin
+    recorrer las variantes en Python, y los intervalos de credibilidad con la
+    función cuantil de la Beta.
+
+    La semilla es fija por defecto, por lo que los mismos datos siempre producen
+    la misma respuesta (lo que permite guardarla y reutilizarla).
+
+    Args:
+        data (DataFrame): DataFrame con las columnas variant_id y with_purchase.
+        prior_alpha (float, opcional): Parámetro alpha de la prior Beta.
+        prior_beta (float, opcional): Parámetro beta de la prior Beta.
+        n_draws (int, opcional): Muestras de Monte Carlo por variante.
+        credible_level (float, opcional): Nivel de los intervalos de credibilidad.
+        seed (int, opcional): Semilla del generador aleatorio.
+        counts (DataFrame, opcional): Filas (rows) y compras (conversions) por
+        variante ya agregadas; reemplaza la agrupación de data.
+
+    Methods:
+        posterior_parameters() -> tuple:
+            Calcula las variantes, conversiones, observaciones y parámetros de las posteriores.
+
+        analyze() -> dict:
+            Calcula la probabilidad de ser la mejor, la pérdida esperada y el
+            intervalo de credibilidad de cada variante.
+    """
+
+    def __init__(
+        self,
+        data,
+        prior_alpha=1.0,
+        prior_beta=1.0,
+        n_draws=20000,
+        credible_level=0.95,
+        seed=0,
+        counts=None,
+    ):
+        """
+        Inicializa el análisis con los datos etiquetados del experimento.
+
+        Args:
+            data (DataFrame): DataFrame con las columnas variant_id y with_purchase.
+            prior_alpha (float, opcional): Parámetro alpha de la prior Beta.
+            prior_beta (float, opcional): Parámetro beta de la prior Beta.
+            n_draws (int, opcional): Muestras de Monte Carlo por variante.
+            credible_level (float, opcional): Nivel de los intervalos de credibilidad.
+            seed (int, opcional): Semilla del generador aleatorio.
+            counts (DataFrame, opcional): Filas y compras por variante ya agregadas.
+        """
+        self.data = data
+        self.counts = counts
+        self.prior_alpha = prior_alpha
+        self.prior_beta = prior_beta
+        self.n_draws = n_draws
+        self.credible_level = credible_level
+        self.seed = seed
+
+    def posterior_parameters(self):
+        """
+        Calcula en una sola agrupación las conversiones y observaciones de cada
+        variante y los parámetros de su posterior Beta.
+
+        Returns:
+            tuple: Variantes, conversiones, observaciones, alpha y beta posteriores.
+        """
+        if self.counts is not None:
+            grouped = self.counts.rename(columns={"conversions": "sum", "rows": "count"})
+        else:
+            grouped = self.data.groupby("variant_id", sort=False)["with_purchase"].agg(
+                ["sum", "count"]
+            )
+        conversions = grouped["sum"].to_numpy(np.float64)
+        trials = grouped["count"].to_numpy(np.float64)
+        alpha = self.prior_alpha + conversions
+        beta_ = self.prior_beta + trials - conversions
+        return grouped.index.tolist(), conversions, trials, alpha, beta_
+
+    def analyze(self):
+        """
+        Calcula, para todas las variantes a la vez, la probabilidad de ser la
+        mejor (proporción de muestras en que su tasa es la mayor), la pérdida
+        esperada (diferencia promedio con la mejor tasa de cada muestra) y el
+        intervalo de credibilidad de la tasa de conversión.
+
+        Returns:
+            dict: Prior, número de muestras, variante con mayor probabilidad de ser
+            la mejor y, por variante, conversiones, observaciones, media posterior,
+            intervalo de credibilidad, probabilidad de ser la mejor y pérdida esperada.
+        """
+        variants, conversions, trials, alpha, beta_ = self.posterior_parameters()
+        rng = np.random.default_rng(self.seed)
+        draws = rng.beta(alpha, beta_, size=(self.n_draws, len(variants)))
+
+        best = draws.argmax(axis=1)
+        probability_to_be_best = np.bincount(best, minlength=len(variants)) / self.n_draws
+        expected_loss = (draws.max(axis=1, keepdims=True) - draws).mean(axis=0)
+
+        tail = (1 - self.credible_level) / 2
+        lower = beta.ppf(tail, alpha, beta_)
+        upper = beta.ppf(1 - tail, alpha, beta_)
+        posterior_mean = alpha / (alpha + beta_)
+
+        return {
+            "prior": {"alpha": self.prior_alpha, "beta": self.prior_beta},
+            "draws": self.n_draws,
+            "credible_level": self.credible_level,
+            "best_variant": variants[int(probability_to_be_best.argmax())],
+            "variants": [
+                {
+                    "id": variant,
+                    "conversions": int(conversions[i]),
+                    "trials": int(trials[i]),
+                    "posterior_mean": posterior_mean[i],
+                    "credible_interval": (lower[i], upper[i]),
+                    "probability_to_be_best": probability_to_be_best[i],
+                    "expected_loss": expected_loss[i],
+                }
+                for i, variant in enumerate(variants)
+            ],
+        }
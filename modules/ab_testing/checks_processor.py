@@ -1,6 +1,9 @@
-from statsmodels.stats.power import NormalIndPower, GofChisquarePower
-
-from modules.utils.statistical_functions import normal_approximation
+from modules.ab_testing.contamination import ContaminationIndex
+from modules.utils.statistical_functions import (
+    normal_approximation,
+    required_sample_size,
+    variant_totals,
+)
 
 
 class ChecksProcessor:
@@ -11,8 +14,18 @@ class ChecksProcessor:
     calcular la variación dentro de cada variante, y evaluar si el tamaño de la muestra es adecuado
     para los análisis estadísticos.
 
+    La aproximación normal y el tamaño de muestra se evalúan sobre las
+    observaciones y compras por variante (totals); las subclases pueden
+    reemplazar los checks de independencia para trabajar sin los datos por
+    usuario (ver VariantAggregates).
+
     Args:
         data (DataFrame): DataFrame de pandas que contiene los datos de las pruebas A/B.
+        totals (DataFrame, opcional): Observaciones (rows) y compras (conversions) por
+        variante; por defecto se calculan a partir de data.
+        contamination (ContaminationIndex, opcional): Índice de contaminación de
+        data, para no reconstruirlo si quien llama ya lo tiene; por defecto se
+        construye al verificar la independencia de usuarios.
 
     Methods:
         check_user_independence():
@@ -50,15 +63,19 @@ class ChecksProcessor:
                 independencia de usuarios y experimentos, variación por variante, y adecuación del tamaño de muestra.
     """
 
-    def __init__(self, data):
+    def __init__(self, data, totals=None, contamination=None):
         """
         Inicializa la instancia de ChecksProcessor con los datos proporcionados.
 
         Args:
             data (DataFrame): DataFrame que contiene los datos del experimento A/B.
+            totals (DataFrame, opcional): Observaciones y compras por variante.
+            contamination (ContaminationIndex, opcional): Índice de contaminación de data.
         """
         self.data = data
-        self.variants = data["variant_id"].unique()
+        self.totals = variant_totals(data) if totals is None else totals
+        self.variants = self.totals.index.to_numpy()
+        self.contamination = contamination
 
     def check_user_independence(self):
         """
@@ -67,10 +84,9 @@ class ChecksProcessor:
         Returns:
             bool: True si todos los usuarios son independientes, False en caso contrario.
         """
-        experiment_variants = self.data.groupby(["user_id", "experiment_name"])[
-            "variant_id"
-        ].nunique()
-        independent = all(experiment_variants == 1)
+        if self.contamination is None:
+            self.contamination = ContaminationIndex(self.data)
+        independent = self.contamination.contaminated_users == 0
         return independent
 
     def check_experiment_independence(self):
@@ -95,20 +111,11 @@ class ChecksProcessor:
         Returns:
             bool: True si se cumple la normalidad aproximada, False en caso contrario.
         """
-        grouped = (
-            self.data.groupby("variant_id")
-            .agg(n=("variant_id", "count"), p=("with_purchase", "mean"))
-            .reset_index()
-        )
-
-        grouped["normal_approximation"] = grouped.apply(
-            lambda row: normal_approximation(row["n"], row["p"]), axis=1
+        rates = self.totals["conversions"] / self.totals["rows"]
+        return all(
+            normal_approximation(n, p) for n, p in zip(self.totals["rows"], rates)
         )
 
-        norm = grouped["normal_approximation"].all()
-
-        return norm
-
     def check_sample_size(self, alpha=0.05, power=0.8, effect_size=0.2):
         """
         Evalúa si el tamaño de la muestra es adecuado para el análisis estadístico.
@@ -121,30 +128,11 @@ class ChecksProcessor:
         Returns:
             dict: Diccionario que indica si el tamaño de la muestra es adecuado para cada variante.
         """
-        sample_sizes = self.data.groupby("variant_id")["with_purchase"].count()
-        adequacy = {}
-        if len(sample_sizes) == 2:
-            power_analysis = NormalIndPower()
-            alternative = "two-sided"
-        else:
-            power_analysis = GofChisquarePower()
-            alternative = None
-
-        for variant, size in sample_sizes.items():
-            if alternative:
-                required_n = power_analysis.solve_power(
-                    effect_size=effect_size,
-                    alpha=alpha,
-                    power=power,
-                    alternative=alternative,
-                )
-            else:
-                required_n = power_analysis.solve_power(
-                    effect_size=effect_size, alpha=alpha, power=power
-                )
-            adequacy[variant] = size >= required_n
-
-        return adequacy
+        sample_sizes = self.totals["rows"].sort_index()
+        required_n = required_sample_size(
+            len(sample_sizes) == 2, alpha, power, effect_size
+        )
+        return {variant: size >= required_n for variant, size in sample_sizes.items()}
 
     def run_all_checks(self, alpha=0.05, power=0.8):
         """
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+
+class ContaminationIndex:
+    """
+    Índice usuario x variante para detectar usuarios expuestos a más de una
+    variante dentro del mismo experimento (contaminación).
+
+    El índice se construye una sola vez por conjunto de datos: los usuarios,
+    experimentos y variantes se codifican como enteros y cada par
+    (experimento, usuario) se representa con una llave int64. Las llaves de los
+    usuarios contaminados quedan ordenadas, por lo que reportar, filtrar o
+    excluir usuarios no requiere volver a agrupar el DataFrame.
+
+    Args:
+        data (DataFrame): DataFrame con las columnas experiment_name, variant_id y user_id.
+
+    Methods:
+        report():
+            Calcula por experimento la cantidad y proporción de usuarios contaminados.
+            Returns:
+                DataFrame: Reporte de contaminación por experimento.
+
+        contaminated_mask():
+            Indica qué filas pertenecen a usuarios contaminados en su experimento.
+            Returns:
+                np.ndarray: Arreglo booleano alineado con las filas de data.
+
+        exclude_contaminated():
+            Excluye las filas de los usuarios contaminados.
+            Returns:
+                DataFrame: Datos sin los usuarios contaminados.
+    """
+
+    def __init__(self, data):
+        """
+        Inicializa el índice a partir de los datos etiquetados.
+
+        Args:
+            data (DataFrame): DataFrame con las columnas experiment_name, variant_id y user_id.
+        """
+        self.data = data
+        experiment_codes, self.experiments = pd.factorize(data["experiment_name"])
+        user_codes, users = pd.factorize(data["user_id"])
+        variant_codes, variants = pd.factorize(data["variant_id"])
+
+        self.n_users = max(len(users), 1)
+        n_variants = max(len(variants), 1)
+
+        self.pair_keys = experiment_codes.astype(np.int64) * self.n_users + user_codes
+        unique_assignments = np.unique(self.pair_keys * n_variants + variant_codes)
+        pairs, variants_per_pair = np.unique(
+            unique_assignments // n_variants, return_counts=True
+        )
+        self.pairs = pairs
+        self.contaminated_pairs = pairs[variants_per_pair > 1]
+
+    @property
+    def contaminated_users(self):
+        """
+        Número total de pares (experimento, usuario) expuestos a más de una variante.
+        """
+        return len(self.contaminated_pairs)
+
+    def report(self):
+        """
+        Calcula por experimento la cantidad de participantes, la cantidad de usuarios
+        expuestos a más de una variante y su proporción.
+
+        Returns:
+            DataFrame: DataFrame con las columnas experiment_name, participants,
+            contaminated_users y contaminated_share.
+        """
+        n_experiments = len(self.experiments)
+        participants = np.bincount(
+            self.pairs // self.n_users, minlength=n_experiments
+        )
+        contaminated = np.bincount(
+            self.contaminated_pairs // self.n_users, minlength=n_experiments
+        )
+        report = pd.DataFrame(
+            {
+                "experiment_name": self.experiments,
+                "participants": participants,
+                "contaminated_users": contaminated,
+            }
+        )
+        report["contaminated_share"] = report["contaminated_users"] / report[
+            "participants"
+        ].where(report["participants"] > 0)
+        return report
+
+    def contaminated_mask(self):
+        """
+        Indica qué filas pertenecen a usuarios expuestos a más de una variante
+        de su experimento.
+
+        Returns:
+            np.ndarray: Arreglo booleano alineado con las filas de data.
+        """
+        if len(self.contaminated_pairs) == 0:
+            return np.zeros(len(self.pair_keys), dtype=bool)
+        positions = np.searchsorted(self.contaminated_pairs, self.pair_keys)
+        positions = np.minimum(positions, len(self.contaminated_pairs) - 1)
+        return self.contaminated_pairs[positions] == self.pair_keys
+
+    def exclude_contaminated(self):
+        """
+        Excluye las filas de los usuarios expuestos a más de una variante.
+
+        Returns:
+            DataFrame: Datos sin los usuarios contaminados.
+        """
+        return self.data[~self.contaminated_mask()]
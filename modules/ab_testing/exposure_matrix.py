@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class ExposureMatrix:
+    """
+    Matriz dispersa usuario x experimento (o experimento-variante) para evaluar
+    si la exposición a múltiples experimentos afecta la conversión.
+
+    La matriz se construye una sola vez a partir de los eventos expandidos y los
+    análisis se resuelven con productos de matrices dispersas, sin cruces entre
+    DataFrames.
+
+    Args:
+        data (DataFrame): Eventos expandidos o datos etiquetados con las columnas
+        user_id, experiment_name y variant_id. Si incluye with_purchase, se usa para
+        identificar a los usuarios que convirtieron.
+        level (str, opcional): "experiment" (por defecto) o "variant" para usar
+        columnas experimento=variante.
+
+    Methods:
+        exposure_counts():
+            Calcula el número de experimentos a los que fue expuesto cada usuario.
+            Returns:
+                Series: Número de exposiciones por user_id.
+
+        conversion_by_exposure_count(converted_users=None):
+            Calcula la tasa de conversión según el número de experimentos simultáneos.
+            Returns:
+                DataFrame: Usuarios, conversiones y tasa por número de exposiciones.
+
+        overlap():
+            Calcula los usuarios compartidos entre cada par de experimentos.
+            Returns:
+                DataFrame: Usuarios compartidos y Jaccard por par de experimentos.
+
+        interaction_table(converted_users=None):
+            Compara la conversión de los usuarios expuestos a ambos experimentos de
+            cada par con la conversión de cada experimento.
+            Returns:
+                DataFrame: Tabla de interacción por par de experimentos.
+    """
+
+    def __init__(self, data, level="experiment"):
+        """
+        Construye la matriz dispersa de exposición.
+
+        Args:
+            data (DataFrame): Eventos expandidos o datos etiquetados.
+            level (str, opcional): "experiment" o "variant".
+        """
+        if level == "variant":
+            columns = data["experiment_name"] + "=" + data["variant_id"].astype(str)
+        elif level == "experiment":
+            columns = data["experiment_name"]
+        else:
+            raise ValueError("level must be 'experiment' or 'variant'")
+
+        user_codes, self.users = pd.factorize(data["user_id"])
+        column_codes, self.columns = pd.factorize(columns)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(user_codes), dtype=np.int32), (user_codes, column_codes)),
+            shape=(len(self.users), len(self.columns)),
+        )
+        matrix.data[:] = 1
+        self.matrix = matrix
+
+        self.converted = None
+        if "with_purchase" in data:
+            self.converted = (
+                np.bincount(
+                    user_codes,
+                    weights=data["with_purchase"].to_numpy(dtype=float),
+                    minlength=len(self.users),
+                )
+                > 0
+            )
+
+    def _converted_vector(self, converted_users=None):
+        """
+        Obtiene el vector de conversión por usuario de la matriz.
+
+        Args:
+            converted_users (iterable, opcional): user_id de los usuarios que compraron.
+            Si no se indica, se usa la columna with_purchase de los datos.
+
+        Returns:
+            np.ndarray: Arreglo booleano alineado con las filas de la matriz.
+        """
+        if converted_users is not None:
+            return pd.Index(self.users).isin(list(converted_users))
+        if self.converted is None:
+            raise ValueError("converted_users is required when data has no with_purchase")
+        return self.converted
+
+    def exposure_counts(self):
+        """
+        Calcula el número de experimentos a los que fue expuesto cada usuario.
+
+        Returns:
+            Series: Número de exposiciones indexado por user_id.
+        """
+        return pd.Series(
+            np.diff(self.matrix.indptr), index=pd.Index(self.users, name="user_id")
+        )
+
+    def conversion_by_exposure_count(self, converted_users=None):
+        """
+        Calcula la tasa de conversión según el número de experimentos a los que
+        fue expuesto el usuario (hipótesis 1 y 2).
+
+        Args:
+            converted_users (iterable, opcional): user_id de los usuarios que compraron.
+
+        Returns:
+            DataFrame: DataFrame con las columnas exposure_count, users, converters
+            y conversion_rate.
+        """
+        counts = np.diff(self.matrix.indptr)
+        converted = self._converted_vector(converted_users)
+        users = np.bincount(counts)
+        converters = np.bincount(counts, weights=converted.astype(float))
+        table = pd.DataFrame(
+            {
+                "exposure_count": np.arange(len(users)),
+                "users": users,
+                "converters": converters.astype(int),
+            }
+        )
+        table = table[table["users"] > 0].reset_index(drop=True)
+        table["conversion_rate"] = table["converters"] / table["users"]
+        return table
+
+    def _pairs(self, co_matrix):
+        """
+        Convierte una matriz columna x columna en una tabla de pares (i < j).
+
+        Args:
+            co_matrix (sparse matrix): Matriz simétrica de conteos.
+
+        Returns:
+            DataFrame: Pares con su conteo, sin incluir la diagonal ni ceros.
+        """
+        upper = sparse.triu(co_matrix, k=1).tocoo()
+        return pd.DataFrame(
+            {
+                "experiment_a": self.columns[upper.row],
+                "experiment_b": self.columns[upper.col],
+                "value": upper.data,
+                "a": upper.row,
+                "b": upper.col,
+            }
+        )
+
+    def overlap(self):
+        """
+        Calcula los usuarios compartidos entre cada par de experimentos con el
+        producto X^T X.
+
+        Returns:
+            DataFrame: DataFrame con experiment_a, experiment_b, users_both y jaccard,
+            solo para los pares con usuarios compartidos.
+        """
+        co_exposure = (self.matrix.T @ self.matrix).tocsr()
+        users = np.asarray(co_exposure.diagonal())
+        pairs = self._pairs(co_exposure).rename(columns={"value": "users_both"})
+        pairs["jaccard"] = pairs["users_both"] / (
+            users[pairs["a"]] + users[pairs["b"]] - pairs["users_both"]
+        )
+        return pairs.drop(columns=["a", "b"]).sort_values(
+            "users_both", ascending=False, ignore_index=True
+        )
+
+    def interaction_table(self, converted_users=None):
+        """
+        Compara la conversión de los usuarios expuestos a ambos experimentos de cada
+        par con la conversión de cada experimento, usando X^T X y X^T diag(c) X.
+
+        Args:
+            converted_users (iterable, opcional): user_id de los usuarios que compraron.
+
+        Returns:
+            DataFrame: DataFrame con experiment_a, experiment_b, users_both,
+            converters_both, conversion_rate_both, conversion_rate_a y conversion_rate_b.
+        """
+        converted = self._converted_vector(converted_users).astype(np.int32)
+        co_exposure = (self.matrix.T @ self.matrix).tocsr()
+        converted_diagonal = sparse.diags(converted, dtype=np.int32)
+        co_conversion = (self.matrix.T @ converted_diagonal @ self.matrix).tocsr()
+
+        users = np.asarray(co_exposure.diagonal(), dtype=float)
+        converters = np.asarray(co_conversion.diagonal(), dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = converters / users
+
+        pairs = self._pairs(co_exposure).rename(columns={"value": "users_both"})
+        pairs["converters_both"] = np.asarray(
+            co_conversion[pairs["a"].to_numpy(), pairs["b"].to_numpy()]
+        ).ravel()
+        pairs["conversion_rate_both"] = pairs["converters_both"] / pairs["users_both"]
+        pairs["conversion_rate_a"] = rates[pairs["a"]]
+        pairs["conversion_rate_b"] = rates[pairs["b"]]
+        return pairs.drop(columns=["a", "b"]).sort_values(
+            "users_both", ascending=False, ignore_index=True
+        )
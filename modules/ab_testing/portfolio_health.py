@@ -0,0 +1,202 @@
+import pandas as pd
+from scipy.stats import chi2
+
+from modules.ab_testing.contamination import ContaminationIndex
+from modules.utils.statistical_functions import required_sample_size
+
+
+class PortfolioHealthChecker:
+    """
+    Revisión de salud de todos los experimentos de un día en una sola pasada
+    agrupada sobre los datos etiquetados: usuarios por variante, desbalance de
+    la asignación (sample ratio mismatch, SRM), contaminación, tamaño de muestra
+    y experimentos con una sola variante.
+
+    El SRM compara los usuarios de cada variante con el reparto esperado (igual
+    entre variantes si no se indica otro) mediante una prueba chi-cuadrado de
+    bondad de ajuste, calculada para todos los experimentos a la vez.
+
+    Args:
+        data (DataFrame): Datos etiquetados con las columnas experiment_name,
+        variant_id, user_id y with_purchase.
+        expected_split (dict, opcional): Por experimento, la proporción esperada
+        de usuarios de cada variante. Por defecto un reparto igual.
+        srm_alpha (float, opcional): Nivel de significancia para marcar SRM.
+        alpha (float, opcional): Nivel de significancia del tamaño de muestra.
+        power (float, opcional): Poder estadístico del tamaño de muestra.
+        effect_size (float, opcional): Tamaño del efecto del tamaño de muestra.
+
+    Methods:
+        variant_counts() -> DataFrame:
+            Cuenta usuarios, filas y compras por experimento y variante.
+
+        sample_ratio_mismatch(counts) -> DataFrame:
+            Calcula el estadístico y p-valor del SRM de cada experimento.
+
+        report() -> DataFrame:
+            Reporte de salud con una fila por experimento.
+    """
+
+    def __init__(
+        self,
+        data,
+        expected_split=None,
+        srm_alpha=0.001,
+        alpha=0.05,
+        power=0.8,
+        effect_size=0.2,
+    ):
+        """
+        Inicializa la revisión con los datos etiquetados de todos los experimentos.
+
+        Args:
+            data (DataFrame): Datos etiquetados de todos los experimentos.
+            expected_split (dict, opcional): Proporción esperada por experimento y variante.
+            srm_alpha (float, opcional): Nivel de significancia para marcar SRM.
+            alpha (float, opcional): Nivel de significancia del tamaño de muestra.
+            power (float, opcional): Poder estadístico del tamaño de muestra.
+            effect_size (float, opcional): Tamaño del efecto del tamaño de muestra.
+        """
+        self.data = data
+        self.expected_split = expected_split or {}
+        self.srm_alpha = srm_alpha
+        self.alpha = alpha
+        self.power = power
+        self.effect_size = effect_size
+
+    def variant_counts(self):
+        """
+        Cuenta, en una sola agrupación, los usuarios distintos, las filas y las
+        compras de cada experimento y variante.
+
+        Returns:
+            DataFrame: Columnas experiment_name, variant_id, users, rows y conversions.
+        """
+        return (
+            self.data.groupby(["experiment_name", "variant_id"], sort=True)
+            .agg(
+                users=("user_id", "nunique"),
+                rows=("with_purchase", "size"),
+                conversions=("with_purchase", "sum"),
+            )
+            .reset_index()
+        )
+
+    def sample_ratio_mismatch(self, counts):
+        """
+        Calcula la prueba chi-cuadrado de bondad de ajuste entre los usuarios de
+        cada variante y el reparto esperado, para todos los experimentos a la vez.
+
+        Args:
+            counts (DataFrame): Conteos obtenidos con variant_counts.
+
+        Returns:
+            DataFrame: Columnas srm_chi2 y srm_p_value indexadas por experiment_name
+            (NaN para experimentos con una sola variante).
+        """
+        by_experiment = counts.groupby("experiment_name", sort=False)
+        share = 1 / by_experiment["users"].transform("size")
+        if self.expected_split:
+            configured = pd.Series(
+                [
+                    self.expected_split.get(experiment, {}).get(variant)
+                    for experiment, variant in zip(
+                        counts["experiment_name"], counts["variant_id"]
+                    )
+                ],
+                index=counts.index,
+                dtype=float,
+            )
+            # Normaliza el reparto configurado a las variantes observadas.
+            configured = configured / configured.groupby(
+                counts["experiment_name"]
+            ).transform("sum")
+            share = configured.fillna(share)
+
+        total = by_experiment["users"].transform("sum")
+        expected = share * total
+        contributions = (counts["users"] - expected) ** 2 / expected
+        statistic = contributions.groupby(counts["experiment_name"], sort=False).sum()
+        degrees = by_experiment.size() - 1
+        p_value = pd.Series(
+            chi2.sf(statistic, degrees.reindex(statistic.index)),
+            index=statistic.index,
+        )
+        single = degrees.reindex(statistic.index) == 0
+        return pd.DataFrame(
+            {
+                "srm_chi2": statistic.mask(single),
+                "srm_p_value": p_value.mask(single),
+            }
+        )
+
+    def required_sample_size(self, n_variants):
+        """
+        Calcula el tamaño de muestra requerido por variante, con la misma prueba
+        de potencia que ChecksProcessor.check_sample_size.
+
+        Args:
+            n_variants (int): Número de variantes del experimento.
+
+        Returns:
+            float: Observaciones requeridas por variante.
+        """
+        return required_sample_size(
+            n_variants == 2, self.alpha, self.power, self.effect_size
+        )
+
+    def report(self):
+        """
+        Construye el reporte de salud con una fila por experimento.
+
+        Returns:
+            DataFrame: Columnas experiment_name, n_variants, single_variant,
+            participants, variants (usuarios por variante), srm_chi2, srm_p_value,
+            srm_detected, contaminated_users, contaminated_share, min_variant_rows,
+            required_sample_size y sample_size_adequate.
+        """
+        counts = self.variant_counts()
+        by_experiment = counts.groupby("experiment_name", sort=True)
+        report = by_experiment.agg(
+            n_variants=("variant_id", "size"),
+            min_variant_rows=("rows", "min"),
+        )
+        report["single_variant"] = report["n_variants"] == 1
+        report["variants"] = [
+            dict(zip(group["variant_id"], group["users"].astype(int)))
+            for _, group in by_experiment
+        ]
+
+        report = report.join(self.sample_ratio_mismatch(counts))
+        report["srm_detected"] = report["srm_p_value"] < self.srm_alpha
+
+        contamination = (
+            ContaminationIndex(self.data).report().set_index("experiment_name")
+        )
+        report = report.join(contamination)
+
+        required = {
+            n_variants: self.required_sample_size(n_variants)
+            for n_variants in report["n_variants"].unique()
+        }
+        report["required_sample_size"] = report["n_variants"].map(required)
+        report["sample_size_adequate"] = (
+            report["min_variant_rows"] >= report["required_sample_size"]
+        ) & ~report["single_variant"]
+        return report.reset_index()[
+            [
+                "experiment_name",
+                "n_variants",
+                "single_variant",
+                "participants",
+                "variants",
+                "srm_chi2",
+                "srm_p_value",
+                "srm_detected",
+                "contaminated_users",
+                "contaminated_share",
+                "min_variant_rows",
+                "required_sample_size",
+                "sample_size_adequate",
+            ]
+        ]
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+from modules.utils.statistical_functions import (
+    chi_square_vectorized,
+    proportions_ztest_vectorized,
+)
+
+
+SEGMENT_COLUMNS = (
+    "event_name",
+    "hour",
+    "day_of_week",
+    "exposure",
+    "prior_purchase",
+    "recent_events",
+    "time_since_previous",
+)
+
+
+class SegmentedABTestAnalyzer:
+    """
+    Clase para analizar pruebas A/B por segmentos (tipo de evento, hora del día,
+    día de la semana o historial del usuario) sin repetir el análisis por cada
+    segmento.
+
+    Las estadísticas suficientes por (segmento, variante) se obtienen con una única
+    agrupación por varias llaves y las pruebas se calculan de forma vectorizada para
+    todos los segmentos a la vez: z-test cuando el segmento tiene dos variantes y
+    Chi-cuadrado cuando tiene más de dos.
+
+    Args:
+        data (DataFrame): DataFrame con los datos etiquetados del experimento, que
+        debe contener las columnas indicadas en segment_by.
+        segment_by (list): Columnas por las que se segmenta el análisis.
+
+    Methods:
+        sufficient_statistics():
+            Calcula observaciones y conversiones por segmento y variante.
+            Returns:
+                DataFrame: Estadísticas suficientes por segmento y variante.
+
+        run_tests():
+            Ejecuta las pruebas estadísticas de todos los segmentos.
+            Returns:
+                DataFrame: Una fila por segmento con el ganador y los resultados de la prueba.
+    """
+
+    def __init__(self, data, segment_by):
+        """
+        Inicializa la instancia de SegmentedABTestAnalyzer.
+
+        Args:
+            data (DataFrame): DataFrame con los datos etiquetados del experimento.
+            segment_by (list): Columnas por las que se segmenta el análisis.
+        """
+        self.data = data
+        self.segment_by = list(segment_by)
+
+    def sufficient_statistics(self):
+        """
+        Calcula las observaciones y conversiones por segmento y variante con una
+        sola agrupación.
+
+        Returns:
+            DataFrame: DataFrame con las columnas de segmento, variant_id, nobs y conversions.
+        """
+        return (
+            self.data.groupby(self.segment_by + ["variant_id"])
+            .agg(
+                nobs=("with_purchase", "count"),
+                conversions=("with_purchase", "sum"),
+            )
+            .reset_index()
+        )
+
+    def run_tests(self):
+        """
+        Ejecuta las pruebas estadísticas para todos los segmentos a la vez.
+
+        El ganador de cada segmento es la variante con mayor tasa de conversión. Si el
+        segmento tiene dos variantes se aplica el z-test del ganador contra la otra
+        variante, y si tiene más de dos la prueba Chi-cuadrado.
+
+        Returns:
+            DataFrame: Una fila por segmento con num_of_variants, winner, test, statistic,
+            p_value, significant_difference y las estadísticas por variante en variants.
+        """
+        statistics = self.sufficient_statistics()
+        table = statistics.set_index(self.segment_by + ["variant_id"]).unstack(
+            "variant_id", fill_value=0
+        )
+        variant_ids = table["nobs"].columns.to_numpy()
+        nobs = table["nobs"].to_numpy(dtype=float)
+        conversions = table["conversions"].to_numpy(dtype=float)
+
+        present = nobs > 0
+        num_of_variants = present.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.where(present, conversions / nobs, -np.inf)
+        winner_idx = rates.argmax(axis=1)
+        rows = np.arange(len(nobs))
+
+        winner_conversions = conversions[rows, winner_idx]
+        winner_nobs = nobs[rows, winner_idx]
+        z_stat, z_pval, _, _ = proportions_ztest_vectorized(
+            winner_conversions,
+            winner_nobs,
+            conversions.sum(axis=1) - winner_conversions,
+            nobs.sum(axis=1) - winner_nobs,
+        )
+        chi2_stat, chi2_pval = chi_square_vectorized(conversions, nobs)
+
+        is_two = num_of_variants == 2
+        is_multi = num_of_variants > 2
+        statistic = np.where(is_two, z_stat, np.where(is_multi, chi2_stat, np.nan))
+        p_value = np.where(is_two, z_pval, np.where(is_multi, chi2_pval, np.nan))
+
+        results = table.index.to_frame(index=False)
+        results["num_of_variants"] = num_of_variants
+        results["winner"] = variant_ids[winner_idx]
+        results["test"] = np.where(
+            is_two, "z-test", np.where(is_multi, "chi_square", None)
+        )
+        results["statistic"] = statistic
+        results["p_value"] = p_value
+        results["significant_difference"] = p_value < 0.05
+        results["variants"] = [
+            [
+                {
+                    "id": variant_ids[j],
+                    "nobs": int(nobs[i, j]),
+                    "number_of_purchases": int(conversions[i, j]),
+                }
+                for j in np.flatnonzero(present[i])
+            ]
+            for i in rows
+        ]
+        return results
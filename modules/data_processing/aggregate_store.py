@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+LABEL_KEYS = ["event_name", "experiment_name", "variant_id", "user_id"]
+
+
+def windows_key(time_windows: dict) -> str:
+    """
+    Construye una llave corta para un conjunto de ventanas de atribución.
+
+    Args:
+        time_windows (dict): Ventanas de atribución ya combinadas con las por defecto.
+
+    Returns:
+        str: Llave de las ventanas.
+    """
+    payload = json.dumps(time_windows, sort_keys=True).encode()
+    return hashlib.sha1(payload).hexdigest()[:12]
+
+
+def merge_partials(partials: list) -> pd.DataFrame:
+    """
+    Une los agregados diarios de varios días en datos etiquetados por usuario.
+
+    Los usuarios que aparecen en varios días se cuentan una sola vez por evento,
+    experimento y variante: los intentos se suman (los timestamps de días
+    distintos no se repiten), las compras se suman por día y el usuario
+    convierte si compró en alguno de los días.
+
+    Args:
+        partials (list): DataFrames etiquetados de cada día.
+
+    Returns:
+        pd.DataFrame: DataFrame con las columnas de label_experiments.
+    """
+    partials = [partial for partial in partials if not partial.empty]
+    if not partials:
+        return pd.DataFrame()
+    if len(partials) == 1:
+        return partials[0].reset_index(drop=True)
+
+    merged = (
+        pd.concat(partials, ignore_index=True)
+        .groupby(LABEL_KEYS, sort=False)
+        .agg(purchases=("purchases", "sum"), attempts=("attempts", "sum"))
+        .reset_index()
+    )
+    merged["with_purchase"] = merged["purchases"] > 0
+    return merged
+
+
+class DayAggregateStore:
+    """
+    Almacén de agregados parciales por día: para cada (experimento, variante,
+    día) guarda los códigos de los usuarios, con sus intentos y compras, en un
+    archivo .npz compacto por día. Los rangos de fechas se responden uniendo
+    los días del rango sin volver a procesar los eventos crudos.
+
+    Los agregados se guardan bajo la generación del dataset y la llave de las
+    ventanas de atribución, por lo que un dataset nuevo o ventanas distintas
+    nunca reutilizan agregados calculados con otros datos. Los agregados de
+    generaciones anteriores solo se eliminan con remove_stale_generations.
+
+    Args:
+        directory (str): Carpeta del almacén.
+        generation (str): Generación del dataset.
+
+    Methods:
+        has(day, time_windows) -> bool:
+            Indica si existe el agregado del día.
+
+        write(day, time_windows, labeled: pd.DataFrame):
+            Guarda el agregado de un día a partir de sus datos etiquetados.
+
+        read(day, time_windows, experiment_name=None) -> pd.DataFrame:
+            Lee el agregado de un día como datos etiquetados.
+
+        remove_stale_generations(keep=()):
+            Elimina los agregados de las demás generaciones.
+    """
+
+    def __init__(self, directory, generation):
+        """
+        Inicializa el almacén.
+
+        Args:
+            directory (str): Carpeta del almacén.
+            generation (str): Generación del dataset.
+        """
+        self.directory = directory
+        self.generation = generation
+
+    def remove_stale_generations(self, keep=()):
+        """
+        Elimina los agregados de las generaciones distintas de la del almacén y
+        de las indicadas en keep. Debe ejecutarse una vez al publicarse una nueva
+        generación, no en cada solicitud.
+
+        Args:
+            keep (iterable, opcional): Generaciones que se conservan, por ejemplo
+            la anterior, que aún pueden estar leyendo solicitudes en curso.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        keep = {self.generation, *keep}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name not in keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def path(self, day, time_windows):
+        return os.path.join(
+            self.directory,
+            self.generation,
+            windows_key(time_windows),
+            f"date={day:%Y-%m-%d}.npz",
+        )
+
+    def has(self, day, time_windows):
+        """
+        Indica si existe el agregado del día.
+
+        Args:
+            day (datetime): Día.
+            time_windows (dict): Ventanas de atribución.
+
+        Returns:
+            bool: True si el agregado existe.
+        """
+        return os.path.exists(self.path(day, time_windows))
+
+    def write(self, day, time_windows, labeled):
+        """
+        Guarda el agregado de un día. Los nombres de eventos, experimentos y
+        variantes y los user_id (enteros o texto) se guardan una vez y cada fila
+        solo guarda sus códigos.
+
+        Args:
+            day (datetime): Día.
+            time_windows (dict): Ventanas de atribución.
+            labeled (pd.DataFrame): Datos etiquetados del día (todos los experimentos).
+        """
+        path = self.path(day, time_windows)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if labeled.empty:
+            labeled = pd.DataFrame(
+                columns=LABEL_KEYS + ["purchases", "attempts", "with_purchase"]
+            )
+
+        arrays = {}
+        for column in ("event_name", "experiment_name", "variant_id"):
+            codes, categories = pd.factorize(labeled[column].astype(str))
+            arrays[column] = codes.astype(np.int32)
+            arrays[column + "_categories"] = np.asarray(categories, dtype=str)
+        user_codes, users = pd.factorize(labeled["user_id"])
+        users = np.asarray(users)
+        if users.dtype == object:
+            users = users.astype(str)
+        arrays["user_id"] = user_codes.astype(np.int64)
+        arrays["user_id_categories"] = users
+        arrays["purchases"] = labeled["purchases"].to_numpy(np.int32)
+        arrays["attempts"] = labeled["attempts"].to_numpy(np.int32)
+
+        temporary_path = path + ".tmp.npz"
+        np.savez_compressed(temporary_path, **arrays)
+        os.replace(temporary_path, path)
+
+    def read(self, day, time_windows, experiment_name=None):
+        """
+        Lee el agregado de un día como datos etiquetados.
+
+        Args:
+            day (datetime): Día.
+            time_windows (dict): Ventanas de atribución.
+            experiment_name (str, opcional): Experimento a leer. Por defecto todos.
+
+        Returns:
+            pd.DataFrame: DataFrame con las columnas de label_experiments.
+        """
+        with np.load(self.path(day, time_windows)) as arrays:
+            mask = slice(None)
+            if experiment_name is not None:
+                categories = arrays["experiment_name_categories"]
+                matches = np.flatnonzero(categories == experiment_name)
+                if len(matches) == 0:
+                    return pd.DataFrame()
+                mask = arrays["experiment_name"] == matches[0]
+
+            labeled = pd.DataFrame(
+                {
+                    column: arrays[column + "_categories"][
+                        arrays[column][mask]
+                    ].astype(object)
+                    for column in ("event_name", "experiment_name", "variant_id")
+                }
+            )
+            users = arrays["user_id_categories"]
+            if users.dtype.kind == "U":
+                users = users.astype(object)
+            labeled["user_id"] = users[arrays["user_id"][mask]]
+            labeled["purchases"] = arrays["purchases"][mask].astype(np.int64)
+            labeled["attempts"] = arrays["attempts"][mask].astype(np.int64)
+        labeled["with_purchase"] = labeled["purchases"] > 0
+        return labeled
@@ -1,55 +1,645 @@
+import gzip
+import hashlib
+import logging
 import os
-from io import StringIO
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from io import BytesIO
+from time import monotonic
 
 from google.cloud import storage
 from google.oauth2 import service_account
 from dotenv import load_dotenv
 import pandas as pd
 
-from modules.data_processing.data_processor import ExperimentProcessor
+from modules.data_processing.aggregate_store import DayAggregateStore, merge_partials
+from modules.data_processing.data_processor import (
+    ExperimentProcessor,
+    resolve_time_windows,
+)
+from modules.data_processing.duckdb_data_processor import DuckDBExperimentProcessor
+from modules.data_processing.history_features import (
+    HISTORY_SEGMENTS,
+    HistoryStateStore,
+    advance_history_state,
+    empty_history_state,
+)
+from modules.data_processing.latency import (
+    LatencySketchStore,
+    event_latencies,
+    hourly_latency_sketches,
+)
+from modules.data_processing.memory_planner import plan_processing
+from modules.data_processing.participant_sketches import (
+    ParticipantSketchStore,
+    event_conversions,
+)
+from modules.utils.profiling import stage
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 credentials_path_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 file_name = os.getenv("EXPERIMENTS_FILE_NAME")
 bucket_name = os.getenv("BUCKET_NAME")
+partitions_prefix = os.getenv("EXPERIMENTS_PARTITIONS_PREFIX")
+storage_max_workers = int(os.getenv("STORAGE_MAX_WORKERS", 8))
+processing_engine = os.getenv("PROCESSING_ENGINE", "pandas").lower()
 
+LOCAL_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+CSV_SUFFIXES = (".csv", ".csv.gz", ".csv.zst")
+RAW_COLUMNS = ["event_name", "item_id", "timestamp", "site", "experiments", "user_id"]
 
-def read_csv_from_gcs(bucket_name, file_name):
+_storage_backend = None
+_aggregate_store = None
+_aggregate_store_checked_at = 0.0
+_aggregate_store_lock = threading.Lock()
+_dataset_cache = {}
+_dataset_cache_lock = threading.Lock()
+_latency_store = None
+_latency_store_lock = threading.Lock()
+_sketch_store = None
+_sketch_store_lock = threading.Lock()
+_history_store = None
+_history_store_lock = threading.Lock()
+
+
+def get_storage_client():
     """
-    Carga los datos del archivo CSV desde un bucket en GCS.
+    Crea el cliente de GCS, usando el archivo de credenciales en ambiente local.
 
     Returns:
-        pd.DataFrame: DataFrame con los datos cargados del archivo CSV.
+        storage.Client: Cliente de Google Cloud Storage.
     """
     if os.getenv('ENV') == 'local':
         credentials_path_file = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
         credentials = service_account.Credentials.from_service_account_file(
             credentials_path_file
         )
-        storage_client = storage.Client(credentials=credentials)
+        return storage.Client(credentials=credentials)
+    return storage.Client()
+
+
+class StorageBackend(ABC):
+    """
+    Interfaz de almacenamiento de objetos usada para leer y escribir los eventos.
+
+    Methods:
+        list_objects(prefix: str) -> list:
+            Lista los nombres de los objetos que empiezan con el prefijo.
+        read_bytes(name: str) -> bytes:
+            Lee el contenido de un objeto.
+        write_bytes(name: str, payload: bytes):
+            Escribe el contenido de un objeto.
+        local_path(name: str, directory: str) -> str:
+            Obtiene una ruta local con el contenido del objeto.
+        object_versions(prefix: str) -> dict:
+            Obtiene la versión de cada objeto que empieza con el prefijo.
+    """
+
+    @abstractmethod
+    def list_objects(self, prefix: str) -> list:
+        """
+        Lista los nombres de los objetos que empiezan con el prefijo.
+        """
+
+    @abstractmethod
+    def read_bytes(self, name: str) -> bytes:
+        """
+        Lee el contenido de un objeto.
+        """
+
+    @abstractmethod
+    def write_bytes(self, name: str, payload: bytes):
+        """
+        Escribe el contenido de un objeto.
+        """
+
+    def local_path(self, name: str, directory: str) -> str:
+        path = os.path.join(directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(self.read_bytes(name))
+        return path
+
+    @abstractmethod
+    def object_versions(self, prefix: str) -> dict:
+        """
+        Obtiene la versión de cada objeto que empieza con el prefijo.
+        """
+
+
+class GCSStorageBackend(StorageBackend):
+    """
+    Almacenamiento en un bucket de Google Cloud Storage.
+
+    Args:
+        bucket_name (str): Nombre del bucket.
+    """
+
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_storage_client()
+        return self._client
+
+    def list_objects(self, prefix: str) -> list:
+        return sorted(
+            blob.name for blob in self.client.list_blobs(self.bucket_name, prefix=prefix)
+        )
+
+    def read_bytes(self, name: str) -> bytes:
+        return self.client.bucket(self.bucket_name).blob(name).download_as_bytes()
+
+    def write_bytes(self, name: str, payload: bytes):
+        self.client.bucket(self.bucket_name).blob(name).upload_from_string(payload)
+
+    def local_path(self, name: str, directory: str) -> str:
+        path = os.path.join(directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.client.bucket(self.bucket_name).blob(name).download_to_filename(path)
+        return path
+
+    def object_versions(self, prefix: str) -> dict:
+        return {
+            blob.name: str(blob.generation)
+            for blob in self.client.list_blobs(self.bucket_name, prefix=prefix)
+        }
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Almacenamiento en una carpeta local, donde los nombres de los objetos son
+    rutas relativas a la carpeta raíz.
+
+    Args:
+        root_dir (str): Carpeta raíz.
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+
+    def list_objects(self, prefix: str) -> list:
+        names = []
+        for current_dir, _, files in os.walk(self.root_dir):
+            for file in files:
+                path = os.path.join(current_dir, file)
+                name = os.path.relpath(path, self.root_dir).replace(os.sep, "/")
+                if name.startswith(prefix):
+                    names.append(name)
+        return sorted(names)
+
+    def read_bytes(self, name: str) -> bytes:
+        with open(os.path.join(self.root_dir, name), "rb") as file:
+            return file.read()
+
+    def write_bytes(self, name: str, payload: bytes):
+        path = os.path.join(self.root_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(payload)
+
+    def local_path(self, name: str, directory: str) -> str:
+        return os.path.join(self.root_dir, name)
+
+    def object_versions(self, prefix: str) -> dict:
+        versions = {}
+        for name in self.list_objects(prefix):
+            stat = os.stat(os.path.join(self.root_dir, name))
+            versions[name] = f"{stat.st_mtime_ns}-{stat.st_size}"
+        return versions
+
+
+def get_storage_backend() -> StorageBackend:
+    """
+    Obtiene el almacenamiento configurado. Con STORAGE_BACKEND=local se usa la
+    carpeta LOCAL_DATA_DIR (./data/raw_data por defecto), y en otro caso el
+    bucket BUCKET_NAME de GCS.
+
+    Returns:
+        StorageBackend: Almacenamiento de los eventos.
+    """
+    global _storage_backend
+    if _storage_backend is None:
+        if os.getenv("STORAGE_BACKEND", "gcs").lower() == "local":
+            _storage_backend = LocalStorageBackend(
+                os.getenv("LOCAL_DATA_DIR", "./data/raw_data")
+            )
+        else:
+            _storage_backend = GCSStorageBackend(bucket_name)
+    return _storage_backend
+
+
+def set_storage_backend(backend: StorageBackend):
+    """
+    Reemplaza el almacenamiento usado por el cargador, por ejemplo para
+    trabajar sobre una carpeta local en pruebas.
+
+    Args:
+        backend (StorageBackend): Almacenamiento a usar, o None para volver
+        a la configuración por variables de entorno.
+    """
+    global _storage_backend
+    _storage_backend = backend
+
+
+def use_local_dataset(root_dir: str, name: str = "experiments_dataset.csv"):
+    """
+    Configura el cargador para leer todos los eventos de un archivo (o prefijo)
+    de una carpeta local, ignorando el bucket y las particiones configuradas.
+    Se usa en las pruebas de carga con datos sintéticos.
+
+    Args:
+        root_dir (str): Carpeta raíz de los datos.
+        name (str, opcional): Archivo o prefijo de los eventos dentro de root_dir.
+    """
+    global file_name, partitions_prefix
+    set_storage_backend(LocalStorageBackend(root_dir))
+    file_name = name
+    partitions_prefix = None
+
+
+def decompress(name: str, payload: bytes) -> bytes:
+    """
+    Descomprime el contenido de un objeto según su extensión (.gz o .zst).
+
+    Args:
+        name (str): Nombre del objeto.
+        payload (bytes): Contenido del objeto.
+
+    Returns:
+        bytes: Contenido descomprimido.
+
+    Raises:
+        ImportError: Si el objeto está comprimido con zstd y no está instalado zstandard.
+    """
+    if name.endswith(".gz"):
+        return gzip.decompress(payload)
+    if name.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError as error:
+            raise ImportError(
+                "zstandard is required to read .zst objects: pip install zstandard"
+            ) from error
+        return zstandard.ZstdDecompressor().stream_reader(BytesIO(payload)).read()
+    return payload
+
+
+def read_csv_objects(backend: StorageBackend, names: list, max_workers=None):
+    """
+    Descarga, descomprime y lee varios objetos CSV en paralelo con un pool
+    de hilos acotado, y concatena el resultado.
+
+    Args:
+        backend (StorageBackend): Almacenamiento de los objetos.
+        names (list): Nombres de los objetos a leer.
+        max_workers (int, opcional): Número máximo de descargas concurrentes
+        (STORAGE_MAX_WORKERS por defecto).
+
+    Returns:
+        pd.DataFrame: DataFrame con los datos de todos los objetos.
+    """
+    if not names:
+        return pd.DataFrame(columns=RAW_COLUMNS)
+
+    def read_object(name):
+        return pd.read_csv(BytesIO(decompress(name, backend.read_bytes(name))))
+
+    with ThreadPoolExecutor(max_workers=max_workers or storage_max_workers) as executor:
+        frames = list(executor.map(read_object, names))
+    return pd.concat(frames, ignore_index=True)
+
+
+def list_csv_objects(backend: StorageBackend, prefix: str) -> list:
+    """
+    Lista los objetos CSV (comprimidos o no) que empiezan con el prefijo.
+
+    Args:
+        backend (StorageBackend): Almacenamiento de los objetos.
+        prefix (str): Prefijo, que puede ser el nombre de un único archivo.
+
+    Returns:
+        list: Nombres de los objetos CSV.
+    """
+    return [name for name in backend.list_objects(prefix) if name.endswith(CSV_SUFFIXES)]
+
+
+def partition_name(prefix: str, partition_hour: datetime) -> str:
+    """
+    Construye el prefijo de la partición de eventos de una hora.
+
+    Args:
+        prefix (str): Prefijo (carpeta local o ruta en el bucket) de las particiones.
+        partition_hour (datetime): Fecha y hora (hora local del evento) de la partición.
+
+    Returns:
+        str: Prefijo con el formato <prefix>/date=YYYY-MM-DD/hour=HH/, bajo el cual
+        puede haber uno o varios archivos CSV, comprimidos o no.
+    """
+    return f"{prefix}/date={partition_hour:%Y-%m-%d}/hour={partition_hour:%H}/"
+
+
+def partition_hours(start: datetime, end: datetime) -> list:
+    """
+    Lista las horas cuyas particiones se solapan con el rango [start, end).
+
+    Args:
+        start (datetime): Inicio del rango.
+        end (datetime): Fin del rango, excluyente.
+
+    Returns:
+        list: Lista de datetimes, una por cada hora del rango.
+    """
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    hours = []
+    while hour < end:
+        hours.append(hour)
+        hour += timedelta(hours=1)
+    return hours
+
+
+def day_time_range(date, is_same_day=False, spillover_minutes=0):
+    """
+    Calcula el rango de tiempo de eventos que se necesita para procesar un día.
+
+    Args:
+        date (datetime): Día solicitado.
+        is_same_day (bool, opcional): Si es True, solo se consideran los eventos y
+        compras del mismo día. Si es False, se agregan los minutos de la ventana de
+        atribución del día posterior para las compras.
+        spillover_minutes (float, opcional): Minutos adicionales después del día.
+
+    Returns:
+        tuple: Inicio y fin (excluyente) del rango en hora local.
+    """
+    start = datetime.combine(date.date(), time())
+    end = start + timedelta(days=1)
+    if not is_same_day:
+        end += timedelta(minutes=spillover_minutes)
+    return start, end
+
+
+def filter_time_range(data: pd.DataFrame, start: datetime, end: datetime):
+    """
+    Filtra los eventos cuya hora local está en el rango [start, end), comparando
+    el texto del timestamp sin necesidad de convertirlo.
+
+    Args:
+        data (pd.DataFrame): Eventos crudos con la columna timestamp.
+        start (datetime): Inicio del rango.
+        end (datetime): Fin del rango, excluyente.
+
+    Returns:
+        pd.DataFrame: Eventos dentro del rango.
+    """
+    local_time = data["timestamp"].astype(str).str.slice(0, 19)
+    return data[
+        (local_time >= start.strftime(LOCAL_TIME_FORMAT))
+        & (local_time < end.strftime(LOCAL_TIME_FORMAT))
+    ]
+
+
+def write_partitions(data: pd.DataFrame, prefix: str, backend=None, compress=False):
+    """
+    Guarda los eventos crudos particionados por fecha y hora local.
+
+    Args:
+        data (pd.DataFrame): Eventos crudos con la columna timestamp.
+        prefix (str): Prefijo de las particiones.
+        backend (StorageBackend, opcional): Almacenamiento donde se escriben las
+        particiones. Por defecto el configurado con get_storage_backend.
+        compress (bool, opcional): Si es True, las particiones se comprimen con gzip.
+
+    Returns:
+        list: Nombres de los objetos escritos.
+    """
+    backend = backend or get_storage_backend()
+    local_time = data["timestamp"].astype(str)
+
+    names = []
+    for (day, hour), partition in data.groupby(
+        [local_time.str.slice(0, 10), local_time.str.slice(11, 13)]
+    ):
+        partition_hour = datetime.strptime(f"{day} {hour}", "%Y-%m-%d %H")
+        name = partition_name(prefix, partition_hour) + "events.csv"
+        payload = partition.to_csv(index=False).encode()
+        if compress:
+            name += ".gz"
+            payload = gzip.compress(payload)
+        backend.write_bytes(name, payload)
+        names.append(name)
+    return names
+
+
+def list_partition_objects(prefix: str, start: datetime, end: datetime, backend):
+    """
+    Lista los objetos CSV de las particiones que se solapan con [start, end).
+
+    Args:
+        prefix (str): Prefijo de las particiones.
+        start (datetime): Inicio del rango.
+        end (datetime): Fin del rango, excluyente.
+        backend (StorageBackend): Almacenamiento de las particiones.
+
+    Returns:
+        list: Nombres de los objetos de las particiones.
+    """
+    hours = partition_hours(start, end)
+    partitions = tuple(partition_name(prefix, hour) for hour in hours)
+    days = sorted({hour.strftime("%Y-%m-%d") for hour in hours})
+    return [
+        name
+        for day in days
+        for name in list_csv_objects(backend, f"{prefix}/date={day}/")
+        if name.startswith(partitions)
+    ]
+
+
+def read_partitions(prefix: str, start: datetime, end: datetime, backend=None):
+    """
+    Lee únicamente las particiones de eventos que se solapan con [start, end),
+    descargando en paralelo todos los archivos de cada partición.
+
+    Args:
+        prefix (str): Prefijo de las particiones.
+        start (datetime): Inicio del rango.
+        end (datetime): Fin del rango, excluyente.
+        backend (StorageBackend, opcional): Almacenamiento de las particiones.
+        Por defecto el configurado con get_storage_backend.
+
+    Returns:
+        pd.DataFrame: Eventos crudos dentro del rango.
+    """
+    backend = backend or get_storage_backend()
+    names = list_partition_objects(prefix, start, end, backend)
+    data = read_csv_objects(backend, names)
+    return filter_time_range(data, start, end)
+
+
+def load_day_data(date, is_same_day=False, spillover_minutes=0):
+    """
+    Carga los eventos crudos necesarios para procesar un día. Si existen
+    particiones por fecha y hora (EXPERIMENTS_PARTITIONS_PREFIX) solo se leen las
+    del día y las horas del día siguiente cubiertas por la ventana de atribución.
+
+    Args:
+        date (datetime): Día solicitado.
+        is_same_day (bool, opcional): Si es True, solo carga eventos del mismo día.
+        spillover_minutes (float, opcional): Minutos del día siguiente que se
+        cargan para atribuir compras a los eventos del día.
+
+    Returns:
+        pd.DataFrame: Eventos crudos del rango necesario.
+    """
+    start, end = day_time_range(date, is_same_day, spillover_minutes)
+    if partitions_prefix:
+        return read_partitions(partitions_prefix, start, end)
+    return filter_time_range(get_all_data(), start, end)
+
+
+def label_day_out_of_core(
+    date, is_same_day=False, time_windows=None, experiment_name=None, sample_rate=None
+):
+    """
+    Etiqueta los experimentos de un día con el motor fuera de memoria (DuckDB).
+    Los objetos necesarios se descargan en paralelo a una carpeta temporal (o se
+    leen directamente si el almacenamiento es local) y se procesan sin cargarlos
+    en pandas, con el límite de memoria DUCKDB_MEMORY_LIMIT.
+
+    Args:
+        date (datetime): Día solicitado.
+        is_same_day (bool, opcional): Si es True, solo usa eventos y compras del mismo día.
+        time_windows (dict, opcional): Ventanas de atribución en minutos
+        por tipo de evento.
+        experiment_name (str, opcional): Experimento a procesar. Por defecto todos.
+        sample_rate (float, opcional): Fracción de usuarios a procesar, elegidos
+        por hash de user_id dentro de la consulta, antes de la atribución.
+
+    Returns:
+        pd.DataFrame: DataFrame con los datos procesados de los experimentos.
+    """
+    spillover_minutes = max(resolve_time_windows(time_windows).values())
+    start, end = day_time_range(date, is_same_day, spillover_minutes)
+    backend = get_storage_backend()
+    if partitions_prefix:
+        names = list_partition_objects(partitions_prefix, start, end, backend)
     else:
-        storage_client = storage.Client()
-    
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(file_name)
-    data = blob.download_as_text()
-    df = pd.read_csv(StringIO(data))
+        names = list_csv_objects(backend, file_name)
+    if not names:
+        return pd.DataFrame()
 
-    return df
+    with tempfile.TemporaryDirectory() as directory:
+        with ThreadPoolExecutor(max_workers=storage_max_workers) as executor:
+            paths = list(
+                executor.map(lambda name: backend.local_path(name, directory), names)
+            )
+        with stage("duckdb_label_experiments") as record:
+            processor = DuckDBExperimentProcessor(paths, time_windows)
+            processed_data = processor.label_experiments(
+                None if is_same_day else date, experiment_name, (start, end), sample_rate
+            )
+            record["rows"] = len(processed_data)
+    if processed_data.empty:
+        return pd.DataFrame()
+    return processed_data
+
+
+def label_with_plan(processor: ExperimentProcessor, label):
+    """
+    Ejecuta un etiquetado según el plan de memoria (plan_processing): de una
+    vez o, si el pico estimado supera el presupuesto, por grupos de usuarios,
+    uniendo los resultados de los grupos. Todas las rutas de etiquetado con
+    pandas pasan por aquí, por lo que comparten la misma protección de memoria.
 
+    Args:
+        processor (ExperimentProcessor): Procesador con los eventos cargados.
+        label (callable): Función que recibe un ExperimentProcessor y devuelve
+        un DataFrame o una lista o tupla de DataFrames por usuario.
 
-def read_csv_from_local_folder():
+    Returns:
+        tuple: Resultado de label (unido entre los grupos) y MemoryPlan.
     """
-    Carga los datos del archivo CSV.
+    plan = plan_processing(processor.data, generation=current_dataset_generation())
+    if not plan.chunked:
+        return label(processor), plan
+
+    logger.warning(
+        "Estimated %.0f MB exceeds the %.0f MB budget, labeling in %d user chunks",
+        plan.estimated_bytes / 2**20,
+        plan.budget_bytes / 2**20,
+        plan.n_chunks,
+    )
+    results = []
+    for chunk in processor.user_chunks(plan.n_chunks):
+        with stage("label_chunk"):
+            results.append(label(chunk))
+    if isinstance(results[0], pd.DataFrame):
+        return pd.concat(results, ignore_index=True), plan
+    return (
+        type(results[0])(
+            pd.concat(parts, ignore_index=True) for parts in zip(*results)
+        ),
+        plan,
+    )
+
+
+def load_and_process_all_data(
+    date, is_same_day=False, time_windows=None, sample_rate=None
+):
+    """
+    Carga y procesa los datos de todos los experimentos de un día,
+    etiquetándolos en función de si resultaron en una compra.
+
+    Args:
+        date (datetime): Fecha específica para filtrar los datos.
+        is_same_day (bool, opcional): Si es True, filtra los datos
+        para incluir solo los eventos del mismo día.
+        Si es False, toma datos del posterior día.
+        time_windows (dict, opcional): Ventanas de atribución en minutos
+        por tipo de evento.
+        sample_rate (float, opcional): Fracción de usuarios a procesar,
+        elegidos por hash de user_id.
 
     Returns:
-        pd.DataFrame: DataFrame con los datos cargados del archivo CSV.
+        pd.DataFrame: DataFrame con los datos procesados de todos los
+        experimentos para la fecha especificada.
     """
-    df = pd.read_csv("./data/raw_data/experiments_dataset.csv")
-    return df
+    if processing_engine == "duckdb":
+        return label_day_out_of_core(
+            date, is_same_day, time_windows, sample_rate=sample_rate
+        )
+
+    spillover_minutes = max(resolve_time_windows(time_windows).values())
+    with stage("load_day_data") as record:
+        data = load_day_data(date, is_same_day, spillover_minutes)
+        record["rows"] = len(data)
+    if data.empty:
+        return pd.DataFrame()
+
+    processor = ExperimentProcessor(data, time_windows, sample_rate)
+    if processor.data.empty:
+        return pd.DataFrame()
+
+    with stage("label_experiments") as record:
+        date = None if is_same_day else date
+        processed_data, plan = label_with_plan(
+            processor, lambda chunk: chunk.label_experiments(date)
+        )
+        record["rows"] = len(processed_data)
+        record["memory_plan"] = plan.to_dict()
+    return processed_data
 
 
-def load_and_process_data(id: str, date, is_same_day=False):
+def load_and_process_data(
+    id: str, date, is_same_day=False, time_windows=None, sample_rate=None
+):
     """
     Carga y procesa los datos de experimentos, etiquetándolos
     en función de si resultaron en una compra.
@@ -60,25 +650,624 @@ def load_and_process_data(id: str, date, is_same_day=False):
         is_same_day (bool, opcional): Si es True, filtra los datos
         para incluir solo los eventos del mismo día.
         Si es False, toma datos del posterior día.
+        time_windows (dict, opcional): Ventanas de atribución en minutos
+        por tipo de evento.
+        sample_rate (float, opcional): Fracción de usuarios a procesar,
+        elegidos por hash de user_id.
 
     Returns:
         pd.DataFrame: DataFrame con los datos procesados y
         filtrados por el experimento y la fecha especificada.
     """
-
-    data = read_csv_from_gcs(bucket_name, file_name)
-    if is_same_day:
-        data = data[(data["timestamp"].dt.date == date.date())]
-        processor = ExperimentProcessor(data)
-        processed_data = processor.label_experiments()
-        processed_data = processed_data[(processed_data["experiment_name"] == id)]
-    else:
-        processor = ExperimentProcessor(data)
-        processed_data = processor.label_experiments(date)
-        processed_data = processed_data[(processed_data["experiment_name"] == id)]
+    with stage("load_and_process_data") as record:
+        if processing_engine == "duckdb":
+            processed_data = label_day_out_of_core(
+                date, is_same_day, time_windows, id, sample_rate
+            )
+        else:
+            processed_data = load_and_process_all_data(
+                date, is_same_day, time_windows, sample_rate
+            )
+            if not processed_data.empty:
+                processed_data = processed_data[(processed_data["experiment_name"] == id)]
+        record["rows"] = len(processed_data)
     return processed_data
 
 
+def publish_aggregate_generation(generation) -> DayAggregateStore:
+    """
+    Cambia el almacén de agregados del proceso a una generación del dataset y,
+    solo si la generación cambió, elimina los agregados de las generaciones
+    anteriores salvo la inmediatamente anterior, que aún pueden estar leyendo
+    solicitudes en curso.
+
+    Args:
+        generation (str): Generación del dataset.
+
+    Returns:
+        DayAggregateStore: Almacén de la generación.
+    """
+    global _aggregate_store, _aggregate_store_checked_at
+    with _aggregate_store_lock:
+        previous = _aggregate_store
+        _aggregate_store_checked_at = monotonic()
+        if previous is not None and previous.generation == generation:
+            return previous
+        _aggregate_store = DayAggregateStore(
+            os.getenv("AGGREGATE_STORE_DIR", "./data/processed_data/aggregates"),
+            generation,
+        )
+        store = _aggregate_store
+    store.remove_stale_generations(keep=[previous.generation] if previous else [])
+    logger.info("Using day aggregates of dataset generation %s", generation)
+    return store
+
+
+def get_aggregate_store() -> DayAggregateStore:
+    """
+    Obtiene el almacén de agregados diarios del proceso. La generación del
+    dataset (que requiere listar sus archivos) se consulta al crearlo y luego
+    como máximo cada AGGREGATE_GENERATION_TTL segundos (300 por defecto), no en
+    cada solicitud.
+
+    Returns:
+        DayAggregateStore: Almacén de la generación vigente.
+    """
+    ttl_seconds = float(os.getenv("AGGREGATE_GENERATION_TTL", 300))
+    with _aggregate_store_lock:
+        store = _aggregate_store
+        if (
+            store is not None
+            and monotonic() - _aggregate_store_checked_at < ttl_seconds
+        ):
+            return store
+    return publish_aggregate_generation(dataset_generation())
+
+
+def current_dataset_generation() -> str:
+    """
+    Obtiene la generación del dataset con la que trabaja el proceso, la misma
+    del almacén de agregados, sin listar los archivos en cada llamada.
+
+    Returns:
+        str: Identificador de la generación del dataset.
+    """
+    return get_aggregate_store().generation
+
+
+def stored_day_aggregates(start_date, end_date, windows, aggregate_store=None):
+    """
+    Asegura que cada día del rango tenga su agregado guardado: los días que aún
+    no lo tienen se procesan una vez (para todos los experimentos) y se guardan.
+
+    Args:
+        start_date (datetime): Primer día del rango.
+        end_date (datetime): Último día del rango, incluido.
+        windows (dict): Ventanas de atribución ya combinadas con las por defecto.
+        aggregate_store (DayAggregateStore, opcional): Almacén de agregados. Por
+        defecto el del proceso (get_aggregate_store), en AGGREGATE_STORE_DIR.
+
+    Returns:
+        tuple: Almacén de agregados y lista de días (datetime) del rango.
+    """
+    if aggregate_store is None:
+        aggregate_store = get_aggregate_store()
+    days = [
+        day.to_pydatetime()
+        for day in pd.date_range(start_date.date(), end_date.date(), freq="D")
+    ]
+    for day in days:
+        if not aggregate_store.has(day, windows):
+            aggregate_store.write(
+                day, windows, load_and_process_all_data(day, time_windows=windows)
+            )
+    return aggregate_store, days
+
+
+def load_and_process_range(
+    id: str, start_date, end_date, time_windows=None, aggregate_store=None
+):
+    """
+    Carga los datos etiquetados de un experimento para un rango de días,
+    uniendo los agregados diarios guardados. Los días que aún no tienen agregado
+    se procesan una vez (para todos los experimentos) y se guardan.
+
+    Args:
+        id (str): Identificador del experimento que se desea filtrar.
+        start_date (datetime): Primer día del rango.
+        end_date (datetime): Último día del rango, incluido.
+        time_windows (dict, opcional): Ventanas de atribución en minutos
+        por tipo de evento.
+        aggregate_store (DayAggregateStore, opcional): Almacén de agregados. Por
+        defecto el del proceso (get_aggregate_store), en AGGREGATE_STORE_DIR.
+
+    Returns:
+        pd.DataFrame: DataFrame etiquetado del experimento, con una fila por
+        usuario para todo el rango.
+    """
+    windows = resolve_time_windows(time_windows)
+    with stage("day_partials"):
+        aggregate_store, days = stored_day_aggregates(
+            start_date, end_date, windows, aggregate_store
+        )
+    partials = [aggregate_store.read(day, windows, id) for day in days]
+    with stage("merge_partials") as record:
+        merged = merge_partials(partials)
+        record["rows"] = len(merged)
+    return merged
+
+
+def get_sketch_store() -> ParticipantSketchStore:
+    """
+    Obtiene el almacén de sketches de participantes de la generación vigente del
+    dataset, en SKETCH_STORE_DIR. Al cambiar la generación se eliminan los
+    sketches de las anteriores salvo la inmediatamente anterior.
+
+    Returns:
+        ParticipantSketchStore: Almacén de la generación vigente.
+    """
+    global _sketch_store
+    generation = current_dataset_generation()
+    with _sketch_store_lock:
+        previous = _sketch_store
+        if previous is not None and previous.generation == generation:
+            return previous
+        _sketch_store = ParticipantSketchStore(
+            os.getenv("SKETCH_STORE_DIR", "./data/processed_data/sketches"),
+            generation,
+        )
+        store = _sketch_store
+    store.remove_stale_generations(keep=[previous.generation] if previous else [])
+    return store
+
+
+def load_range_sketches(
+    id: str, start_date, end_date, time_windows=None, sketch_store=None
+):
+    """
+    Une los sketches por hora de participantes y compradores de cada variante
+    de un experimento en un rango de días. Los días que aún no tienen sketches
+    se calculan una vez (para todos los experimentos) directamente desde los
+    eventos del día con event_conversions, sin el etiquetado exacto.
+
+    Args:
+        id (str): Identificador del experimento.
+        start_date (datetime): Primer día.
+        end_date (datetime): Último día, incluido.
+        time_windows (dict, opcional): Ventanas de atribución en minutos
+        por tipo de evento.
+        sketch_store (ParticipantSketchStore, opcional): Almacén de sketches. Por
+        defecto el de la generación vigente (get_sketch_store).
+
+    Returns:
+        dict: Por variante, los HyperLogLog participants y converters del rango.
+    """
+    windows = resolve_time_windows(time_windows)
+    if sketch_store is None:
+        sketch_store = get_sketch_store()
+    days = [
+        day.to_pydatetime()
+        for day in pd.date_range(start_date.date(), end_date.date(), freq="D")
+    ]
+
+    sketches = {}
+    for day in days:
+        if not sketch_store.has(day, windows):
+            with stage("participant_sketches") as record:
+                data = load_day_data(day, spillover_minutes=max(windows.values()))
+                conversions = event_conversions(data, day, windows)
+                sketch_store.write(day, windows, conversions)
+                record["rows"] = len(conversions)
+        for variant, day_sketches in sketch_store.read(day, windows, id).items():
+            if variant not in sketches:
+                sketches[variant] = day_sketches
+                continue
+            for name, sketch in day_sketches.items():
+                sketches[variant][name] = sketches[variant][name].merge(sketch)
+    return sketches
+
+
+def check_engine_options(segment_by=None, sensitivity_windows=None):
+    """
+    Verifica que el motor configurado (PROCESSING_ENGINE) soporte las opciones
+    del análisis. El motor duckdb solo etiqueta por usuario, por lo que los
+    segmentos y la sensibilidad a ventanas se rechazan en lugar de cargar el
+    día completo en pandas.
+
+    Args:
+        segment_by (list, opcional): Segmentos solicitados.
+        sensitivity_windows (list, opcional): Ventanas de la sensibilidad.
+
+    Raises:
+        ValueError: Si el motor no soporta alguna de las opciones.
+    """
+    if processing_engine == "duckdb" and (segment_by or sensitivity_windows):
+        raise ValueError(
+            "PROCESSING_ENGINE=duckdb does not support segment_by or sensitivity_windows"
+        )
+
+
+def get_history_store() -> HistoryStateStore:
+    """
+    Obtiene el almacén del historial de los usuarios de la generación vigente
+    del dataset, en HISTORY_STORE_DIR. Al cambiar la generación se eliminan los
+    historiales de las anteriores salvo la inmediatamente anterior.
+
+    Returns:
+        HistoryStateStore: Almacén de la generación vigente.
+    """
+    global _history_store
+    generation = current_dataset_generation()
+    with _history_store_lock:
+        previous = _history_store
+        if previous is not None and previous.generation == generation:
+            return previous
+        _history_store = HistoryStateStore(
+            os.getenv("HISTORY_STORE_DIR", "./data/processed_data/history"),
+            generation,
+        )
+        store = _history_store
+    store.remove_stale_generations(keep=[previous.generation] if previous else [])
+    return store
+
+
+def history_state(date, history_store=None) -> dict:
+    """
+    Obtiene el historial de los usuarios al inicio de un día, sobre todos los
+    días anteriores del dataset. Parte del último historial guardado y le
+    agrega, en orden, los eventos de cada día aún no procesado, guardando el
+    historial al inicio del día siguiente a cada uno.
+
+    Args:
+        date (datetime): Día solicitado.
+        history_store (HistoryStateStore, opcional): Almacén de historiales. Por
+        defecto el de la generación vigente (get_history_store).
+
+    Returns:
+        dict: Historial de advance_history_state.
+    """
+    history_store = history_store or get_history_store()
+    day = datetime.combine(date.date(), time())
+    if history_store.has(day):
+        return history_store.read(day)
+
+    previous_days = [event_day for event_day in event_days() if event_day < day]
+    state, pending = empty_history_state(), previous_days
+    for index in range(len(previous_days) - 1, -1, -1):
+        next_day = previous_days[index] + timedelta(days=1)
+        if history_store.has(next_day):
+            state = history_store.read(next_day)
+            pending = previous_days[index + 1 :]
+            break
+
+    for event_day in pending:
+        next_day = event_day + timedelta(days=1)
+        with stage("history_state") as record:
+            processor = ExperimentProcessor(load_day_data(event_day, is_same_day=True))
+            events = processor.get_experimets_data()
+            if not events.empty:
+                events["timestamp"] = pd.to_datetime(events["timestamp"])
+                state = advance_history_state(
+                    state, events, processor.get_purchases_data(), next_day
+                )
+            history_store.write(next_day, state)
+            record["rows"] = len(events)
+    if not history_store.has(day):
+        history_store.write(day, state)
+    return state
+
+
+def load_and_process_segmented_data(
+    id: str,
+    date,
+    segment_by: list,
+    is_same_day=False,
+    time_windows=None,
+    sample_rate=None,
+):
+    """
+    Carga y procesa los datos de un experimento conservando además los
+    segmentos temporales, atribuyendo las compras una sola vez. Los segmentos
+    de historial consideran todos los días anteriores del dataset
+    (history_state), no solo los eventos cargados para el día.
+
+    Args:
+        id (str): Identificador del experimento que se desea filtrar.
+        date (datetime): Fecha específica para filtrar los datos.
+        segment_by (list): Segmentos solicitados (event_name, hour, day_of_week,
+        exposure, prior_purchase, recent_events, time_since_previous).
+        is_same_day (bool, opcional): Si es True, filtra los datos
+        para incluir solo los eventos del mismo día.
+        time_windows (dict, opcional): Ventanas de atribución en minutos
+        por tipo de evento.
+        sample_rate (float, opcional): Fracción de usuarios a procesar,
+        elegidos por hash de user_id.
+
+    Returns:
+        tuple: DataFrame procesado por usuario y DataFrame procesado por usuario
+        y segmento temporal, ambos filtrados por el experimento.
+
+    Raises:
+        ValueError: Si el motor configurado no soporta segmentos.
+    """
+    check_engine_options(segment_by=segment_by)
+    spillover_minutes = max(resolve_time_windows(time_windows).values())
+    with stage("load_day_data") as record:
+        data = load_day_data(date, is_same_day, spillover_minutes)
+        record["rows"] = len(data)
+    if data.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    processor = ExperimentProcessor(data, time_windows, sample_rate)
+    if processor.data.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    prior = None
+    if any(segment in HISTORY_SEGMENTS for segment in segment_by):
+        prior = history_state(date)
+    date = None if is_same_day else date
+
+    def label(chunk):
+        merge_df = chunk.attribute_purchases()
+        if prior is not None:
+            merge_df = chunk.add_history_features(merge_df, prior)
+        merge_df = merge_df[(merge_df["experiment_name"] == id)]
+        return (
+            chunk.aggregate_by_user(merge_df, date),
+            chunk.aggregate_by_user(merge_df, date, segment_by),
+        )
+
+    with stage("label_experiments") as record:
+        (processed_data, segmented_data), plan = label_with_plan(processor, label)
+        record["rows"] = len(segmented_data)
+        record["memory_plan"] = plan.to_dict()
+    return processed_data, segmented_data
+
+
+def load_and_process_window_sensitivity(
+    id: str, date, windows_list: list, is_same_day=False, sample_rate=None
+):
+    """
+    Carga los datos una vez y los etiqueta para varias ventanas de atribución,
+    calculando el tiempo hasta la compra en una sola pasada.
+
+    Args:
+        id (str): Identificador del experimento que se desea filtrar.
+        date (datetime): Fecha específica para filtrar los datos.
+        windows_list (list): Lista de diccionarios con las ventanas en minutos
+        por tipo de evento.
+        is_same_day (bool, opcional): Si es True, filtra los datos
+        para incluir solo los eventos del mismo día.
+        sample_rate (float, opcional): Fracción de usuarios a procesar,
+        elegidos por hash de user_id.
+
+    Returns:
+        list: Lista de DataFrames procesados y filtrados por el experimento,
+        uno por cada ventana de windows_list.
+
+    Raises:
+        ValueError: Si el motor configurado no soporta la sensibilidad a ventanas.
+    """
+    check_engine_options(sensitivity_windows=windows_list)
+    spillover_minutes = max(
+        max(resolve_time_windows(time_windows).values())
+        for time_windows in windows_list
+    )
+    data = load_day_data(date, is_same_day, spillover_minutes)
+    if data.empty:
+        return [pd.DataFrame() for _ in windows_list]
+
+    processor = ExperimentProcessor(data, sample_rate=sample_rate)
+    if processor.data.empty:
+        return [pd.DataFrame() for _ in windows_list]
+
+    def label(chunk):
+        return [
+            processed_data[(processed_data["experiment_name"] == id)]
+            for processed_data in chunk.label_experiments_for_windows(
+                windows_list, None if is_same_day else date
+            )
+        ]
+
+    with stage("label_experiments_for_windows") as record:
+        labeled, plan = label_with_plan(processor, label)
+        record["rows"] = sum(len(processed_data) for processed_data in labeled)
+        record["memory_plan"] = plan.to_dict()
+    return labeled
+
+
+def cached_for_generation(key, load):
+    """
+    Devuelve el valor de key calculado para la generación vigente del dataset,
+    calculándolo con load solo la primera vez. Al cambiar la generación se
+    descartan los valores de la anterior.
+
+    Args:
+        key (str): Nombre del valor.
+        load (callable): Función sin argumentos que calcula el valor.
+
+    Returns:
+        object: Valor de la generación vigente. No debe modificarse.
+    """
+    generation = current_dataset_generation()
+    with _dataset_cache_lock:
+        if _dataset_cache.get("generation") != generation:
+            _dataset_cache.clear()
+            _dataset_cache["generation"] = generation
+        if key in _dataset_cache:
+            return _dataset_cache[key]
+    value = load()
+    with _dataset_cache_lock:
+        if _dataset_cache.get("generation") == generation:
+            _dataset_cache[key] = value
+    return value
+
+
 def get_all_data():
-    data = read_csv_from_gcs(bucket_name, file_name)
-    return data
+    """
+    Carga todos los eventos desde EXPERIMENTS_FILE_NAME, que puede ser un único
+    archivo o el prefijo de varios archivos CSV, comprimidos o no, que se leen
+    en paralelo. Los eventos se leen una vez por generación del dataset y se
+    reutilizan en las siguientes llamadas, por lo que no deben modificarse.
+
+    Returns:
+        pd.DataFrame: DataFrame con todos los eventos.
+    """
+
+    def load():
+        backend = get_storage_backend()
+        return read_csv_objects(backend, list_csv_objects(backend, file_name))
+
+    return cached_for_generation("data", load)
+
+
+def dataset_generation() -> str:
+    """
+    Calcula un identificador de la versión actual del dataset a partir de la
+    generación (GCS) o la fecha de modificación (local) de sus archivos CSV, sin
+    descargarlos. Cambia cada vez que se agrega, reemplaza o elimina un archivo.
+
+    Returns:
+        str: Identificador de la generación del dataset.
+    """
+    backend = get_storage_backend()
+    versions = backend.object_versions(partitions_prefix or file_name)
+    fingerprint = "\n".join(
+        f"{name}={version}"
+        for name, version in sorted(versions.items())
+        if name.endswith(CSV_SUFFIXES)
+    )
+    return hashlib.sha1(fingerprint.encode()).hexdigest()
+
+
+def event_days():
+    """
+    Lista los días (hora local) con eventos en el dataset. Con particiones se
+    obtienen de los nombres de las carpetas sin leer los datos. La lista se
+    calcula una vez por generación del dataset.
+
+    Returns:
+        list: Días (datetime) ordenados.
+    """
+    return list(cached_for_generation("event_days", list_event_days))
+
+
+def list_event_days():
+    """
+    Calcula los días (hora local) con eventos en el dataset, sin caché.
+
+    Returns:
+        list: Días (datetime) ordenados.
+    """
+    backend = get_storage_backend()
+    if partitions_prefix:
+        days = {
+            name[len(partitions_prefix) :].split("date=")[1][:10]
+            for name in list_csv_objects(backend, f"{partitions_prefix}/date=")
+        }
+    else:
+        data = get_all_data()
+        days = set(data["timestamp"].dropna().astype(str).str.slice(0, 10))
+    return [datetime.strptime(day, "%Y-%m-%d") for day in sorted(days)]
+
+
+def latest_event_day():
+    """
+    Obtiene el último día (hora local) con eventos en el dataset.
+
+    Returns:
+        datetime: Último día con eventos, o None si no hay datos.
+    """
+    days = event_days()
+    return days[-1] if days else None
+
+
+def get_latency_store() -> LatencySketchStore:
+    """
+    Obtiene el almacén de sketches de latencia de la generación vigente del
+    dataset, en LATENCY_STORE_DIR y con el horizonte LATENCY_HORIZON_MINUTES.
+    Al cambiar la generación se eliminan los sketches de las anteriores salvo
+    la inmediatamente anterior.
+
+    Returns:
+        LatencySketchStore: Almacén de la generación vigente.
+    """
+    global _latency_store
+    generation = current_dataset_generation()
+    with _latency_store_lock:
+        previous = _latency_store
+        if previous is not None and previous.generation == generation:
+            return previous
+        _latency_store = LatencySketchStore(
+            os.getenv("LATENCY_STORE_DIR", "./data/processed_data/latency"),
+            generation,
+            float(os.getenv("LATENCY_HORIZON_MINUTES", 720)),
+        )
+        store = _latency_store
+    store.remove_stale_generations(keep=[previous.generation] if previous else [])
+    return store
+
+
+def refresh_latency_sketches(start_date=None, end_date=None, latency_store=None):
+    """
+    Calcula y guarda los sketches de latencia hasta la compra de los días que
+    aún no están completos. Cada día se procesa con los eventos del día y las
+    compras hasta el horizonte del almacén, y queda completo cuando el último
+    día con eventos es posterior a ese horizonte.
+
+    Args:
+        start_date (datetime, opcional): Primer día. Por defecto el primero con eventos.
+        end_date (datetime, opcional): Último día, incluido. Por defecto el último
+        con eventos.
+        latency_store (LatencySketchStore, opcional): Almacén de sketches. Por
+        defecto el de la generación vigente (get_latency_store).
+
+    Returns:
+        tuple: Almacén de sketches y lista de días (datetime) del rango con eventos.
+    """
+    if latency_store is None:
+        latency_store = get_latency_store()
+    days = event_days()
+    if not days:
+        return latency_store, []
+    latest_day = days[-1]
+    days = [
+        day
+        for day in days
+        if (start_date is None or day >= start_date)
+        and (end_date is None or day <= end_date)
+    ]
+    for day in days:
+        if latency_store.is_complete(day):
+            continue
+        with stage("latency_sketches") as record:
+            horizon = latency_store.horizon_minutes
+            latencies = event_latencies(
+                load_day_data(day, spillover_minutes=horizon), day, horizon
+            )
+            records = hourly_latency_sketches(
+                latencies, latency_store.relative_accuracy
+            )
+            complete = latest_day >= day + timedelta(days=1, minutes=horizon)
+            latency_store.write(day, records, complete)
+            record["rows"] = len(latencies)
+    return latency_store, days
+
+
+def load_latency_sketches(start_date, end_date, latency_store=None):
+    """
+    Lee los sketches de latencia por hora de un rango de días, calculando antes
+    los días nuevos o incompletos.
+
+    Args:
+        start_date (datetime): Primer día.
+        end_date (datetime): Último día, incluido.
+        latency_store (LatencySketchStore, opcional): Almacén de sketches.
+
+    Returns:
+        list: Registros por hora, tipo de evento y experimento con events y sketch.
+    """
+    latency_store, days = refresh_latency_sketches(
+        start_date, end_date, latency_store
+    )
+    return [record for day in days for record in latency_store.read(day)]
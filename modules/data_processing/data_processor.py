@@ -1,6 +1,150 @@
 import pandas as pd
 import numpy as np
 
+from modules.data_processing.history_features import (
+    HISTORY_SEGMENTS,
+    event_history_features,
+)
+from modules.utils.profiling import stage
+from modules.utils.sketches import hash_values
+
+
+DEFAULT_TIME_WINDOWS = {"SEARCH": 210, "default": 81}
+
+TIME_SEGMENTS = {
+    "hour": lambda timestamps: timestamps.dt.hour,
+    "day_of_week": lambda timestamps: timestamps.dt.dayofweek,
+}
+
+
+def resolve_time_windows(time_windows: dict = None) -> dict:
+    """
+    Combina las ventanas de atribución indicadas con las ventanas por defecto.
+
+    Args:
+        time_windows (dict, opcional): Minutos de la ventana por tipo de evento,
+        por ejemplo {"SEARCH": 120, "PRODUCT": 60}. La llave "default" aplica
+        a los eventos que no tengan una ventana propia.
+
+    Returns:
+        dict: Ventanas de atribución en minutos por tipo de evento.
+    """
+    windows = dict(DEFAULT_TIME_WINDOWS)
+    if time_windows:
+        windows.update(time_windows)
+    return windows
+
+
+def sample_users(data: pd.DataFrame, sample_rate: float) -> pd.DataFrame:
+    """
+    Conserva todos los eventos de una muestra estable de usuarios: un usuario
+    está en la muestra si el hash de su user_id cae en la fracción sample_rate
+    del rango de hashes, por lo que la misma tasa siempre elige a los mismos
+    usuarios y una tasa mayor incluye a los de una menor.
+
+    Args:
+        data (pd.DataFrame): Eventos con la columna user_id.
+        sample_rate (float): Fracción de usuarios a conservar, entre 0 y 1.
+
+    Returns:
+        pd.DataFrame: Eventos de los usuarios de la muestra.
+    """
+    if sample_rate >= 1:
+        return data
+    threshold = np.uint64(int(sample_rate * 2**64))
+    return data[hash_values(data["user_id"]) < threshold]
+
+
+def window_minutes(event_names: pd.Series, time_windows: dict) -> pd.Series:
+    """
+    Obtiene la ventana de atribución en minutos para cada evento.
+
+    Args:
+        event_names (pd.Series): Serie con los nombres de los eventos.
+        time_windows (dict): Ventanas de atribución por tipo de evento.
+
+    Returns:
+        pd.Series: Serie con los minutos de la ventana para cada evento.
+    """
+    return event_names.map(time_windows).fillna(time_windows["default"])
+
+
+def timestamps_to_ns(timestamps: pd.Series) -> np.ndarray:
+    """
+    Convierte una serie de fechas en enteros con nanosegundos desde epoch (UTC).
+
+    Args:
+        timestamps (pd.Series): Serie de fechas ya convertidas con pd.to_datetime.
+
+    Returns:
+        np.ndarray: Arreglo de enteros int64.
+    """
+    return pd.DatetimeIndex(timestamps).as_unit("ns").asi8
+
+
+def purchase_timestamps(purchases: pd.DataFrame, events: pd.DataFrame) -> pd.Series:
+    """
+    Convierte los timestamps de las compras. Sin compras (por ejemplo en un
+    grupo de usuarios que no compró) se usa el tipo de los eventos, para que
+    las comparaciones con fechas con zona horaria sigan siendo válidas.
+
+    Args:
+        purchases (pd.DataFrame): Compras con la columna timestamp.
+        events (pd.DataFrame): Eventos con la columna timestamp ya convertida.
+
+    Returns:
+        pd.Series: Timestamps de las compras.
+    """
+    if purchases.empty:
+        return pd.Series(index=purchases.index, dtype=events["timestamp"].dtype)
+    return pd.to_datetime(purchases["timestamp"])
+
+
+def next_purchase_index(
+    events: pd.DataFrame, purchases: pd.DataFrame, by: list
+) -> np.ndarray:
+    """
+    Busca, para cada evento, la primera compra con las mismas llaves `by`
+    cuyo timestamp sea igual o posterior al del evento.
+
+    La búsqueda se hace con un único searchsorted sobre una llave compuesta
+    (grupo, rango del timestamp), por lo que no requiere cruces ni SQL.
+
+    Args:
+        events (pd.DataFrame): Eventos con las columnas `by` y `timestamp` ya convertido.
+        purchases (pd.DataFrame): Compras con las columnas `by` y `timestamp` ya convertido.
+        by (list): Columnas que deben coincidir entre evento y compra.
+
+    Returns:
+        np.ndarray: Posición (iloc) de la compra asociada en `purchases`,
+        o -1 si el evento no tiene una compra posterior.
+    """
+    n_events = len(events)
+    if n_events == 0 or len(purchases) == 0:
+        return np.full(n_events, -1, dtype=np.int64)
+
+    keys = pd.concat([events[by], purchases[by]], ignore_index=True)
+    codes = keys.groupby(by, dropna=False, sort=False).ngroup().to_numpy(np.int64)
+    timestamps = np.concatenate(
+        [timestamps_to_ns(events["timestamp"]), timestamps_to_ns(purchases["timestamp"])]
+    )
+    _, ranks = np.unique(timestamps, return_inverse=True)
+    ranks = ranks.astype(np.int64)
+    n_ranks = int(ranks.max()) + 1
+
+    composite = codes * n_ranks + ranks
+    event_composite = composite[:n_events]
+    purchase_composite = composite[n_events:]
+
+    order = np.argsort(purchase_composite, kind="stable")
+    sorted_composite = purchase_composite[order]
+    positions = np.searchsorted(sorted_composite, event_composite, side="left")
+    clipped = np.minimum(positions, len(sorted_composite) - 1)
+    found = (positions < len(sorted_composite)) & (
+        sorted_composite[clipped] // n_ranks == codes[:n_events]
+    )
+    return np.where(found, order[clipped], -1)
+
 
 class ExperimentProcessor:
     """
@@ -12,6 +156,8 @@ class ExperimentProcessor:
 
     Args:
         data (pd.DataFrame): DataFrame que contiene una columna 'experiments' con cadenas de experimentos.
+        time_windows (dict, opcional): Ventanas de atribución en minutos por tipo de evento.
+        sample_rate (float, opcional): Fracción de usuarios a procesar, elegidos por hash de user_id.
 
     Methods:
         convert_to_dict(exp_string: str) -> dict:
@@ -43,40 +189,99 @@ class ExperimentProcessor:
             Returns:
                 pd.DataFrame: Nuevo DataFrame con filas expandidas para cada experimento y variante.
 
-        product_event_and_purchase(experiments: pd.DataFrame, purchases: pd.DataFrame) -> pd.DataFrame:
-            Relaciona eventos de productos con compras dentro de una ventana de tiempo de 81 minutos.
+        product_event_and_purchase(experiments: pd.DataFrame, purchases: pd.DataFrame, time_windows=None) -> pd.DataFrame:
+            Relaciona eventos de productos con compras dentro de una ventana de tiempo (81 minutos por defecto).
             Args:
                 experiments (pd.DataFrame): DataFrame con eventos de experimentos.
                 purchases (pd.DataFrame): DataFrame con eventos de compra.
+                time_windows (dict, opcional): Ventanas de atribución por tipo de evento.
             Returns:
                 pd.DataFrame: DataFrame fusionado con información de productos y compras.
 
-        search_event_and_purchase(experiments: pd.DataFrame, purchases: pd.DataFrame) -> pd.DataFrame:
-            Relaciona eventos de búsqueda con compras dentro de una ventana de tiempo de 210 minutos.
+        search_event_and_purchase(experiments: pd.DataFrame, purchases: pd.DataFrame, time_windows=None) -> pd.DataFrame:
+            Relaciona eventos de búsqueda con compras dentro de una ventana de tiempo (210 minutos por defecto).
             Args:
                 experiments (pd.DataFrame): DataFrame con eventos de experimentos.
                 purchases (pd.DataFrame): DataFrame con eventos de compra.
+                time_windows (dict, opcional): Ventanas de atribución por tipo de evento.
             Returns:
                 pd.DataFrame: DataFrame fusionado con información de búsquedas y compras.
 
-        label_experiments(date=None) -> pd.DataFrame:
+        attribute_purchases() -> pd.DataFrame:
+            Relaciona cada evento expandido con las compras dentro de su ventana de atribución.
+            Returns:
+                pd.DataFrame: Eventos con la columna item_id_purchase.
+
+        add_history_features(merge_df: pd.DataFrame, prior=None) -> pd.DataFrame:
+            Agrega el historial del usuario al momento de cada evento (número de exposición,
+            minutos desde el evento anterior, compra previa y eventos recientes).
+            Returns:
+                pd.DataFrame: Eventos con las columnas de historial.
+
+        aggregate_by_user(merge_df: pd.DataFrame, date=None, segment_by=None) -> pd.DataFrame:
+            Agrupa los eventos atribuidos por usuario, experimento, variante y segmentos temporales o de historial.
+            Returns:
+                pd.DataFrame: DataFrame con etiquetas de si hubo compra.
+
+        time_to_purchase() -> pd.DataFrame:
+            Calcula una sola vez los minutos entre cada evento y su siguiente compra elegible.
+            Returns:
+                pd.DataFrame: Eventos expandidos con el tiempo y el item de la siguiente compra.
+
+        label_experiments(date=None, segment_by=None) -> pd.DataFrame:
             Etiqueta los experimentos en función de si resultaron en una compra.
             Args:
                 date (datetime, opcional): Fecha específica para filtrar los eventos.
+                segment_by (list, opcional): Segmentos temporales (hour, day_of_week) para agrupar.
             Returns:
                 pd.DataFrame: DataFrame con etiquetas de si hubo compra.
+
+        user_chunks(n_chunks: int):
+            Divide los eventos en grupos de usuarios.
+            Args:
+                n_chunks (int): Número de grupos de usuarios.
+            Yields:
+                ExperimentProcessor: Procesador con los eventos de cada grupo no vacío.
+
+        label_experiments_in_chunks(n_chunks: int, date=None, segment_by=None) -> pd.DataFrame:
+            Etiqueta los experimentos procesando los usuarios por grupos para acotar la memoria.
+            Args:
+                n_chunks (int): Número de grupos de usuarios.
+                date (datetime, opcional): Fecha específica para filtrar los eventos.
+                segment_by (list, opcional): Segmentos temporales (hour, day_of_week) para agrupar.
+            Returns:
+                pd.DataFrame: DataFrame con etiquetas de si hubo compra.
+
+        label_experiments_for_windows(windows_list: list, date=None) -> list:
+            Etiqueta los experimentos para varias ventanas de atribución a partir de un único cálculo
+            del tiempo hasta la compra.
+            Args:
+                windows_list (list): Lista de diccionarios con ventanas por tipo de evento.
+                date (datetime, opcional): Fecha específica para filtrar los eventos.
+            Returns:
+                list: Lista de DataFrames etiquetados, uno por cada ventana.
     """
 
-    def __init__(self, data):
+    def __init__(self, data, time_windows=None, sample_rate=None):
         """
         Inicializa la clase con un DataFrame.
 
         Args:
             data (pd.DataFrame): DataFrame que contiene una columna 'experiments'
             con cadenas de experimentos.
+            time_windows (dict, opcional): Ventanas de atribución en minutos por
+            tipo de evento. Por defecto 210 minutos para SEARCH y 81 para el resto.
+            sample_rate (float, opcional): Si se indica, solo se procesan los
+            eventos de esa fracción de usuarios (ver sample_users), antes de la
+            expansión y la atribución.
 
         """
+        if sample_rate is not None:
+            with stage("sample_users") as record:
+                data = sample_users(data, sample_rate)
+                record["rows"] = len(data)
         self.data = data
+        self.time_windows = resolve_time_windows(time_windows)
 
     @staticmethod
     def convert_to_dict(exp_string: str) -> dict:
@@ -161,14 +366,17 @@ class ExperimentProcessor:
         return expanded_df
 
     @staticmethod
-    def product_event_and_purchase(experiments: pd.DataFrame, purchases: pd.DataFrame):
+    def product_event_and_purchase(
+        experiments: pd.DataFrame, purchases: pd.DataFrame, time_windows=None
+    ):
         """
         Relaciona eventos de productos con compras dentro de una ventana
-        de tiempo de 81 minutos.
+        de tiempo (81 minutos por defecto).
 
         Args:
             experiments (pd.DataFrame): DataFrame con eventos de experimentos.
             purchases (pd.DataFrame): DataFrame con eventos de compra.
+            time_windows (dict, opcional): Ventanas de atribución por tipo de evento.
 
         Returns:
             pd.DataFrame: DataFrame fusionado con información de productos y compras.
@@ -176,11 +384,11 @@ class ExperimentProcessor:
         experiments = experiments[~experiments["event_name"].isin(["SEARCH"])].copy()
         experiments["timestamp"] = pd.to_datetime(experiments["timestamp"])
 
-        purchases["timestamp"] = pd.to_datetime(purchases["timestamp"])
+        purchases["timestamp"] = purchase_timestamps(purchases, experiments)
         purchases["timestamp2"] = purchases["timestamp"]
         purchases["item_id_purchase"] = purchases["item_id"]
 
-        time_window = pd.Timedelta(minutes=81)
+        time_windows = resolve_time_windows(time_windows)
 
         merged_df = pd.merge(
             experiments,
@@ -191,6 +399,9 @@ class ExperimentProcessor:
             how="left",
             suffixes=["", "_purchase"],
         )
+        time_window = pd.to_timedelta(
+            window_minutes(merged_df["event_name"], time_windows), unit="m"
+        )
 
         merged_df["item_id_purchase"] = np.where(
             (merged_df["timestamp_purchase"] >= merged_df["timestamp"])
@@ -208,14 +419,17 @@ class ExperimentProcessor:
         return merged_df
 
     @staticmethod
-    def search_event_and_purchase(experiments: pd.DataFrame, purchases: pd.DataFrame):
+    def search_event_and_purchase(
+        experiments: pd.DataFrame, purchases: pd.DataFrame, time_windows=None
+    ):
         """
         Relaciona eventos de búsqueda con compras dentro de una ventana
-        de tiempo de 210 minutos
+        de tiempo (210 minutos por defecto).
 
         Args:
             experiments (pd.DataFrame): DataFrame con eventos de experimentos.
             purchases (pd.DataFrame): DataFrame con eventos de compra.
+            time_windows (dict, opcional): Ventanas de atribución por tipo de evento.
 
         Returns:
             pd.DataFrame: DataFrame fusionado con información de búsquedas y compras.
@@ -223,15 +437,18 @@ class ExperimentProcessor:
         experiments = experiments[experiments["event_name"] == "SEARCH"].copy()
         experiments["timestamp"] = pd.to_datetime(experiments["timestamp"])
 
-        purchases["timestamp"] = pd.to_datetime(purchases["timestamp"])
+        purchases["timestamp"] = purchase_timestamps(purchases, experiments)
         purchases["timestamp_purchase"] = purchases["timestamp"]
 
-        time_window = pd.Timedelta(minutes=210)
+        time_windows = resolve_time_windows(time_windows)
+        time_window = pd.Timedelta(minutes=time_windows["SEARCH"])
+        # Orden estable: entre compras simultáneas se asocia la primera del
+        # registro, igual que en next_purchase_index.
         merged_df = pd.merge_asof(
-            experiments.sort_values("timestamp"),
+            experiments.sort_values("timestamp", kind="stable"),
             purchases[
                 ["user_id", "timestamp", "item_id", "timestamp_purchase"]
-            ].sort_values("timestamp"),
+            ].sort_values("timestamp", kind="stable"),
             on="timestamp",
             by="user_id",
             direction="forward",
@@ -241,31 +458,249 @@ class ExperimentProcessor:
 
         return merged_df
 
-    def label_experiments(self, date=None):
+    def time_to_purchase(self) -> pd.DataFrame:
         """
-        Etiqueta los experimentos en función de si resultaron en una compra.
+        Calcula una sola vez, para cada evento expandido, los minutos hasta su
+        siguiente compra elegible y el item de dicha compra.
+
+        Los eventos de búsqueda se asocian con la siguiente compra del usuario y
+        el resto de eventos con la siguiente compra del mismo usuario e item_id,
+        sin aplicar ninguna ventana de tiempo.
 
         Returns:
-            pd.DataFrame: DataFrame con etiquetas de si hubo compra.
+            pd.DataFrame: Eventos expandidos con las columnas minutes_to_purchase
+            y item_id_next_purchase (NaN si no existe una compra posterior).
         """
         experiments = self.get_experimets_data()
+        experiments["timestamp"] = pd.to_datetime(experiments["timestamp"])
         purchases = self.get_purchases_data()
+        purchases["timestamp"] = pd.to_datetime(purchases["timestamp"])
 
-        product_df = self.product_event_and_purchase(experiments, purchases)
-        search_df = self.search_event_and_purchase(experiments, purchases)
+        experiments["minutes_to_purchase"] = np.nan
+        experiments["item_id_next_purchase"] = np.nan
+        is_search = (experiments["event_name"] == "SEARCH").to_numpy()
+        purchase_timestamps = timestamps_to_ns(purchases["timestamp"])
+        purchase_items = purchases["item_id"].to_numpy(dtype=float)
+
+        for mask, by in ((is_search, ["user_id"]), (~is_search, ["user_id", "item_id"])):
+            events = experiments[mask]
+            match = next_purchase_index(events, purchases, by)
+            found = match >= 0
+            minutes = np.full(len(events), np.nan)
+            minutes[found] = (
+                purchase_timestamps[match[found]]
+                - timestamps_to_ns(events["timestamp"])[found]
+            ) / 6e10
+            if by == ["user_id"]:
+                items = np.full(len(events), np.nan)
+                items[found] = purchase_items[match[found]]
+            else:
+                items = np.where(found, events["item_id"].to_numpy(dtype=float), np.nan)
+            experiments.loc[mask, "minutes_to_purchase"] = minutes
+            experiments.loc[mask, "item_id_next_purchase"] = items
+
+        return experiments
 
-        merge_df = pd.concat([product_df, search_df]).reset_index(drop=True)
+    @staticmethod
+    def aggregate_by_user(
+        merge_df: pd.DataFrame, date=None, segment_by=None
+    ) -> pd.DataFrame:
+        """
+        Agrupa los eventos atribuidos por usuario, experimento y variante.
 
+        Args:
+            merge_df (pd.DataFrame): Eventos con la columna item_id_purchase.
+            date (datetime, opcional): Fecha específica para filtrar los eventos.
+            segment_by (list, opcional): Segmentos temporales (hour, day_of_week)
+            o de historial (exposure, prior_purchase, recent_events,
+            time_since_previous) que se agregan como llaves adicionales de la
+            agrupación. Los de historial requieren las columnas de
+            add_history_features.
+
+        Returns:
+            pd.DataFrame: DataFrame con etiquetas de si hubo compra.
+        """
         if date is not None:
             merge_df = merge_df[(merge_df["timestamp"].dt.date == date.date())]
 
-        merge_df = (
-            merge_df.groupby(["event_name", "experiment_name", "variant_id", "user_id"])
-            .agg(
-                purchases=("item_id_purchase", "nunique"),
-                attempts=("timestamp", "nunique"),
+        keys = ["event_name", "experiment_name", "variant_id", "user_id"]
+        time_segments = [
+            segment for segment in (segment_by or []) if segment in TIME_SEGMENTS
+        ]
+        if time_segments:
+            merge_df = merge_df.assign(
+                **{
+                    segment: TIME_SEGMENTS[segment](merge_df["timestamp"])
+                    for segment in time_segments
+                }
             )
-            .reset_index()
-        )
-        merge_df["with_purchase"] = np.where(merge_df["purchases"] > 0, True, False)
+            keys = keys + time_segments
+        history_segments = [
+            segment for segment in (segment_by or []) if segment in HISTORY_SEGMENTS
+        ]
+        if history_segments:
+            merge_df = merge_df.assign(
+                **{
+                    segment: HISTORY_SEGMENTS[segment](merge_df)
+                    for segment in history_segments
+                }
+            )
+            keys = keys + history_segments
+
+        with stage("aggregate_by_user") as record:
+            merge_df = (
+                merge_df.groupby(keys)
+                .agg(
+                    purchases=("item_id_purchase", "nunique"),
+                    attempts=("timestamp", "nunique"),
+                )
+                .reset_index()
+            )
+            merge_df["with_purchase"] = np.where(merge_df["purchases"] > 0, True, False)
+            record["rows"] = len(merge_df)
         return merge_df
+
+    def attribute_purchases(self) -> pd.DataFrame:
+        """
+        Relaciona cada evento expandido con las compras dentro de su ventana
+        de atribución, sin agrupar por usuario.
+
+        Returns:
+            pd.DataFrame: Eventos con la columna item_id_purchase.
+        """
+        with stage("expand_experiments") as record:
+            experiments = self.get_experimets_data()
+            purchases = self.get_purchases_data()
+            record["rows"] = len(experiments)
+
+        with stage("product_event_and_purchase") as record:
+            product_df = self.product_event_and_purchase(
+                experiments, purchases, self.time_windows
+            )
+            record["rows"] = len(product_df)
+        with stage("search_event_and_purchase") as record:
+            search_df = self.search_event_and_purchase(
+                experiments, purchases, self.time_windows
+            )
+            record["rows"] = len(search_df)
+
+        return pd.concat([product_df, search_df]).reset_index(drop=True)
+
+    def add_history_features(self, merge_df: pd.DataFrame, prior=None) -> pd.DataFrame:
+        """
+        Agrega a los eventos atribuidos el historial del usuario al momento de
+        cada evento (ver event_history_features), antes de filtrar por fecha,
+        para poder segmentar o filtrar por él sin otro cruce.
+
+        Args:
+            merge_df (pd.DataFrame): Resultado de attribute_purchases.
+            prior (dict, opcional): Historial de los usuarios al inicio de los
+            datos (advance_history_state). Por defecto solo se usan los eventos
+            cargados.
+
+        Returns:
+            pd.DataFrame: Eventos con las columnas exposure_index,
+            minutes_since_previous, prior_purchase y recent_events.
+        """
+        with stage("history_features") as record:
+            features = event_history_features(
+                merge_df, self.get_purchases_data(), prior=prior
+            )
+            record["rows"] = len(features)
+        return merge_df.join(features)
+
+    def label_experiments(self, date=None, segment_by=None):
+        """
+        Etiqueta los experimentos en función de si resultaron en una compra.
+
+        Args:
+            date (datetime, opcional): Fecha específica para filtrar los eventos.
+            segment_by (list, opcional): Segmentos temporales (hour, day_of_week)
+            o de historial (exposure, prior_purchase, recent_events,
+            time_since_previous) por los que también se agrupan los usuarios.
+
+        Returns:
+            pd.DataFrame: DataFrame con etiquetas de si hubo compra.
+        """
+        merge_df = self.attribute_purchases()
+        if any(segment in HISTORY_SEGMENTS for segment in segment_by or []):
+            merge_df = self.add_history_features(merge_df)
+        return self.aggregate_by_user(merge_df, date, segment_by)
+
+    def user_chunks(self, n_chunks: int):
+        """
+        Divide los eventos en grupos de usuarios. Cada compra se atribuye a
+        eventos del mismo usuario, por lo que cada grupo se puede procesar por
+        separado y los resultados por usuario se concatenan.
+
+        Args:
+            n_chunks (int): Número de grupos de usuarios.
+
+        Yields:
+            ExperimentProcessor: Procesador con los eventos de cada grupo no vacío.
+        """
+        user_codes, _ = pd.factorize(self.data["user_id"])
+        chunk_ids = user_codes % n_chunks
+        for chunk_id in range(n_chunks):
+            chunk = self.data[chunk_ids == chunk_id]
+            if not chunk.empty:
+                yield ExperimentProcessor(chunk, self.time_windows)
+
+    def label_experiments_in_chunks(self, n_chunks: int, date=None, segment_by=None):
+        """
+        Etiqueta los experimentos procesando los usuarios por grupos, de modo que
+        solo los eventos expandidos de un grupo están en memoria a la vez.
+
+        Las compras se atribuyen siempre a eventos del mismo usuario y la
+        agrupación final incluye user_id, por lo que el resultado es igual al de
+        label_experiments.
+
+        Args:
+            n_chunks (int): Número de grupos de usuarios.
+            date (datetime, opcional): Fecha específica para filtrar los eventos.
+            segment_by (list, opcional): Segmentos temporales o de historial por
+            los que también se agrupan los usuarios.
+
+        Returns:
+            pd.DataFrame: DataFrame con etiquetas de si hubo compra.
+        """
+        labeled = []
+        for processor in self.user_chunks(n_chunks):
+            with stage("label_chunk") as record:
+                labeled.append(processor.label_experiments(date, segment_by))
+                record["rows"] = len(labeled[-1])
+        if not labeled:
+            return self.label_experiments(date, segment_by)
+        return pd.concat(labeled, ignore_index=True)
+
+    def label_experiments_for_windows(self, windows_list: list, date=None) -> list:
+        """
+        Etiqueta los experimentos para varias ventanas de atribución.
+
+        El tiempo hasta la siguiente compra se calcula una única vez y cada
+        ventana se resuelve comparando ese tiempo contra el umbral del evento,
+        por lo que evaluar ventanas adicionales no repite la expansión ni los cruces.
+
+        Args:
+            windows_list (list): Lista de diccionarios con las ventanas en minutos
+            por tipo de evento, por ejemplo [{"SEARCH": 120}, {"SEARCH": 210}].
+            date (datetime, opcional): Fecha específica para filtrar los eventos.
+
+        Returns:
+            list: Lista de DataFrames etiquetados, en el mismo orden que windows_list.
+        """
+        events = self.time_to_purchase()
+        if date is not None:
+            events = events[(events["timestamp"].dt.date == date.date())]
+
+        labeled = []
+        for time_windows in windows_list:
+            time_windows = resolve_time_windows(time_windows)
+            within_window = events["minutes_to_purchase"] <= window_minutes(
+                events["event_name"], time_windows
+            )
+            merge_df = events.assign(
+                item_id_purchase=events["item_id_next_purchase"].where(within_window)
+            )
+            labeled.append(self.aggregate_by_user(merge_df))
+        return labeled
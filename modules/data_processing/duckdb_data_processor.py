@@ -0,0 +1,340 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from modules.data_processing.data_processor import resolve_time_windows, sample_users
+
+
+# user_id se lee como texto para aceptar identificadores no numéricos; los
+# resultados recuperan el tipo que infiere pandas (ver typed_user_ids).
+RAW_COLUMN_TYPES = {
+    "event_name": "VARCHAR",
+    "item_id": "DOUBLE",
+    "timestamp": "VARCHAR",
+    "site": "VARCHAR",
+    "experiments": "VARCHAR",
+    "user_id": "VARCHAR",
+}
+LABEL_KEYS = ["event_name", "experiment_name", "variant_id", "user_id"]
+
+
+def import_duckdb():
+    """
+    Importa duckdb, que es una dependencia opcional del motor fuera de memoria.
+
+    Returns:
+        module: Módulo duckdb.
+
+    Raises:
+        ImportError: Si duckdb no está instalado.
+    """
+    try:
+        import duckdb
+    except ImportError as error:
+        raise ImportError(
+            "duckdb is required for PROCESSING_ENGINE=duckdb: pip install duckdb"
+        ) from error
+    return duckdb
+
+
+def sql_literal(value) -> str:
+    """
+    Escapa un valor de texto como literal SQL.
+
+    Args:
+        value: Valor a escapar.
+
+    Returns:
+        str: Literal entre comillas simples.
+    """
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def typed_user_ids(user_ids: pd.Series) -> pd.Series:
+    """
+    Convierte los user_id leídos como texto al tipo que infiere pandas al leer
+    el CSV: enteros si todos los valores lo son y texto en otro caso, para que
+    los resultados y el muestreo por hash coincidan con los del motor pandas.
+
+    Args:
+        user_ids (pd.Series): user_id como texto.
+
+    Returns:
+        pd.Series: user_id como int64 o como texto.
+    """
+    numeric = pd.to_numeric(user_ids, errors="coerce")
+    if len(numeric) and numeric.notna().all() and (numeric % 1 == 0).all():
+        return numeric.astype(np.int64)
+    return user_ids.astype(object)
+
+
+class DuckDBExperimentProcessor:
+    """
+    Clase para etiquetar experimentos con un motor analítico embebido (DuckDB)
+    que procesa los archivos CSV sin cargarlos completos en memoria.
+
+    Produce las mismas columnas que ExperimentProcessor.label_experiments: la
+    expansión de experimentos, la atribución de compras y la agrupación por
+    usuario se ejecutan en SQL con un límite de memoria, y las operaciones que
+    lo superan (cruces y agrupaciones) se vuelcan a disco en temp_directory.
+
+    Args:
+        paths (list): Rutas locales de los archivos CSV (comprimidos o no).
+        time_windows (dict, opcional): Ventanas de atribución en minutos por tipo de evento.
+        memory_limit (str, opcional): Límite de memoria de DuckDB, por ejemplo "2GB".
+        temp_directory (str, opcional): Carpeta para los datos que no caben en memoria.
+        threads (int, opcional): Número de hilos de DuckDB.
+
+    Methods:
+        label_experiments(date=None, experiment_name=None, time_range=None, sample_rate=None) -> pd.DataFrame:
+            Etiqueta los experimentos en función de si resultaron en una compra.
+            Args:
+                date (datetime, opcional): Fecha específica para filtrar los eventos.
+                experiment_name (str, opcional): Experimento a procesar.
+                time_range (tuple, opcional): Rango [inicio, fin) de hora local de los eventos leídos.
+                sample_rate (float, opcional): Fracción de usuarios a procesar.
+            Returns:
+                pd.DataFrame: DataFrame con etiquetas de si hubo compra.
+    """
+
+    def __init__(
+        self,
+        paths,
+        time_windows=None,
+        memory_limit=None,
+        temp_directory=None,
+        threads=None,
+    ):
+        """
+        Inicializa el procesador.
+
+        Args:
+            paths (list): Rutas locales de los archivos CSV.
+            time_windows (dict, opcional): Ventanas de atribución en minutos por
+            tipo de evento. Por defecto 210 minutos para SEARCH y 81 para el resto.
+            memory_limit (str, opcional): Límite de memoria de DuckDB. Por defecto
+            DUCKDB_MEMORY_LIMIT o 1GB.
+            temp_directory (str, opcional): Carpeta de volcado a disco. Por defecto
+            DUCKDB_TEMP_DIRECTORY o una carpeta temporal.
+            threads (int, opcional): Número de hilos de DuckDB.
+        """
+        self.paths = list(paths)
+        self.time_windows = resolve_time_windows(time_windows)
+        self.memory_limit = memory_limit or os.getenv("DUCKDB_MEMORY_LIMIT", "1GB")
+        self.temp_directory = temp_directory or os.getenv(
+            "DUCKDB_TEMP_DIRECTORY", os.path.join(tempfile.gettempdir(), "duckdb_spill")
+        )
+        self.threads = threads
+
+    def connect(self):
+        """
+        Abre una conexión en memoria con el límite de memoria y la carpeta de
+        volcado a disco configurados.
+
+        Returns:
+            duckdb.DuckDBPyConnection: Conexión configurada.
+        """
+        duckdb = import_duckdb()
+        os.makedirs(self.temp_directory, exist_ok=True)
+        connection = duckdb.connect(":memory:")
+        connection.execute(f"SET memory_limit = {sql_literal(self.memory_limit)}")
+        connection.execute(f"SET temp_directory = {sql_literal(self.temp_directory)}")
+        connection.execute("SET preserve_insertion_order = false")
+        if self.threads:
+            connection.execute(f"SET threads = {int(self.threads)}")
+        return connection
+
+    def window_expression(self, event_column: str) -> str:
+        """
+        Construye la expresión SQL con la ventana de atribución de cada evento
+        como intervalo.
+
+        Args:
+            event_column (str): Columna con el nombre del evento.
+
+        Returns:
+            str: Expresión CASE con la ventana en microsegundos.
+        """
+        cases = " ".join(
+            f"WHEN {sql_literal(event_name)} THEN {int(round(minutes * 60e6))}"
+            for event_name, minutes in self.time_windows.items()
+            if event_name != "default"
+        )
+        default = int(round(self.time_windows["default"] * 60e6))
+        return f"to_microseconds(CASE {event_column} {cases} ELSE {default} END)"
+
+    def raw_events_query(self, time_range=None) -> str:
+        """
+        Construye la consulta de lectura de los archivos CSV, filtrando por la
+        hora local (texto del timestamp) si se indica un rango.
+
+        Args:
+            time_range (tuple, opcional): Inicio y fin (excluyente) en hora local.
+
+        Returns:
+            str: Consulta SQL.
+        """
+        files = "[" + ", ".join(sql_literal(path) for path in self.paths) + "]"
+        types = ", ".join(
+            f"{sql_literal(column)}: {sql_literal(column_type)}"
+            for column, column_type in RAW_COLUMN_TYPES.items()
+        )
+        query = (
+            f"SELECT *, list_position({files}, filename) AS file_position"
+            f" FROM read_csv({files}, header = true, filename = true,"
+            f" types = {{{types}}})"
+        )
+        if time_range is not None:
+            start, end = (
+                sql_literal(moment.strftime("%Y-%m-%d %H:%M:%S")) for moment in time_range
+            )
+            query += (
+                f" WHERE substr(timestamp, 1, 19) >= {start}"
+                f" AND substr(timestamp, 1, 19) < {end}"
+            )
+        return query
+
+    def sampled_users_filter(self, connection, sample_rate) -> str:
+        """
+        Elige la muestra de usuarios con el mismo hash de user_id que
+        sample_users, leyendo solo los user_id distintos, y la registra como la
+        tabla sampled_users.
+
+        Args:
+            connection (duckdb.DuckDBPyConnection): Conexión con la vista raw.
+            sample_rate (float): Fracción de usuarios a procesar.
+
+        Returns:
+            str: Condición SQL que conserva solo los eventos de la muestra.
+        """
+        users = connection.execute("SELECT DISTINCT user_id FROM raw").df()
+        sampled = sample_users(typed_user_ids(users["user_id"]).to_frame(), sample_rate)
+        connection.register("sampled_user_ids", users.loc[sampled.index])
+        connection.execute(
+            "CREATE TEMP TABLE sampled_users AS SELECT user_id FROM sampled_user_ids"
+        )
+        connection.unregister("sampled_user_ids")
+        return "user_id IN (SELECT user_id FROM sampled_users)"
+
+    def label_experiments(
+        self, date=None, experiment_name=None, time_range=None, sample_rate=None
+    ):
+        """
+        Etiqueta los experimentos en función de si resultaron en una compra.
+
+        Los filtros por fecha, experimento y muestra de usuarios se aplican antes
+        de la expansión y de la atribución, ya que la atribución de un evento solo
+        depende de las compras del mismo usuario.
+
+        Args:
+            date (datetime, opcional): Fecha específica para filtrar los eventos.
+            experiment_name (str, opcional): Experimento a procesar. Por defecto todos.
+            time_range (tuple, opcional): Rango [inicio, fin) de hora local de los
+            eventos leídos de los archivos.
+            sample_rate (float, opcional): Fracción de usuarios a procesar,
+            elegidos por hash de user_id como en sample_users.
+
+        Returns:
+            pd.DataFrame: DataFrame con las columnas event_name, experiment_name,
+            variant_id, user_id, purchases, attempts y with_purchase.
+        """
+        event_filters = ["event_name <> 'BUY'"]
+        purchase_filters = ["event_name = 'BUY'"]
+        if date is not None:
+            event_filters.append(
+                f"substr(timestamp, 1, 10) = {sql_literal(date.strftime('%Y-%m-%d'))}"
+            )
+        experiment_filter = ""
+        if experiment_name is not None:
+            experiment_filter = f"WHERE experiment_name = {sql_literal(experiment_name)}"
+
+        connection = self.connect()
+        try:
+            connection.execute(
+                f"CREATE TEMP VIEW raw AS {self.raw_events_query(time_range)}"
+            )
+            if sample_rate is not None and sample_rate < 1:
+                users_filter = self.sampled_users_filter(connection, sample_rate)
+                event_filters.append(users_filter)
+                purchase_filters.append(users_filter)
+            # Entre compras simultáneas de un usuario, la búsqueda se asocia con
+            # la primera de los archivos, igual que en ExperimentProcessor: la
+            # lectura de las compras conserva el orden de las filas, que queda
+            # explícito en (file_position, position).
+            connection.execute("SET preserve_insertion_order = true")
+            connection.execute(
+                f"""
+                CREATE TEMP TABLE purchases AS
+                SELECT user_id, item_id, CAST(timestamp AS TIMESTAMPTZ) AS ts,
+                    file_position, row_number() OVER () AS position
+                FROM raw
+                WHERE {" AND ".join(purchase_filters)}
+                """
+            )
+            connection.execute("SET preserve_insertion_order = false")
+            connection.execute(
+                """
+                CREATE TEMP TABLE search_purchases AS
+                SELECT user_id, ts,
+                    arg_min(item_id, (file_position, position)) AS item_id
+                FROM purchases
+                GROUP BY user_id, ts
+                """
+            )
+            connection.execute(
+                f"""
+                CREATE TEMP TABLE events AS
+                SELECT event_name, item_id, ts, user_id,
+                    split_part(experiment, '=', 1) AS experiment_name,
+                    split_part(experiment, '=', 2) AS variant_id
+                FROM (
+                    SELECT event_name, item_id, user_id,
+                        CAST(timestamp AS TIMESTAMPTZ) AS ts,
+                        unnest(string_split(trim(experiments, '{{}}'), ', ')) AS experiment
+                    FROM raw
+                    WHERE {" AND ".join(event_filters)}
+                )
+                {experiment_filter}
+                """
+            )
+            connection.execute("DROP VIEW raw")
+            search_window = int(round(self.time_windows["SEARCH"] * 60e6))
+            labeled = connection.execute(
+                f"""
+                WITH product AS (
+                    SELECT e.event_name, e.experiment_name, e.variant_id, e.user_id,
+                        e.ts, CASE WHEN p.ts IS NOT NULL THEN e.item_id END AS item_id_purchase
+                    FROM events e
+                    LEFT JOIN purchases p
+                        ON e.user_id = p.user_id
+                        AND e.item_id = p.item_id
+                        AND p.ts >= e.ts
+                        AND p.ts <= e.ts + {self.window_expression("e.event_name")}
+                    WHERE e.event_name <> 'SEARCH'
+                ),
+                search AS (
+                    SELECT e.event_name, e.experiment_name, e.variant_id, e.user_id,
+                        e.ts,
+                        CASE WHEN p.ts <= e.ts + to_microseconds({search_window})
+                            THEN p.item_id END AS item_id_purchase
+                    FROM (SELECT * FROM events WHERE event_name = 'SEARCH') e
+                    ASOF LEFT JOIN search_purchases p
+                        ON e.user_id = p.user_id AND e.ts <= p.ts
+                )
+                SELECT event_name, experiment_name, variant_id, user_id,
+                    count(DISTINCT item_id_purchase) AS purchases,
+                    count(DISTINCT ts) AS attempts
+                FROM (SELECT * FROM product UNION ALL SELECT * FROM search)
+                GROUP BY event_name, experiment_name, variant_id, user_id
+                """
+            ).df()
+        finally:
+            connection.close()
+
+        labeled["user_id"] = typed_user_ids(labeled["user_id"])
+        labeled["purchases"] = labeled["purchases"].astype("int64")
+        labeled["attempts"] = labeled["attempts"].astype("int64")
+        labeled["with_purchase"] = labeled["purchases"] > 0
+        return labeled.sort_values(LABEL_KEYS).reset_index(drop=True)
@@ -0,0 +1,443 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+HISTORY_WINDOW_MINUTES = 60
+
+
+def _timestamps_ns(timestamps: pd.Series) -> np.ndarray:
+    return pd.DatetimeIndex(timestamps).as_unit("ns").asi8
+
+
+def empty_history_state() -> dict:
+    """
+    Construye el historial vacío, el de un usuario sin eventos previos.
+
+    Returns:
+        dict: Estado con exposures, last_events, first_purchases y recent (ver
+        advance_history_state).
+    """
+    return {
+        "exposures": pd.Series(
+            dtype=np.int64,
+            index=pd.MultiIndex.from_arrays(
+                [[], []], names=["user_id", "experiment_name"]
+            ),
+        ),
+        "last_events": pd.Series(dtype=np.int64, index=pd.Index([], name="user_id")),
+        "first_purchases": pd.Series(
+            dtype=np.int64, index=pd.Index([], name="user_id")
+        ),
+        "recent": pd.DataFrame(
+            {"user_id": pd.Series(dtype=np.int64), "timestamp": pd.Series(dtype=np.int64)}
+        ),
+    }
+
+
+def advance_history_state(
+    state: dict,
+    events: pd.DataFrame,
+    purchases: pd.DataFrame,
+    end,
+    window_minutes=HISTORY_WINDOW_MINUTES,
+) -> dict:
+    """
+    Agrega al historial de los usuarios los eventos de un día, de modo que el
+    historial de un día se obtiene del anterior sin volver a leer los días ya
+    procesados.
+
+    Args:
+        state (dict): Historial al inicio del día.
+        events (pd.DataFrame): Eventos expandidos del día con las columnas
+        user_id, experiment_name y timestamp ya convertido.
+        purchases (pd.DataFrame): Compras del día con user_id y timestamp.
+        end (datetime): Fin del día (hora local, excluyente).
+        window_minutes (float, opcional): Ventana de los conteos recientes.
+
+    Returns:
+        dict: Historial al final del día: exposures (instantes distintos por
+        user_id y experiment_name), last_events (último instante de cada
+        usuario), first_purchases (primera compra de cada usuario) y recent
+        (instantes de la última ventana del día). Los instantes se guardan en
+        nanosegundos UTC.
+    """
+    instants = events[["user_id", "timestamp"]].drop_duplicates()
+    timestamps = _timestamps_ns(instants["timestamp"])
+    exposures = events.drop_duplicates(
+        ["user_id", "experiment_name", "timestamp"]
+    ).groupby(["user_id", "experiment_name"]).size()
+    purchase_timestamps = _timestamps_ns(pd.to_datetime(purchases["timestamp"]))
+
+    recent = pd.DataFrame(
+        {"user_id": instants["user_id"].to_numpy(), "timestamp": timestamps}
+    )
+    if not events.empty:
+        end_ns = pd.Timestamp(end).tz_localize(events["timestamp"].dt.tz).value
+        recent = recent[
+            recent["timestamp"] >= end_ns - int(window_minutes * 6e10)
+        ].reset_index(drop=True)
+
+    def combine(previous, current, how):
+        # Sin historial previo se conserva el tipo de user_id de los eventos.
+        if len(previous):
+            current = pd.concat([previous, current])
+        return current.groupby(level=list(range(current.index.nlevels))).agg(how)
+
+    return {
+        "exposures": combine(state["exposures"], exposures, "sum").astype(np.int64),
+        "last_events": combine(
+            state["last_events"],
+            pd.Series(
+                timestamps, index=pd.Index(instants["user_id"].to_numpy(), name="user_id")
+            ),
+            "max",
+        ),
+        "first_purchases": combine(
+            state["first_purchases"],
+            pd.Series(
+                purchase_timestamps,
+                index=pd.Index(purchases["user_id"].to_numpy(), name="user_id"),
+            ),
+            "min",
+        ),
+        "recent": recent,
+    }
+
+
+def event_history_features(
+    events: pd.DataFrame,
+    purchases: pd.DataFrame,
+    window_minutes=HISTORY_WINDOW_MINUTES,
+    prior=None,
+) -> pd.DataFrame:
+    """
+    Calcula el historial de cada usuario al momento de cada evento expandido,
+    ordenando una sola vez los instantes (user_id, timestamp) y con operaciones
+    acumuladas y desplazamientos vectorizados en lugar de cruces.
+
+    Los eventos expandidos de un mismo instante del usuario (uno por
+    experimento, o uno por compra asociada) comparten su historial, por lo que
+    todas las características se calculan sobre los instantes distintos y se
+    asignan de vuelta a cada fila.
+
+    Con prior, el historial anterior a los eventos (advance_history_state) se
+    suma al de los eventos cargados, con el mismo resultado que calcular las
+    características sobre todos los días anteriores.
+
+    Args:
+        events (pd.DataFrame): Eventos expandidos con las columnas user_id,
+        experiment_name y timestamp ya convertido.
+        purchases (pd.DataFrame): Compras con las columnas user_id y timestamp.
+        window_minutes (float, opcional): Ventana de los conteos recientes.
+        prior (dict, opcional): Historial al inicio de los eventos. Por defecto
+        solo se usan los eventos cargados.
+
+    Returns:
+        pd.DataFrame: Con el mismo índice de events y las columnas
+        exposure_index (número de la exposición del usuario al experimento,
+        desde 1), minutes_since_previous (minutos desde el evento anterior del
+        usuario, NaN en el primero), prior_purchase (si el usuario compró antes
+        del evento) y recent_events (eventos del usuario en los window_minutes
+        anteriores).
+    """
+    if events.empty:
+        return pd.DataFrame(
+            {
+                "exposure_index": pd.Series(dtype=np.int64),
+                "minutes_since_previous": pd.Series(dtype=float),
+                "prior_purchase": pd.Series(dtype=bool),
+                "recent_events": pd.Series(dtype=np.int64),
+            },
+            index=events.index,
+        )
+
+    prior = prior or empty_history_state()
+
+    # Instantes distintos ordenados por usuario y timestamp, precedidos por los
+    # instantes previos que aún caen en la ventana de los conteos recientes.
+    instant_codes = events.groupby(["user_id", "timestamp"], sort=True).ngroup()
+    instant_codes = instant_codes.to_numpy(np.int64)
+    first_rows = np.unique(instant_codes, return_index=True)[1]
+    users = events["user_id"].to_numpy()[first_rows]
+    n_prior = len(prior["recent"])
+    all_users = np.concatenate([prior["recent"]["user_id"].to_numpy(), users])
+    all_timestamps = np.concatenate(
+        [
+            prior["recent"]["timestamp"].to_numpy(np.int64),
+            _timestamps_ns(events["timestamp"].iloc[first_rows]),
+        ]
+    )
+    all_user_codes = pd.factorize(all_users)[0].astype(np.int64)
+    order = np.lexsort((all_timestamps, all_user_codes))
+    positions = np.empty(len(order), dtype=np.int64)
+    positions[order] = np.arange(len(order))
+    current = positions[n_prior:]
+    timestamps = all_timestamps[order]
+    user_codes = all_user_codes[order]
+    same_user = np.concatenate([[False], user_codes[1:] == user_codes[:-1]])
+
+    minutes_since_previous = np.full(len(timestamps), np.nan)
+    minutes_since_previous[1:] = (timestamps[1:] - timestamps[:-1]) / 6e10
+    minutes_since_previous[~same_user] = np.nan
+    minutes_since_previous = minutes_since_previous[current]
+    last_event = (
+        prior["last_events"].reindex(users).to_numpy(np.float64)
+        if len(prior["last_events"])
+        else np.full(len(users), np.nan)
+    )
+    use_last = np.isnan(minutes_since_previous) & ~np.isnan(last_event)
+    minutes_since_previous[use_last] = (
+        timestamps[current][use_last] - last_event[use_last]
+    ) / 6e10
+
+    # Eventos en [timestamp - ventana, timestamp): búsqueda ordenada sobre la
+    # llave compuesta (usuario, rango del timestamp), como en next_purchase_index.
+    window_ns = int(window_minutes * 6e10)
+    _, ranks = np.unique(
+        np.concatenate([timestamps, timestamps - window_ns]), return_inverse=True
+    )
+    ranks = ranks.astype(np.int64)
+    n_ranks = int(ranks.max()) + 1
+    composite = user_codes * n_ranks + ranks[: len(timestamps)]
+    window_start = user_codes * n_ranks + ranks[len(timestamps) :]
+    recent_events = (
+        np.arange(len(composite))
+        - np.searchsorted(composite, window_start, side="left")
+    )[current]
+    timestamps = timestamps[current]
+
+    first_purchase = (
+        pd.concat(
+            [
+                prior["first_purchases"],
+                pd.Series(
+                    _timestamps_ns(pd.to_datetime(purchases["timestamp"])),
+                    index=purchases["user_id"].to_numpy(),
+                ),
+            ]
+        )
+        .groupby(level=0)
+        .min()
+    )
+    prior_purchase = (
+        first_purchase.reindex(users, fill_value=np.iinfo(np.int64).max).to_numpy(
+            np.int64
+        )
+        < timestamps
+    )
+
+    # Una exposición por instante distinto del usuario en cada experimento,
+    # después de las exposiciones previas.
+    exposure_index = (
+        events.groupby(["user_id", "experiment_name"])["timestamp"]
+        .rank(method="dense")
+        .to_numpy(np.int64)
+    )
+    if len(prior["exposures"]):
+        exposure_index += (
+            prior["exposures"]
+            .reindex(
+                pd.MultiIndex.from_frame(events[["user_id", "experiment_name"]]),
+                fill_value=0,
+            )
+            .to_numpy(np.int64)
+        )
+
+    return pd.DataFrame(
+        {
+            "exposure_index": exposure_index,
+            "minutes_since_previous": minutes_since_previous[instant_codes],
+            "prior_purchase": prior_purchase[instant_codes],
+            "recent_events": recent_events[instant_codes],
+        },
+        index=events.index,
+    )
+
+
+HISTORY_SEGMENTS = {
+    "exposure": lambda features: np.where(
+        features["exposure_index"] == 1, "first", "later"
+    ),
+    "prior_purchase": lambda features: features["prior_purchase"].to_numpy(),
+    "recent_events": lambda features: np.select(
+        [features["recent_events"] == 0, features["recent_events"] <= 2],
+        ["0", "1-2"],
+        "3+",
+    ),
+    "time_since_previous": lambda features: np.select(
+        [
+            features["minutes_since_previous"].isna(),
+            features["minutes_since_previous"] < 5,
+            features["minutes_since_previous"] <= HISTORY_WINDOW_MINUTES,
+        ],
+        ["none", "<5m", "5-60m"],
+        ">60m",
+    ),
+}
+
+
+class HistoryStateStore:
+    """
+    Almacén del historial de los usuarios al inicio de cada día
+    (advance_history_state), con un archivo .npz compacto por día. El historial
+    de un día se construye desde el del día anterior, por lo que cada día del
+    dataset se procesa una sola vez y las características de historial de una
+    solicitud consideran todos los días anteriores sin volver a leerlos.
+
+    Los historiales se guardan bajo la generación del dataset y la ventana de
+    los conteos recientes, como en DayAggregateStore.
+
+    Args:
+        directory (str): Carpeta del almacén.
+        generation (str): Generación del dataset.
+        window_minutes (float, opcional): Ventana de los conteos recientes.
+
+    Methods:
+        has(day) -> bool:
+            Indica si existe el historial al inicio del día.
+
+        write(day, state: dict):
+            Guarda el historial al inicio del día.
+
+        read(day) -> dict:
+            Lee el historial al inicio del día.
+
+        remove_stale_generations(keep=()):
+            Elimina los historiales de las demás generaciones.
+    """
+
+    def __init__(self, directory, generation, window_minutes=HISTORY_WINDOW_MINUTES):
+        self.directory = directory
+        self.generation = generation
+        self.window_minutes = window_minutes
+
+    def remove_stale_generations(self, keep=()):
+        """
+        Elimina los historiales de las generaciones distintas de la del almacén
+        y de las indicadas en keep.
+
+        Args:
+            keep (iterable, opcional): Generaciones que se conservan.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        keep = {self.generation, *keep}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name not in keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def path(self, day):
+        return os.path.join(
+            self.directory,
+            self.generation,
+            f"window={self.window_minutes:g}",
+            f"date={day:%Y-%m-%d}.npz",
+        )
+
+    def has(self, day):
+        """
+        Indica si existe el historial al inicio del día.
+
+        Args:
+            day (datetime): Día.
+
+        Returns:
+            bool: True si el historial existe.
+        """
+        return os.path.exists(self.path(day))
+
+    def write(self, day, state):
+        """
+        Guarda el historial al inicio del día. Los user_id (enteros o texto) y
+        los experimentos se guardan una vez y cada fila solo guarda sus códigos.
+
+        Args:
+            day (datetime): Día.
+            state (dict): Historial de advance_history_state.
+        """
+        path = self.path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        exposures = state["exposures"]
+        parts = {
+            "exposure": exposures.index.get_level_values("user_id"),
+            "last_event": state["last_events"].index,
+            "first_purchase": state["first_purchases"].index,
+            "recent": state["recent"]["user_id"],
+        }
+        user_codes, users = pd.factorize(
+            np.concatenate(
+                [np.asarray(part) for part in parts.values() if len(part)]
+                or [np.array([], dtype=np.int64)]
+            )
+        )
+        users = np.asarray(users)
+        if users.dtype == object:
+            users = users.astype(str)
+        arrays = {"user_id_categories": users}
+        offset = 0
+        for name, part in parts.items():
+            arrays[name + "_user"] = user_codes[offset : offset + len(part)]
+            offset += len(part)
+
+        experiment_codes, experiments = pd.factorize(
+            exposures.index.get_level_values("experiment_name").astype(str)
+        )
+        arrays["exposure_experiment"] = experiment_codes.astype(np.int32)
+        arrays["experiment_name_categories"] = np.asarray(experiments, dtype=str)
+        arrays["exposure"] = exposures.to_numpy(np.int64)
+        arrays["last_event"] = state["last_events"].to_numpy(np.int64)
+        arrays["first_purchase"] = state["first_purchases"].to_numpy(np.int64)
+        arrays["recent"] = state["recent"]["timestamp"].to_numpy(np.int64)
+
+        temporary_path = path + ".tmp.npz"
+        np.savez_compressed(temporary_path, **arrays)
+        os.replace(temporary_path, path)
+
+    def read(self, day):
+        """
+        Lee el historial al inicio del día.
+
+        Args:
+            day (datetime): Día.
+
+        Returns:
+            dict: Historial con la estructura de advance_history_state.
+        """
+        with np.load(self.path(day)) as arrays:
+            users = arrays["user_id_categories"]
+            if users.dtype.kind == "U":
+                users = users.astype(object)
+            experiments = arrays["experiment_name_categories"].astype(object)
+            return {
+                "exposures": pd.Series(
+                    arrays["exposure"],
+                    index=pd.MultiIndex.from_arrays(
+                        [
+                            users[arrays["exposure_user"]],
+                            experiments[arrays["exposure_experiment"]],
+                        ],
+                        names=["user_id", "experiment_name"],
+                    ),
+                ),
+                "last_events": pd.Series(
+                    arrays["last_event"],
+                    index=pd.Index(users[arrays["last_event_user"]], name="user_id"),
+                ),
+                "first_purchases": pd.Series(
+                    arrays["first_purchase"],
+                    index=pd.Index(
+                        users[arrays["first_purchase_user"]], name="user_id"
+                    ),
+                ),
+                "recent": pd.DataFrame(
+                    {
+                        "user_id": users[arrays["recent_user"]],
+                        "timestamp": arrays["recent"],
+                    }
+                ),
+            }
@@ -0,0 +1,278 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from modules.data_processing.data_processor import (
+    ExperimentProcessor,
+    resolve_time_windows,
+)
+from modules.utils.sketches import (
+    QUANTILE_RELATIVE_ACCURACY,
+    QuantileSketch,
+    quantile_sketch_bins,
+)
+
+
+LATENCY_KEYS = ["hour", "event_name", "experiment_name"]
+LATENCY_QUANTILES = (0.5, 0.75, 0.95)
+
+
+def event_latencies(data: pd.DataFrame, day=None, horizon_minutes=720):
+    """
+    Calcula los minutos entre cada evento expandido y su siguiente compra
+    elegible (la siguiente compra del usuario para búsquedas, y del mismo item
+    para el resto), con la búsqueda ordenada de next_purchase_index en lugar de
+    un cruce SQL.
+
+    Args:
+        data (pd.DataFrame): Eventos crudos, incluidas las compras posteriores
+        al día hasta el horizonte.
+        day (datetime, opcional): Día cuyos eventos se miden. Por defecto todos.
+        horizon_minutes (float, opcional): Las compras posteriores a este límite
+        no se asocian con el evento.
+
+    Returns:
+        pd.DataFrame: Columnas hour (YYYY-MM-DD HH en hora local), event_name,
+        experiment_name y minutes_to_purchase (NaN sin compra en el horizonte).
+    """
+    events = ExperimentProcessor(data).time_to_purchase()
+    if day is not None:
+        events = events[events["timestamp"].dt.date == day.date()]
+    minutes = events["minutes_to_purchase"]
+    return pd.DataFrame(
+        {
+            "hour": events["timestamp"].dt.strftime("%Y-%m-%d %H"),
+            "event_name": events["event_name"],
+            "experiment_name": events["experiment_name"],
+            "minutes_to_purchase": minutes.where(minutes <= horizon_minutes),
+        }
+    ).reset_index(drop=True)
+
+
+def hourly_latency_sketches(
+    latencies: pd.DataFrame, relative_accuracy=QUANTILE_RELATIVE_ACCURACY
+) -> list:
+    """
+    Construye en una sola agrupación un sketch de cuantiles de la latencia
+    hasta la compra por hora, tipo de evento y experimento.
+
+    Args:
+        latencies (pd.DataFrame): Resultado de event_latencies.
+        relative_accuracy (float, opcional): Error relativo de los cuantiles.
+
+    Returns:
+        list: Registros con hour, event_name, experiment_name, events (eventos
+        medidos) y sketch (QuantileSketch con las latencias de los eventos con compra).
+    """
+    if latencies.empty:
+        return []
+    events = latencies.groupby(LATENCY_KEYS, sort=True).size()
+
+    converted = latencies.dropna(subset=["minutes_to_purchase"])
+    minutes = converted["minutes_to_purchase"].to_numpy(np.float64)
+    zeros = converted[minutes <= 0].groupby(LATENCY_KEYS).size()
+    positive = converted[minutes > 0]
+    bins = (
+        positive.assign(
+            bin=quantile_sketch_bins(
+                positive["minutes_to_purchase"], relative_accuracy
+            )
+        )
+        .groupby(LATENCY_KEYS + ["bin"])
+        .size()
+    )
+
+    sketches = {key: QuantileSketch(relative_accuracy) for key in events.index}
+    for key, count in zeros.items():
+        sketches[key].zero_count = int(count)
+    for (*key, index), count in bins.items():
+        sketches[tuple(key)].bins[int(index)] = int(count)
+
+    return [
+        {
+            "hour": hour,
+            "event_name": event_name,
+            "experiment_name": experiment_name,
+            "events": int(count),
+            "sketch": sketches[(hour, event_name, experiment_name)],
+        }
+        for (hour, event_name, experiment_name), count in events.items()
+    ]
+
+
+def summarize_latency(
+    records: list,
+    group_by=("event_name",),
+    quantiles=LATENCY_QUANTILES,
+    time_windows=None,
+) -> list:
+    """
+    Une los sketches por hora de cada grupo y calcula sus cuantiles y la
+    proporción de compras que caen dentro de la ventana de atribución vigente.
+
+    Args:
+        records (list): Registros de hourly_latency_sketches.
+        group_by (tuple, opcional): Llaves de agrupación (event_name,
+        experiment_name, hour).
+        quantiles (tuple, opcional): Cuantiles a reportar.
+        time_windows (dict, opcional): Ventanas de atribución a validar.
+
+    Returns:
+        list: Por grupo, sus llaves, events, converted, los cuantiles en minutos
+        (p50, p75, ...), window_minutes y within_window. Las llaves de cuantiles y
+        ventana solo tienen sentido con un único tipo de evento por grupo.
+    """
+    windows = resolve_time_windows(time_windows)
+    groups = {}
+    for record in records:
+        key = tuple(record[column] for column in group_by)
+        if key not in groups:
+            groups[key] = {"events": 0, "sketch": record["sketch"]}
+        else:
+            groups[key]["sketch"] = groups[key]["sketch"].merge(record["sketch"])
+        groups[key]["events"] += record["events"]
+
+    summary = []
+    for key in sorted(groups):
+        group = dict(zip(group_by, key))
+        sketch = groups[key]["sketch"]
+        group["events"] = groups[key]["events"]
+        group["converted"] = sketch.count()
+        for q in quantiles:
+            group[f"p{round(q * 100):g}"] = sketch.quantile(q)
+        if "event_name" in group:
+            window = windows.get(group["event_name"], windows["default"])
+            group["window_minutes"] = window
+            group["within_window"] = sketch.rank(window)
+        summary.append(group)
+    return summary
+
+
+class LatencySketchStore:
+    """
+    Almacén de los sketches de latencia hasta la compra de cada hora, con un
+    archivo JSON por día. Un día queda completo cuando los datos cubren su
+    horizonte de compras; los días incompletos (los más recientes) se vuelven a
+    calcular en cada actualización, y los completos no se recalculan mientras
+    no cambie el dataset, por lo que refrescar solo procesa los días nuevos.
+
+    Los sketches se guardan bajo la generación del dataset, como en
+    DayAggregateStore, por lo que reemplazar los archivos de un día completo
+    hace que se vuelva a calcular.
+
+    Args:
+        directory (str): Carpeta del almacén.
+        generation (str): Generación del dataset.
+        horizon_minutes (float, opcional): Latencia máxima medida.
+        relative_accuracy (float, opcional): Error relativo de los cuantiles.
+
+    Methods:
+        is_complete(day) -> bool:
+            Indica si el día ya está guardado y completo.
+
+        write(day, records: list, complete: bool):
+            Guarda los sketches por hora de un día.
+
+        read(day) -> list:
+            Lee los sketches por hora de un día.
+
+        remove_stale_generations(keep=()):
+            Elimina los sketches de las demás generaciones.
+    """
+
+    def __init__(
+        self,
+        directory,
+        generation,
+        horizon_minutes=720,
+        relative_accuracy=QUANTILE_RELATIVE_ACCURACY,
+    ):
+        self.directory = directory
+        self.generation = generation
+        self.horizon_minutes = horizon_minutes
+        self.relative_accuracy = relative_accuracy
+
+    def remove_stale_generations(self, keep=()):
+        """
+        Elimina los sketches de las generaciones distintas de la del almacén y
+        de las indicadas en keep.
+
+        Args:
+            keep (iterable, opcional): Generaciones que se conservan.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        keep = {self.generation, *keep}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name not in keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def path(self, day):
+        return os.path.join(
+            self.directory,
+            self.generation,
+            f"horizon={self.horizon_minutes:g}_accuracy={self.relative_accuracy:g}",
+            f"date={day:%Y-%m-%d}.json",
+        )
+
+    def is_complete(self, day):
+        """
+        Indica si el día ya está guardado y completo.
+
+        Args:
+            day (datetime): Día.
+
+        Returns:
+            bool: True si el día está guardado con todo su horizonte de compras.
+        """
+        try:
+            with open(self.path(day)) as file:
+                return json.load(file)["complete"]
+        except FileNotFoundError:
+            return False
+
+    def write(self, day, records, complete):
+        """
+        Guarda los sketches por hora de un día.
+
+        Args:
+            day (datetime): Día.
+            records (list): Registros de hourly_latency_sketches.
+            complete (bool): Si los datos cubren todo el horizonte del día.
+        """
+        path = self.path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = {
+            "complete": complete,
+            "records": [
+                {**record, "sketch": record["sketch"].to_dict()} for record in records
+            ],
+        }
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(payload, file)
+        os.replace(temporary_path, path)
+
+    def read(self, day):
+        """
+        Lee los sketches por hora de un día.
+
+        Args:
+            day (datetime): Día.
+
+        Returns:
+            list: Registros con los sketches reconstruidos, vacío si no existe.
+        """
+        try:
+            with open(self.path(day)) as file:
+                payload = json.load(file)
+        except FileNotFoundError:
+            return []
+        return [
+            {**record, "sketch": QuantileSketch.from_dict(record["sketch"])}
+            for record in payload["records"]
+        ]
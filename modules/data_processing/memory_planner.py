@@ -0,0 +1,219 @@
+import math
+import os
+import threading
+
+import pandas as pd
+
+from modules.data_processing.data_processor import ExperimentProcessor
+
+
+CGROUP_V2_LIMIT = "/sys/fs/cgroup/memory.max"
+CGROUP_V2_USAGE = "/sys/fs/cgroup/memory.current"
+CGROUP_V1_LIMIT = "/sys/fs/cgroup/memory/memory.limit_in_bytes"
+CGROUP_V1_USAGE = "/sys/fs/cgroup/memory/memory.usage_in_bytes"
+
+# Relación entre el pico del etiquetado (filas expandidas, cruces con las
+# compras y concatenación) y el tamaño del DataFrame expandido medido con
+# memory_usage(deep=True), que cuenta cada texto repetido aunque se comparta.
+PEAK_FACTOR = 1.5
+SAMPLE_ROWS = 1000
+
+_row_bytes_cache = {}
+_row_bytes_lock = threading.Lock()
+
+
+def read_memory_file(path):
+    """
+    Lee un valor en bytes de un archivo de cgroup.
+
+    Args:
+        path (str): Ruta del archivo.
+
+    Returns:
+        int: Valor en bytes, o None si no existe o no tiene límite.
+    """
+    try:
+        with open(path) as file:
+            value = file.read().strip()
+    except OSError:
+        return None
+    if not value.isdigit():
+        return None
+    value = int(value)
+    # cgroup v1 reporta un valor cercano a 2**63 cuando no hay límite.
+    return value if value < 2**60 else None
+
+
+def available_memory_bytes():
+    """
+    Estima la memoria disponible para el proceso: el límite del contenedor
+    (cgroup v2 o v1) menos el uso actual, o MemAvailable del sistema si el
+    contenedor no tiene límite. MEMORY_BUDGET_MB reemplaza la estimación.
+
+    Returns:
+        int: Memoria disponible en bytes, o None si no se puede estimar.
+    """
+    budget_mb = os.getenv("MEMORY_BUDGET_MB")
+    if budget_mb:
+        return int(float(budget_mb) * 2**20)
+
+    for limit_path, usage_path in (
+        (CGROUP_V2_LIMIT, CGROUP_V2_USAGE),
+        (CGROUP_V1_LIMIT, CGROUP_V1_USAGE),
+    ):
+        limit = read_memory_file(limit_path)
+        if limit is not None:
+            return max(limit - (read_memory_file(usage_path) or 0), 0)
+
+    try:
+        with open("/proc/meminfo") as file:
+            for line in file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemoryPlan:
+    """
+    Plan de ejecución del etiquetado según la memoria estimada.
+
+    Args:
+        raw_rows (int): Eventos crudos.
+        expanded_rows (int): Filas estimadas después de expandir los experimentos.
+        estimated_bytes (int): Pico de memoria estimado del etiquetado.
+        budget_bytes (int): Memoria asignada al etiquetado, o None si no se conoce.
+        n_chunks (int): Número de grupos de usuarios en que se procesa.
+
+    Methods:
+        to_dict() -> dict:
+            Representa el plan como diccionario serializable.
+    """
+
+    def __init__(self, raw_rows, expanded_rows, estimated_bytes, budget_bytes, n_chunks):
+        self.raw_rows = raw_rows
+        self.expanded_rows = expanded_rows
+        self.estimated_bytes = estimated_bytes
+        self.budget_bytes = budget_bytes
+        self.n_chunks = n_chunks
+
+    @property
+    def chunked(self):
+        return self.n_chunks > 1
+
+    def to_dict(self):
+        """
+        Representa el plan como diccionario serializable.
+
+        Returns:
+            dict: Filas, memoria estimada y presupuesto en MB y número de grupos.
+        """
+        return {
+            "raw_rows": self.raw_rows,
+            "expanded_rows": self.expanded_rows,
+            "estimated_mb": self.estimated_bytes / 2**20,
+            "budget_mb": (
+                None if self.budget_bytes is None else self.budget_bytes / 2**20
+            ),
+            "n_chunks": self.n_chunks,
+        }
+
+
+def estimate_expanded_rows(data: pd.DataFrame) -> int:
+    """
+    Cuenta las filas que genera la expansión de experimentos sin expandir: una
+    por cada experimento de la cadena de cada evento que no es compra.
+
+    Args:
+        data (pd.DataFrame): Eventos crudos.
+
+    Returns:
+        int: Número de filas expandidas.
+    """
+    experiments = data.loc[data["event_name"] != "BUY", "experiments"].astype(str)
+    return int((experiments.str.count(", ") + 1).sum())
+
+
+def estimate_expanded_row_bytes(data: pd.DataFrame, sample_rows=SAMPLE_ROWS) -> float:
+    """
+    Mide los bytes por fila del DataFrame expandido expandiendo una muestra
+    de los eventos.
+
+    Args:
+        data (pd.DataFrame): Eventos crudos.
+        sample_rows (int, opcional): Eventos de la muestra.
+
+    Returns:
+        float: Bytes por fila expandida.
+    """
+    sample = data[data["event_name"] != "BUY"].head(sample_rows)
+    if sample.empty:
+        return 0.0
+    expanded = ExperimentProcessor(sample).get_experimets_data()
+    return expanded.memory_usage(deep=True).sum() / max(len(expanded), 1)
+
+
+def cached_expanded_row_bytes(data: pd.DataFrame, generation=None) -> float:
+    """
+    Obtiene los bytes por fila expandida, midiéndolos una sola vez por
+    generación del dataset en lugar de expandir una muestra en cada solicitud.
+
+    Args:
+        data (pd.DataFrame): Eventos crudos.
+        generation (str, opcional): Generación del dataset. Si es None, se mide
+        sin guardar el resultado.
+
+    Returns:
+        float: Bytes por fila expandida.
+    """
+    if generation is None:
+        return estimate_expanded_row_bytes(data)
+    with _row_bytes_lock:
+        if generation in _row_bytes_cache:
+            return _row_bytes_cache[generation]
+    row_bytes = estimate_expanded_row_bytes(data)
+    if row_bytes:
+        with _row_bytes_lock:
+            _row_bytes_cache.clear()
+            _row_bytes_cache[generation] = row_bytes
+    return row_bytes
+
+
+def plan_processing(
+    data: pd.DataFrame, budget_bytes=None, budget_share=None, generation=None
+):
+    """
+    Estima el pico de memoria del etiquetado a partir del número de experimentos
+    por evento y decide en cuántos grupos de usuarios procesarlo para no
+    superar la memoria disponible.
+
+    Args:
+        data (pd.DataFrame): Eventos crudos.
+        budget_bytes (int, opcional): Memoria disponible. Por defecto la estimada
+        con available_memory_bytes.
+        budget_share (float, opcional): Fracción de la memoria disponible que se
+        asigna al etiquetado. Por defecto MEMORY_BUDGET_SHARE o 0.5.
+        generation (str, opcional): Generación del dataset, para reutilizar la
+        medición de bytes por fila (ver cached_expanded_row_bytes).
+
+    Returns:
+        MemoryPlan: Plan de ejecución.
+    """
+    if budget_share is None:
+        budget_share = float(os.getenv("MEMORY_BUDGET_SHARE", 0.5))
+    if budget_bytes is None:
+        budget_bytes = available_memory_bytes()
+    if budget_bytes is not None:
+        budget_bytes = int(budget_bytes * budget_share)
+
+    expanded_rows = estimate_expanded_rows(data)
+    estimated_bytes = int(
+        expanded_rows * cached_expanded_row_bytes(data, generation) * PEAK_FACTOR
+    )
+
+    n_chunks = 1
+    if budget_bytes:
+        n_chunks = max(math.ceil(estimated_bytes / budget_bytes), 1)
+        n_chunks = min(n_chunks, max(data["user_id"].nunique(), 1))
+    return MemoryPlan(len(data), expanded_rows, estimated_bytes, budget_bytes, n_chunks)
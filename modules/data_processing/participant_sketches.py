@@ -0,0 +1,198 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from modules.data_processing.aggregate_store import windows_key
+from modules.data_processing.data_processor import (
+    ExperimentProcessor,
+    resolve_time_windows,
+    window_minutes,
+)
+from modules.utils.sketches import HLL_PRECISION, HyperLogLog, hash_values, hll_registers
+
+
+SKETCH_KEYS = ["hour", "experiment_name", "variant_id"]
+
+
+def event_conversions(data: pd.DataFrame, day=None, time_windows=None):
+    """
+    Indica, para cada evento expandido, si tiene una compra elegible dentro de
+    su ventana de atribución, usando la búsqueda ordenada de time_to_purchase en
+    lugar de los cruces y la agrupación por usuario de label_experiments.
+
+    Un usuario convierte en una variante si alguno de sus eventos tiene compra
+    en la ventana, lo mismo que with_purchase en el etiquetado exacto.
+
+    Args:
+        data (pd.DataFrame): Eventos crudos, incluidas las compras posteriores
+        al día hasta la ventana más larga.
+        day (datetime, opcional): Día cuyos eventos se miden. Por defecto todos.
+        time_windows (dict, opcional): Ventanas de atribución en minutos por
+        tipo de evento.
+
+    Returns:
+        pd.DataFrame: Columnas hour (YYYY-MM-DD HH en hora local),
+        experiment_name, variant_id, user_id y converted.
+    """
+    events = ExperimentProcessor(data).time_to_purchase()
+    if day is not None:
+        events = events[events["timestamp"].dt.date == day.date()]
+    windows = resolve_time_windows(time_windows)
+    return pd.DataFrame(
+        {
+            "hour": events["timestamp"].dt.strftime("%Y-%m-%d %H"),
+            "experiment_name": events["experiment_name"],
+            "variant_id": events["variant_id"],
+            "user_id": events["user_id"],
+            "converted": events["minutes_to_purchase"]
+            <= window_minutes(events["event_name"], windows),
+        }
+    ).reset_index(drop=True)
+
+
+class ParticipantSketchStore:
+    """
+    Almacén de sketches HyperLogLog de participantes y compradores por hora,
+    experimento y variante, con un archivo .npz compacto por día. Los sketches
+    de cada hora se unen (máximo de sus registros) en días y rangos con memoria
+    constante, sin leer filas por usuario ni volver a procesar los eventos.
+
+    Los sketches se guardan bajo la generación del dataset y la llave de las
+    ventanas de atribución, como en DayAggregateStore.
+
+    Args:
+        directory (str): Carpeta del almacén.
+        generation (str): Generación del dataset.
+
+    Methods:
+        has(day, time_windows) -> bool:
+            Indica si existen los sketches del día.
+
+        write(day, time_windows, conversions: pd.DataFrame):
+            Guarda los sketches por hora de un día.
+
+        read(day, time_windows, experiment_name) -> dict:
+            Une los sketches por hora de cada variante en un día.
+
+        remove_stale_generations(keep=()):
+            Elimina los sketches de las demás generaciones.
+    """
+
+    def __init__(self, directory, generation):
+        self.directory = directory
+        self.generation = generation
+
+    def remove_stale_generations(self, keep=()):
+        """
+        Elimina los sketches de las generaciones distintas de la del almacén y
+        de las indicadas en keep.
+
+        Args:
+            keep (iterable, opcional): Generaciones que se conservan.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        keep = {self.generation, *keep}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name not in keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def path(self, day, time_windows):
+        return os.path.join(
+            self.directory,
+            self.generation,
+            windows_key(time_windows),
+            f"date={day:%Y-%m-%d}.npz",
+        )
+
+    def has(self, day, time_windows):
+        """
+        Indica si existen los sketches del día.
+
+        Args:
+            day (datetime): Día.
+            time_windows (dict): Ventanas de atribución.
+
+        Returns:
+            bool: True si los sketches existen.
+        """
+        return os.path.exists(self.path(day, time_windows))
+
+    def write(self, day, time_windows, conversions):
+        """
+        Guarda los sketches de un día, una fila de registros por hora,
+        experimento y variante, construidos en una sola pasada por hll_registers.
+
+        Args:
+            day (datetime): Día.
+            time_windows (dict): Ventanas de atribución.
+            conversions (pd.DataFrame): Resultado de event_conversions del día.
+        """
+        path = self.path(day, time_windows)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        group_codes = np.zeros(len(conversions), dtype=np.int64)
+        arrays = {}
+        for column in SKETCH_KEYS:
+            codes, categories = pd.factorize(conversions[column].astype(str))
+            arrays[column + "_categories"] = np.asarray(categories, dtype=str)
+            group_codes = group_codes * max(len(categories), 1) + codes
+        group_keys, group_codes = np.unique(group_codes, return_inverse=True)
+        for column in reversed(SKETCH_KEYS):
+            n_categories = max(len(arrays[column + "_categories"]), 1)
+            arrays[column] = (group_keys % n_categories).astype(np.int32)
+            group_keys = group_keys // n_categories
+
+        user_codes, users = pd.factorize(conversions["user_id"])
+        hashes = hash_values(users)[user_codes]
+        converted = conversions["converted"].to_numpy(bool)
+        n_groups = len(arrays["hour"])
+        arrays["participants"] = hll_registers(hashes, group_codes, n_groups)
+        arrays["converters"] = hll_registers(
+            hashes[converted], group_codes[converted], n_groups
+        )
+
+        temporary_path = path + ".tmp.npz"
+        np.savez_compressed(temporary_path, **arrays)
+        os.replace(temporary_path, path)
+
+    def read(self, day, time_windows, experiment_name):
+        """
+        Une los sketches por hora de cada variante de un experimento en un día.
+
+        Args:
+            day (datetime): Día.
+            time_windows (dict): Ventanas de atribución.
+            experiment_name (str): Experimento.
+
+        Returns:
+            dict: Por variante, un diccionario con los HyperLogLog participants y
+            converters. Vacío si el experimento no tiene datos ese día.
+        """
+        with np.load(self.path(day, time_windows)) as arrays:
+            matches = np.flatnonzero(
+                arrays["experiment_name_categories"] == experiment_name
+            )
+            if len(matches) == 0:
+                return {}
+            rows = arrays["experiment_name"] == matches[0]
+            variant_codes = arrays["variant_id"][rows]
+            variants = arrays["variant_id_categories"]
+            participants = arrays["participants"][rows]
+            converters = arrays["converters"][rows]
+
+        sketches = {}
+        for code in np.unique(variant_codes):
+            variant_rows = variant_codes == code
+            sketches[str(variants[code])] = {
+                "participants": HyperLogLog(
+                    HLL_PRECISION, participants[variant_rows].max(axis=0)
+                ),
+                "converters": HyperLogLog(
+                    HLL_PRECISION, converters[variant_rows].max(axis=0)
+                ),
+            }
+        return sketches
@@ -2,7 +2,11 @@ from pandasql import sqldf
 import pandas as pd
 import numpy as np
 
-from modules.data_processing.data_processor import ExperimentProcessor
+from modules.data_processing.data_processor import (
+    ExperimentProcessor,
+    resolve_time_windows,
+    window_minutes,
+)
 
 
 class SequentialExperimentProcessor:
@@ -14,6 +18,7 @@ class SequentialExperimentProcessor:
 
     Args:
         data (pd.DataFrame): DataFrame que contiene una columna 'experiments' con cadenas de experimentos.
+        time_windows (dict, opcional): Ventanas de atribución en minutos por tipo de evento.
 
     Methods:
         prepare_events_data() -> pd.DataFrame:
@@ -42,16 +47,19 @@ class SequentialExperimentProcessor:
                 pd.DataFrame: DataFrame con etiquetas indicando si hubo compra.
     """
 
-    def __init__(self, data):
+    def __init__(self, data, time_windows=None):
         """
         Inicializa la clase con un DataFrame.
 
         Args:
             data (pd.DataFrame): DataFrame que contiene una columna 'experiments'
             con cadenas de experimentos.
+            time_windows (dict, opcional): Ventanas de atribución en minutos por
+            tipo de evento. Por defecto 210 minutos para SEARCH y 81 para el resto.
 
         """
         self.data = data
+        self.time_windows = resolve_time_windows(time_windows)
 
     def prepare_events_data(self):
         df = self.data[~self.data["event_name"].isin(["BUY"])].copy()
@@ -73,10 +81,8 @@ class SequentialExperimentProcessor:
                 df["item_id"].notna() & (df["item_id"] != ""),
             ]
         )["timestamp"].shift(1)
-        df["max_time"] = np.where(
-            df["event_name"] == "SEARCH",
-            pd.to_datetime(df["timestamp"]) + pd.Timedelta(minutes=210),
-            pd.to_datetime(df["timestamp"]) + pd.Timedelta(minutes=81),
+        df["max_time"] = df["timestamp"] + pd.to_timedelta(
+            window_minutes(df["event_name"], self.time_windows), unit="m"
         )
 
         return df
@@ -0,0 +1,164 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class AdmissionRejectedError(Exception):
+    """
+    Se lanza cuando una ejecución no obtiene un cupo: la cola de espera está
+    llena o se cumplió el plazo de espera.
+
+    Args:
+        reason (str): queue_full o timeout.
+        retry_after (int): Segundos sugeridos antes de reintentar.
+    """
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Admission rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Control de admisión para las ejecuciones pesadas del pipeline (carga,
+    etiquetado y análisis): como máximo max_concurrent se ejecutan a la vez,
+    hasta max_waiting esperan un cupo durante wait_timeout segundos, y el resto
+    se rechaza de inmediato. Así un pico de solicitudes frías degrada el
+    servicio con respuestas 503 rápidas en lugar de agotar la memoria.
+
+    Los trabajos en segundo plano esperan su cupo sin plazo en una cola aparte
+    (waiting_jobs), que no cuenta para max_waiting, por lo que no provocan
+    rechazos de las solicitudes interactivas.
+
+    El tiempo sugerido para reintentar se estima con la duración promedio
+    (móvil exponencial) de las ejecuciones y la cola actual.
+
+    Args:
+        max_concurrent (int, opcional): Ejecuciones simultáneas.
+        max_waiting (int, opcional): Solicitudes que pueden esperar un cupo.
+        wait_timeout (float, opcional): Segundos máximos de espera en la cola.
+
+    Methods:
+        admit(blocking=False):
+            Context manager que ocupa un cupo durante la ejecución.
+
+        retry_after() -> int:
+            Segundos sugeridos para reintentar.
+
+        stats() -> dict:
+            Cupos en uso, cola, ejecuciones admitidas y rechazadas.
+    """
+
+    def __init__(self, max_concurrent=2, max_waiting=8, wait_timeout=10.0):
+        """
+        Inicializa el control de admisión.
+
+        Args:
+            max_concurrent (int, opcional): Ejecuciones simultáneas.
+            max_waiting (int, opcional): Solicitudes que pueden esperar un cupo.
+            wait_timeout (float, opcional): Segundos máximos de espera en la cola.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.waiting_jobs = 0
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "timeout": 0}
+        self.average_seconds = None
+
+    def retry_after(self):
+        """
+        Estima los segundos hasta que se libere un cupo para una nueva solicitud.
+
+        Returns:
+            int: Segundos sugeridos (al menos 1).
+        """
+        average = self.average_seconds or 1.0
+        queued = self.waiting + self.waiting_jobs + 1
+        return max(1, math.ceil(average * queued / self.max_concurrent))
+
+    def _reject(self, reason):
+        self.shed[reason] += 1
+        raise AdmissionRejectedError(reason, self.retry_after())
+
+    @contextmanager
+    def admit(self, blocking=False):
+        """
+        Ocupa un cupo durante el bloque. Sin cupo libre la solicitud espera en
+        la cola, si hay lugar, hasta wait_timeout segundos.
+
+        Args:
+            blocking (bool, opcional): Si es True espera sin plazo en la cola de
+            trabajos (waiting_jobs), sin límite ni efecto sobre max_waiting
+            (para trabajos en segundo plano, que ya tienen su propio pool).
+
+        Raises:
+            AdmissionRejectedError: Si la cola está llena o se cumple el plazo.
+        """
+        with self._condition:
+            if self.active >= self.max_concurrent:
+                if blocking:
+                    self.waiting_jobs += 1
+                    try:
+                        while self.active >= self.max_concurrent:
+                            self._condition.wait()
+                    finally:
+                        self.waiting_jobs -= 1
+                else:
+                    if self.waiting >= self.max_waiting:
+                        self._reject("queue_full")
+                    deadline = time.monotonic() + self.wait_timeout
+                    self.waiting += 1
+                    try:
+                        while self.active >= self.max_concurrent:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                self._reject("timeout")
+                            self._condition.wait(remaining)
+                    finally:
+                        self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._condition:
+                self.active -= 1
+                self.average_seconds = (
+                    elapsed
+                    if self.average_seconds is None
+                    else 0.8 * self.average_seconds + 0.2 * elapsed
+                )
+                self._condition.notify_all()
+
+    def stats(self):
+        """
+        Estado del control de admisión.
+
+        Returns:
+            dict: max_concurrent, max_waiting, wait_timeout, active, waiting
+            (solicitudes interactivas en cola), waiting_jobs (trabajos en segundo
+            plano en cola), admitted, shed (rechazos por cola llena y por plazo),
+            average_seconds y retry_after.
+        """
+        with self._condition:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_waiting": self.max_waiting,
+                "wait_timeout": self.wait_timeout,
+                "active": self.active,
+                "waiting": self.waiting,
+                "waiting_jobs": self.waiting_jobs,
+                "admitted": self.admitted,
+                "shed": dict(self.shed),
+                "average_seconds": self.average_seconds,
+                "retry_after": self.retry_after(),
+            }
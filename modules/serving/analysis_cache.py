@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Caché en memoria con política LRU y expiración, segura entre hilos, para
+    objetos que se reutilizan entre solicitudes (por ejemplo los agregados por
+    variante de un experimento y los análisis calculados a partir de ellos).
+
+    La expiración evita servir agregados de una versión anterior del dataset
+    sin tener que consultar su generación en cada solicitud.
+
+    Args:
+        max_entries (int): Entradas máximas; al superarlas se elimina la usada
+        hace más tiempo.
+        ttl_seconds (float, opcional): Segundos de vida de cada entrada. Por
+        defecto no expiran.
+
+    Methods:
+        get(key) -> object:
+            Obtiene una entrada vigente, o None.
+
+        put(key, value):
+            Guarda una entrada.
+
+        get_or_compute(key, function) -> object:
+            Obtiene la entrada o la calcula con function() y la guarda.
+    """
+
+    def __init__(self, max_entries=128, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Obtiene una entrada vigente y la marca como la usada más recientemente.
+
+        Args:
+            key (hashable): Llave de la entrada.
+
+        Returns:
+            object: Valor guardado, o None si no existe o expiró.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None:
+                if time.monotonic() - entry[0] > self.ttl_seconds:
+                    del self._entries[key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """
+        Guarda una entrada y elimina las usadas hace más tiempo si se supera
+        max_entries.
+
+        Args:
+            key (hashable): Llave de la entrada.
+            value (object): Valor a guardar.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, function):
+        """
+        Obtiene la entrada o la calcula fuera del lock con function() y la
+        guarda. Dos solicitudes simultáneas pueden calcularla ambas; el
+        resultado es el mismo. Si function() devuelve None no se guarda.
+
+        Args:
+            key (hashable): Llave de la entrada.
+            function (callable): Función sin argumentos que calcula el valor.
+
+        Returns:
+            object: Valor guardado o calculado.
+        """
+        value = self.get(key)
+        if value is None:
+            value = function()
+            if value is not None:
+                self.put(key, value)
+        return value
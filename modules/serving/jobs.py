@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueueFullError(Exception):
+    """
+    Se lanza cuando el número de trabajos pendientes alcanza el máximo permitido.
+    """
+
+
+class AnalysisJob:
+    """
+    Trabajo de análisis ejecutado en segundo plano. La función del trabajo
+    puede devolver el cuerpo de la respuesta o una tupla (cuerpo, código HTTP);
+    los resultados con código 4xx o 5xx dejan el trabajo como fallido.
+
+    Args:
+        key (str): Llave normalizada de los parámetros, usada para deduplicar.
+    """
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = PENDING
+        self.result = None
+        self.status_code = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def finish(self, result):
+        """
+        Registra el resultado de la función del trabajo y su estado final.
+
+        Args:
+            result (object): Cuerpo de la respuesta o tupla (cuerpo, código HTTP).
+        """
+        if isinstance(result, tuple):
+            self.result, self.status_code = result
+        else:
+            self.result, self.status_code = result, 200
+        if self.status_code >= 400:
+            self.status = FAILED
+            if isinstance(self.result, dict):
+                self.error = self.result.get("error")
+        else:
+            self.status = SUCCEEDED
+
+    def to_dict(self):
+        """
+        Representa el trabajo como diccionario serializable.
+
+        Returns:
+            dict: Estado, tiempos y, si terminó, status_code, el resultado (si lo
+            hay) y, si falló, el error.
+        """
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.done:
+            job["status_code"] = self.status_code
+            if self.result is not None:
+                job["result"] = self.result
+        if self.status == FAILED:
+            job["error"] = self.error
+        return job
+
+
+class AnalysisJobManager:
+    """
+    Ejecuta análisis largos en un pool acotado de hilos, para que las solicitudes
+    HTTP no queden bloqueadas durante el procesamiento.
+
+    Los trabajos con los mismos parámetros (misma llave) que estén pendientes, en
+    ejecución o terminados hace menos de ttl_seconds se reutilizan en lugar de
+    volver a calcularse, y los trabajos terminados se eliminan al expirar.
+
+    Args:
+        max_workers (int, opcional): Número de análisis que se ejecutan a la vez.
+        max_pending (int, opcional): Máximo de trabajos pendientes o en ejecución.
+        ttl_seconds (float, opcional): Segundos que se conserva el resultado de un trabajo.
+
+    Methods:
+        submit(key: str, function, *args) -> AnalysisJob:
+            Encola un trabajo o devuelve el trabajo existente con la misma llave.
+            Returns:
+                AnalysisJob: Trabajo encolado o reutilizado.
+
+        get(job_id: str) -> AnalysisJob:
+            Obtiene un trabajo por su id.
+            Returns:
+                AnalysisJob: Trabajo, o None si no existe o expiró.
+    """
+
+    def __init__(self, max_workers=2, max_pending=32, ttl_seconds=3600):
+        """
+        Inicializa el pool de trabajos.
+
+        Args:
+            max_workers (int, opcional): Número de análisis que se ejecutan a la vez.
+            max_pending (int, opcional): Máximo de trabajos pendientes o en ejecución.
+            ttl_seconds (float, opcional): Segundos que se conserva el resultado.
+        """
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="analysis-job"
+        )
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._jobs_by_key = {}
+        self._logger = logging.getLogger(__name__)
+
+    def _purge_expired(self, now):
+        expired = [
+            job
+            for job in self._jobs.values()
+            if job.done and now - job.finished_at > self.ttl_seconds
+        ]
+        for job in expired:
+            del self._jobs[job.id]
+            if self._jobs_by_key.get(job.key) is job:
+                del self._jobs_by_key[job.key]
+
+    def _run(self, job, function, args):
+        job.started_at = time.time()
+        job.status = RUNNING
+        try:
+            job.finish(function(*args))
+        except Exception:
+            self._logger.exception("Analysis job %s failed:", job.id)
+            job.error = "An unexpected error occurred"
+            job.status_code = 500
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def submit(self, key, function, *args):
+        """
+        Encola la ejecución de function(*args), o devuelve el trabajo vigente con
+        la misma llave.
+
+        Args:
+            key (str): Llave normalizada de los parámetros del análisis.
+            function (callable): Función que calcula el resultado.
+            *args: Argumentos de la función.
+
+        Returns:
+            AnalysisJob: Trabajo encolado o reutilizado.
+
+        Raises:
+            JobQueueFullError: Si ya hay max_pending trabajos sin terminar.
+        """
+        with self._lock:
+            self._purge_expired(time.time())
+            job = self._jobs_by_key.get(key)
+            if job is not None and job.status != FAILED:
+                return job
+
+            in_flight = sum(not job.done for job in self._jobs.values())
+            if in_flight >= self.max_pending:
+                raise JobQueueFullError("Too many analysis jobs in progress")
+
+            job = AnalysisJob(key)
+            self._jobs[job.id] = job
+            self._jobs_by_key[key] = job
+        self._executor.submit(self._run, job, function, args)
+        return job
+
+    def get(self, job_id):
+        """
+        Obtiene un trabajo por su id.
+
+        Args:
+            job_id (str): Id del trabajo.
+
+        Returns:
+            AnalysisJob: Trabajo, o None si no existe o su resultado expiró.
+        """
+        with self._lock:
+            self._purge_expired(time.time())
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait=True):
+        """
+        Detiene el pool de hilos.
+
+        Args:
+            wait (bool, opcional): Si es True, espera a que terminen los trabajos.
+        """
+        self._executor.shutdown(wait=wait)
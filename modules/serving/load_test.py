@@ -0,0 +1,191 @@
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlencode
+from urllib.request import urlopen
+
+import numpy as np
+from werkzeug.serving import make_server
+
+from modules.data_processing.data_loader import use_local_dataset
+from modules.serving.result_store import ResultStore
+from modules.utils.synthetic_data import DEFAULT_EXPERIMENTS, generate_events
+
+
+DEFAULT_SCENARIOS = [
+    {"name": "hot_key", "concurrency": 8, "requests": 100, "hot_share": 0.9},
+    {"name": "cold_keys", "concurrency": 8, "requests": 50, "hot_share": 0.0},
+    {
+        "name": "optional_params",
+        "concurrency": 4,
+        "requests": 30,
+        "hot_share": 0.5,
+        "params": [{"segment_by": "hour"}, {"contamination": "1"}],
+    },
+]
+
+
+def build_request_paths(scenario, experiment_names, days, seed=0):
+    """
+    Construye las rutas de las solicitudes de un escenario. Una fracción
+    hot_share de las solicitudes va a una única llave (experimento y día) y el
+    resto se reparte uniformemente entre experimentos, días y parámetros.
+
+    Args:
+        scenario (dict): Escenario con requests, hot_share y params opcionales.
+        experiment_names (list): Experimentos disponibles.
+        days (list): Días disponibles (datetime).
+        seed (int, opcional): Semilla aleatoria.
+
+    Returns:
+        list: Rutas relativas de las solicitudes.
+    """
+    rng = np.random.default_rng(seed)
+    n_requests = scenario["requests"]
+    params = scenario.get("params") or [{}]
+
+    is_hot = rng.random(n_requests) < scenario.get("hot_share", 0.0)
+    experiment_index = np.where(
+        is_hot, 0, rng.integers(0, len(experiment_names), n_requests)
+    )
+    day_index = np.where(
+        is_hot, len(days) - 1, rng.integers(0, len(days), n_requests)
+    )
+    hours = rng.integers(0, 24, n_requests)
+    params_index = np.where(is_hot, 0, rng.integers(0, len(params), n_requests))
+
+    paths = []
+    for i in range(n_requests):
+        query = {"day": f"{days[day_index[i]]:%Y-%m-%d} {hours[i]:02d}"}
+        query.update(params[params_index[i]])
+        experiment_name = quote(experiment_names[experiment_index[i]], safe="")
+        paths.append(f"/experiment/{experiment_name}/result?{urlencode(query)}")
+    return paths
+
+
+def send_request(url, timeout):
+    """
+    Envía una solicitud GET y mide su latencia.
+
+    Args:
+        url (str): URL completa.
+        timeout (float): Segundos máximos de espera.
+
+    Returns:
+        tuple: Latencia en segundos y código de estado (0 si falló la conexión).
+    """
+    start = time.perf_counter()
+    try:
+        with urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except HTTPError as error:
+        status = error.code
+    except (URLError, OSError):
+        status = 0
+    return time.perf_counter() - start, status
+
+
+def run_scenario(base_url, scenario, paths, timeout=60):
+    """
+    Ejecuta un escenario con la concurrencia indicada y resume sus métricas.
+
+    Args:
+        base_url (str): URL base del servidor.
+        scenario (dict): Escenario con name y concurrency.
+        paths (list): Rutas de las solicitudes.
+        timeout (float, opcional): Segundos máximos por solicitud.
+
+    Returns:
+        dict: Solicitudes, throughput (solicitudes por segundo), latencias p50, p95
+        y p99 en milisegundos, tasa de error y conteo por código de estado.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=scenario["concurrency"]) as executor:
+        results = list(
+            executor.map(lambda path: send_request(base_url + path, timeout), paths)
+        )
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    statuses = np.array([status for _, status in results])
+    codes, counts = np.unique(statuses, return_counts=True)
+    failed = (statuses == 0) | (statuses >= 500)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(paths) else (0, 0, 0)
+    return {
+        "scenario": scenario["name"],
+        "concurrency": scenario["concurrency"],
+        "requests": len(paths),
+        "duration_s": elapsed,
+        "throughput_rps": len(paths) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "max": latencies.max(initial=0),
+        },
+        "error_rate": float(failed.mean()) if len(paths) else 0.0,
+        "status_codes": {str(code): int(count) for code, count in zip(codes, counts)},
+    }
+
+
+def run_load_test(
+    app_factory,
+    scenarios=None,
+    n_users=2000,
+    n_events=20000,
+    days=3,
+    precompute=None,
+    seed=0,
+):
+    """
+    Levanta la API en un servidor local sobre un dataset sintético y ejecuta
+    los escenarios de carga, sin depender de GCS.
+
+    Args:
+        app_factory (callable): Función que recibe un ResultStore y crea la
+        aplicación Flask (por ejemplo create_ab_test_api).
+        scenarios (list, opcional): Escenarios a ejecutar. Por defecto DEFAULT_SCENARIOS.
+        n_users (int, opcional): Usuarios del dataset sintético.
+        n_events (int, opcional): Eventos del dataset sintético.
+        days (int, opcional): Días del dataset sintético.
+        precompute (callable, opcional): Función que devuelve las respuestas
+        precalculadas por llave; si se indica se publican antes de la prueba.
+        seed (int, opcional): Semilla del dataset y de las solicitudes.
+
+    Returns:
+        list: Métricas de cada escenario.
+    """
+    scenarios = scenarios or DEFAULT_SCENARIOS
+    data = generate_events(n_users=n_users, n_events=n_events, days=days, seed=seed)
+    day_list = [
+        datetime.strptime(day, "%Y-%m-%d")
+        for day in sorted(data["timestamp"].str.slice(0, 10).unique())
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        data.to_csv(os.path.join(directory, "experiments_dataset.csv"), index=False)
+        use_local_dataset(directory)
+        store = ResultStore(os.path.join(directory, "results"))
+        if precompute is not None:
+            store.publish("load-test", precompute())
+
+        server = make_server("127.0.0.1", 0, app_factory(store), threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            report = []
+            for position, scenario in enumerate(scenarios):
+                paths = build_request_paths(
+                    scenario, list(DEFAULT_EXPERIMENTS), day_list, seed + position
+                )
+                report.append(run_scenario(base_url, scenario, paths))
+            return report
+        finally:
+            server.shutdown()
+            thread.join()
@@ -0,0 +1,241 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+
+
+class ResultStore:
+    """
+    Almacén local de respuestas ya serializadas en JSON, para que el endpoint
+    resuelva las solicitudes precalculadas con una búsqueda por llave.
+
+    Cada generación del dataset se guarda en su propia carpeta y el archivo
+    CURRENT apunta a la generación vigente, por lo que una nueva publicación
+    reemplaza todos los resultados de forma atómica y puede hacerse desde otro
+    proceso (por ejemplo `python main.py precompute`). La generación vigente se
+    guarda en memoria: una publicación del mismo proceso la actualiza de
+    inmediato y la de otro proceso se detecta al releer CURRENT, como máximo
+    cada generation_ttl_seconds.
+
+    Args:
+        directory (str): Carpeta del almacén.
+        generation_ttl_seconds (float, opcional): Segundos entre lecturas de CURRENT.
+
+    Methods:
+        current_generation() -> str:
+            Obtiene la generación publicada.
+            Returns:
+                str: Generación vigente, o None si no se ha publicado ninguna.
+
+        get(key: str) -> bytes:
+            Obtiene la respuesta guardada para una llave.
+            Returns:
+                bytes: JSON de la respuesta, o None si no existe.
+
+        publish(generation: str, payloads: dict):
+            Publica las respuestas de una generación y elimina las anteriores.
+    """
+
+    def __init__(self, directory, generation_ttl_seconds=5):
+        """
+        Inicializa el almacén.
+
+        Args:
+            directory (str): Carpeta del almacén.
+            generation_ttl_seconds (float, opcional): Segundos entre lecturas de CURRENT.
+        """
+        self.directory = directory
+        self.generation_ttl_seconds = generation_ttl_seconds
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._cache_generation = None
+        self._current = None
+        self._current_checked_at = None
+
+    @staticmethod
+    def file_name(key):
+        return hashlib.sha1(key.encode()).hexdigest() + ".json"
+
+    def current_generation(self):
+        """
+        Obtiene la generación publicada.
+
+        Returns:
+            str: Generación vigente, o None si no se ha publicado ninguna.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._current_checked_at is not None
+                and now - self._current_checked_at < self.generation_ttl_seconds
+            ):
+                return self._current
+
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as file:
+                generation = file.read().strip() or None
+        except FileNotFoundError:
+            generation = None
+
+        with self._lock:
+            self._current = generation
+            self._current_checked_at = now
+        return generation
+
+    def get(self, key):
+        """
+        Obtiene la respuesta guardada para una llave de la generación vigente.
+
+        Args:
+            key (str): Llave normalizada de la solicitud.
+
+        Returns:
+            bytes: JSON de la respuesta, o None si no existe.
+        """
+        generation = self.current_generation()
+        if generation is None:
+            return None
+
+        with self._lock:
+            if generation != self._cache_generation:
+                self._cache = {}
+                self._cache_generation = generation
+            if key in self._cache:
+                return self._cache[key]
+
+        try:
+            path = os.path.join(self.directory, generation, self.file_name(key))
+            with open(path, "rb") as file:
+                payload = file.read()
+        except FileNotFoundError:
+            payload = None
+
+        with self._lock:
+            if generation == self._cache_generation:
+                self._cache[key] = payload
+        return payload
+
+    def publish(self, generation, payloads):
+        """
+        Escribe las respuestas de una generación, la marca como vigente y
+        elimina las generaciones anteriores.
+
+        Args:
+            generation (str): Generación del dataset.
+            payloads (dict): Respuestas en bytes JSON por llave.
+        """
+        generation_dir = os.path.join(self.directory, generation)
+        os.makedirs(generation_dir, exist_ok=True)
+        for key, payload in payloads.items():
+            with open(os.path.join(generation_dir, self.file_name(key)), "wb") as file:
+                file.write(payload)
+
+        current_path = os.path.join(self.directory, "CURRENT")
+        with open(current_path + ".tmp", "w") as file:
+            file.write(generation)
+        os.replace(current_path + ".tmp", current_path)
+        with self._lock:
+            self._current = generation
+            self._current_checked_at = time.monotonic()
+
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name != generation and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+class ResultRefresher:
+    """
+    Detecta nuevas generaciones del dataset y precalcula los resultados de los
+    experimentos activos, publicándolos en un ResultStore.
+
+    Args:
+        store (ResultStore): Almacén donde se publican los resultados.
+        compute_payloads (callable): Función sin argumentos que devuelve un
+        diccionario llave -> respuesta JSON en bytes.
+        get_generation (callable): Función sin argumentos que devuelve la
+        generación actual del dataset.
+        interval_seconds (float, opcional): Segundos entre revisiones.
+
+    Methods:
+        refresh(force=False) -> bool:
+            Precalcula y publica si hay una nueva generación.
+            Returns:
+                bool: True si se publicaron resultados.
+
+        start():
+            Inicia la revisión periódica en un hilo en segundo plano.
+
+        stop():
+            Detiene la revisión periódica.
+    """
+
+    def __init__(self, store, compute_payloads, get_generation, interval_seconds=300):
+        """
+        Inicializa el refrescador.
+
+        Args:
+            store (ResultStore): Almacén donde se publican los resultados.
+            compute_payloads (callable): Función que calcula las respuestas.
+            get_generation (callable): Función que obtiene la generación del dataset.
+            interval_seconds (float, opcional): Segundos entre revisiones.
+        """
+        self.store = store
+        self.compute_payloads = compute_payloads
+        self.get_generation = get_generation
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self._logger = logging.getLogger(__name__)
+
+    def refresh(self, force=False):
+        """
+        Precalcula y publica los resultados si la generación del dataset es
+        distinta de la publicada.
+
+        Args:
+            force (bool, opcional): Si es True, recalcula aunque no haya cambios.
+
+        Returns:
+            bool: True si se publicaron resultados.
+        """
+        generation = self.get_generation()
+        if not force and generation == self.store.current_generation():
+            return False
+        payloads = self.compute_payloads()
+        self.store.publish(generation, payloads)
+        self._logger.info(
+            "Published %d precomputed results for generation %s",
+            len(payloads),
+            generation,
+        )
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                self._logger.exception("Result refresh failed:")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        """
+        Inicia la revisión periódica en un hilo en segundo plano.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="result-refresher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """
+        Detiene la revisión periódica.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
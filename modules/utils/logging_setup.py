@@ -0,0 +1,111 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from modules.utils.utils import json_default
+
+
+current_request_id = contextvars.ContextVar("current_request_id", default=None)
+
+# Atributos estándar de LogRecord; el resto son campos pasados con extra.
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formatea cada registro como un objeto JSON en una línea, con la hora, el
+    nivel, el logger, el mensaje, el id de la solicitud y los campos pasados
+    con extra (por ejemplo las etapas de una solicitud).
+    """
+
+    def format(self, record):
+        payload = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and value is not None:
+                payload[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, default=json_default)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Handler que solo encola el registro, de modo que el hilo de la solicitud no
+    escribe en stderr. Si la cola está llena el registro se descarta y se
+    cuenta, en lugar de bloquear la solicitud.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        """
+        Copia el registro con el mensaje ya resuelto, la excepción como texto y
+        el id de la solicitud del contexto actual, que no existe en el hilo que
+        escribe los registros.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if getattr(record, "request_id", None) is None:
+            record.request_id = current_request_id.get()
+        return record
+
+
+def configure_logging(level=None, queue_size=None):
+    """
+    Configura el logger raíz con un handler de cola y un hilo en segundo plano
+    que escribe los registros en JSON en stderr. Es idempotente: si ya está
+    configurado devuelve el handler existente, por lo que crear la aplicación
+    varias veces (tests, workers) no duplica la salida.
+
+    Args:
+        level (str, opcional): Nivel del logger raíz. Por defecto LOG_LEVEL o INFO.
+        queue_size (int, opcional): Registros máximos en cola antes de
+        descartar. Por defecto LOG_QUEUE_SIZE o 10000.
+
+    Returns:
+        DroppingQueueHandler: Handler de cola instalado en el logger raíz.
+    """
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            return handler
+
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO").upper())
+    log_queue = queue.Queue(int(queue_size or os.getenv("LOG_QUEUE_SIZE", 10000)))
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JSONFormatter())
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    handler = DroppingQueueHandler(log_queue)
+    handler.listener = listener
+    root.addHandler(handler)
+    return handler
@@ -0,0 +1,335 @@
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from statsmodels.stats.proportion import proportions_ztest
+
+from modules.ab_testing.ab_test_analyzer import ABTestAnalyzer
+from modules.ab_testing.ab_test_manager import ABTestManager
+from modules.ab_testing.segmented_analyzer import SegmentedABTestAnalyzer
+from modules.ab_testing.variant_aggregates import VariantAggregates
+from modules.data_processing.aggregate_store import LABEL_KEYS, DayAggregateStore
+from modules.data_processing.data_processor import (
+    ExperimentProcessor,
+    resolve_time_windows,
+)
+from modules.data_processing.duckdb_data_processor import (
+    DuckDBExperimentProcessor,
+    import_duckdb,
+)
+from modules.data_processing.history_features import HISTORY_SEGMENTS
+from modules.utils.statistical_functions import proportions_ztest_vectorized
+from modules.utils.synthetic_data import generate_edge_case_events
+from modules.utils.utils import dumps_json
+
+
+LABEL_COLUMNS = ["purchases", "attempts", "with_purchase"]
+
+
+def reference_labels(data, date, time_windows):
+    """
+    Etiquetado de referencia: ExperimentProcessor.label_experiments.
+    """
+    return ExperimentProcessor(data, time_windows).label_experiments(date)
+
+
+def chunked_labels(data, date, time_windows):
+    """
+    Etiquetado por grupos de usuarios (label_experiments_in_chunks).
+    """
+    return ExperimentProcessor(data, time_windows).label_experiments_in_chunks(3, date)
+
+
+def windows_labels(data, date, time_windows):
+    """
+    Etiquetado por umbral sobre el tiempo hasta la compra
+    (label_experiments_for_windows).
+    """
+    return ExperimentProcessor(data).label_experiments_for_windows(
+        [time_windows], date
+    )[0]
+
+
+def segmented_labels(data, date, time_windows):
+    """
+    Etiquetado por hora (segment_by) agregado de nuevo por usuario. Las compras
+    de un mismo item atribuidas en horas distintas se cuentan una vez por hora,
+    por lo que solo se comparan los intentos y with_purchase.
+    """
+    processor = ExperimentProcessor(data, time_windows)
+    segmented = processor.aggregate_by_user(
+        processor.attribute_purchases(), date, ["hour"]
+    )
+    return (
+        segmented.groupby(LABEL_KEYS)
+        .agg(attempts=("attempts", "sum"), with_purchase=("with_purchase", "any"))
+        .reset_index()
+    )
+
+
+def history_labels(data, date, time_windows):
+    """
+    Etiquetado segmentado por todas las características de historial del
+    usuario, agregado de nuevo por usuario. Como en segmented_labels, solo se
+    comparan los intentos y with_purchase.
+    """
+    segmented = ExperimentProcessor(data, time_windows).label_experiments(
+        date, list(HISTORY_SEGMENTS)
+    )
+    return (
+        segmented.groupby(LABEL_KEYS)
+        .agg(attempts=("attempts", "sum"), with_purchase=("with_purchase", "any"))
+        .reset_index()
+    )
+
+
+def aggregate_store_labels(data, date, time_windows):
+    """
+    Etiquetado de referencia guardado y leído del almacén de agregados diarios.
+    """
+    labeled = reference_labels(data, date, time_windows)
+    windows = resolve_time_windows(time_windows)
+    day = date or datetime(2000, 1, 1)
+    with tempfile.TemporaryDirectory() as directory:
+        store = DayAggregateStore(directory, "parity")
+        store.write(day, windows, labeled)
+        return store.read(day, windows)
+
+
+def duckdb_labels(data, date, time_windows):
+    """
+    Etiquetado con el motor fuera de memoria (DuckDB) sobre un CSV temporal.
+    """
+    import_duckdb()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "events.csv")
+        data.to_csv(path, index=False)
+        return DuckDBExperimentProcessor([path], time_windows).label_experiments(date)
+
+
+ENGINES = {
+    "chunked": (chunked_labels, LABEL_COLUMNS),
+    "windows": (windows_labels, LABEL_COLUMNS),
+    "segmented": (segmented_labels, ["attempts", "with_purchase"]),
+    "history": (history_labels, ["attempts", "with_purchase"]),
+    "aggregate_store": (aggregate_store_labels, LABEL_COLUMNS),
+    "duckdb": (duckdb_labels, LABEL_COLUMNS),
+}
+
+
+def compare_frames(reference, candidate, columns, keys=LABEL_KEYS, rtol=1e-9):
+    """
+    Compara dos DataFrames etiquetados por sus llaves.
+
+    Args:
+        reference (pd.DataFrame): Resultado de referencia.
+        candidate (pd.DataFrame): Resultado a validar.
+        columns (list): Columnas que deben coincidir.
+        keys (list, opcional): Columnas que identifican cada fila.
+        rtol (float, opcional): Tolerancia relativa de las columnas numéricas.
+
+    Returns:
+        dict: Filas de cada lado, filas faltantes, sobrantes y distintas, y
+        hasta cinco ejemplos de diferencias.
+    """
+    reference = reference[keys + columns].astype({key: str for key in keys})
+    candidate = candidate[keys + columns].astype({key: str for key in keys})
+    merged = reference.merge(
+        candidate, on=keys, how="outer", suffixes=("", "_candidate"), indicator=True
+    )
+    both = merged[merged["_merge"] == "both"]
+
+    different = np.zeros(len(both), dtype=bool)
+    for column in columns:
+        expected = both[column].to_numpy(dtype=float)
+        actual = both[column + "_candidate"].to_numpy(dtype=float)
+        different |= ~np.isclose(expected, actual, rtol=rtol, atol=0)
+
+    missing = merged[merged["_merge"] == "left_only"]
+    extra = merged[merged["_merge"] == "right_only"]
+    examples = pd.concat([both[different], missing, extra]).head(5)
+    return {
+        "reference_rows": len(reference),
+        "candidate_rows": len(candidate),
+        "missing_rows": len(missing),
+        "extra_rows": len(extra),
+        "different_rows": int(different.sum()),
+        "examples": examples.drop(columns="_merge").to_dict(orient="records"),
+        "passed": not (len(missing) or len(extra) or different.any()),
+    }
+
+
+def compare_statistics(labeled, rtol=1e-7):
+    """
+    Compara las pruebas de ABTestAnalyzer (una por experimento y tipo de
+    evento) con las pruebas vectorizadas de SegmentedABTestAnalyzer, y el z-test
+    vectorizado con proportions_ztest de statsmodels.
+
+    Args:
+        labeled (pd.DataFrame): Datos etiquetados de referencia.
+        rtol (float, opcional): Tolerancia relativa de estadísticos y p-valores.
+
+    Returns:
+        dict: Pruebas comparadas, pruebas distintas y hasta cinco ejemplos.
+    """
+    differences = []
+    compared = 0
+    for experiment_name, experiment_data in labeled.groupby("experiment_name"):
+        segments = SegmentedABTestAnalyzer(experiment_data, ["event_name"]).run_tests()
+        for segment in segments.itertuples(index=False):
+            if segment.num_of_variants < 2:
+                continue
+            subset = experiment_data[experiment_data["event_name"] == segment.event_name]
+            tests = ABTestAnalyzer(subset).determine_winner()["tests"]
+            if "z-test" in tests:
+                expected = (tests["z-test"]["z_statistic"], tests["z-test"]["p_value"])
+            else:
+                expected = (tests["chi_square"]["chi2"], tests["chi_square"]["p_value"])
+            actual = (segment.statistic, segment.p_value)
+            compared += 1
+            if not np.allclose(expected, actual, rtol=rtol, atol=1e-12, equal_nan=True):
+                differences.append(
+                    {
+                        "experiment_name": experiment_name,
+                        "event_name": segment.event_name,
+                        "expected": expected,
+                        "actual": actual,
+                    }
+                )
+
+    rng = np.random.default_rng(len(labeled))
+    nobs = rng.integers(1, 500, size=(50, 2))
+    counts = rng.integers(0, nobs + 1)
+    stat, pval, _, _ = proportions_ztest_vectorized(
+        counts[:, 0], nobs[:, 0], counts[:, 1], nobs[:, 1]
+    )
+    for i in range(len(nobs)):
+        if counts[i].sum() in (0, nobs[i].sum()):
+            continue
+        expected = proportions_ztest(counts[i], nobs[i], alternative="larger")
+        compared += 1
+        if not np.allclose(expected, (stat[i], pval[i]), rtol=rtol, atol=1e-12):
+            differences.append(
+                {
+                    "test": "proportions_ztest_vectorized",
+                    "counts": counts[i].tolist(),
+                    "nobs": nobs[i].tolist(),
+                    "expected": expected,
+                    "actual": (stat[i], pval[i]),
+                }
+            )
+
+    return {
+        "compared_tests": compared,
+        "different_tests": len(differences),
+        "examples": differences[:5],
+        "passed": not differences,
+    }
+
+
+def compare_variant_aggregates(labeled):
+    """
+    Compara el análisis de VariantAggregates, sin excluir variantes y
+    excluyendo cada variante, con ABTestManager sobre las filas restantes.
+
+    Args:
+        labeled (pd.DataFrame): Datos etiquetados de referencia.
+
+    Returns:
+        dict: Análisis comparados, análisis distintos y hasta cinco ejemplos.
+    """
+    differences = []
+    compared = 0
+    for experiment_name, experiment_data in labeled.groupby("experiment_name"):
+        aggregates = VariantAggregates.from_data(experiment_data)
+        for excluded in [[]] + [[variant] for variant in aggregates.variants[1:]]:
+            data = experiment_data[~experiment_data["variant_id"].isin(excluded)]
+            checks, results = ABTestManager(data).run_analysis()
+            reduced = aggregates.exclude(excluded)
+            actual_checks, actual_results = reduced.run_analysis()
+            expected = dumps_json([checks, results], sort_keys=True)
+            actual = dumps_json([actual_checks, actual_results], sort_keys=True)
+            compared += 1
+            if expected != actual:
+                differences.append(
+                    {
+                        "experiment_name": experiment_name,
+                        "excluded_variants": excluded,
+                        "expected": expected,
+                        "actual": actual,
+                    }
+                )
+    return {
+        "compared_analyses": compared,
+        "different_analyses": len(differences),
+        "examples": differences[:5],
+        "passed": not differences,
+    }
+
+
+def run_parity(runs=5, n_users=150, n_events=2000, engines=None, seed=0):
+    """
+    Compara el etiquetado de referencia con las implementaciones rápidas, las
+    pruebas estadísticas con sus versiones vectorizadas y el análisis completo
+    con el calculado desde los agregados por variante, sobre eventos
+    sintéticos aleatorios con casos límite. Cada corrida usa otra semilla y,
+    desde la segunda, ventanas de atribución aleatorias; cada una se compara
+    con y sin filtro de fecha.
+
+    Args:
+        runs (int, opcional): Número de datasets sintéticos.
+        n_users (int, opcional): Usuarios de cada dataset.
+        n_events (int, opcional): Eventos base de cada dataset.
+        engines (list, opcional): Implementaciones a comparar. Por defecto todas
+        las de ENGINES; duckdb se omite si no está instalado.
+        seed (int, opcional): Semilla de la primera corrida.
+
+    Returns:
+        dict: Resultado de cada comparación, número de fallas y passed.
+    """
+    engines = engines or list(ENGINES)
+    checks = []
+    for run in range(runs):
+        run_seed = seed + run
+        rng = np.random.default_rng(run_seed)
+        time_windows = None
+        if run:
+            time_windows = {
+                "SEARCH": int(rng.integers(30, 300)),
+                "default": int(rng.integers(15, 120)),
+            }
+        data = generate_edge_case_events(
+            n_users=n_users, n_events=n_events, time_windows=time_windows, seed=run_seed
+        )
+
+        for date in (None, datetime(2021, 8, 1)):
+            reference = reference_labels(data, date, time_windows)
+            for name in engines:
+                function, columns = ENGINES[name]
+                check = {
+                    "run": run,
+                    "seed": run_seed,
+                    "engine": name,
+                    "date": date and f"{date:%Y-%m-%d}",
+                    "time_windows": resolve_time_windows(time_windows),
+                }
+                try:
+                    candidate = function(data, date, time_windows)
+                except ImportError as error:
+                    check.update(skipped=str(error), passed=True)
+                else:
+                    check.update(compare_frames(reference, candidate, columns))
+                checks.append(check)
+
+            if date is None:
+                check = {"run": run, "seed": run_seed, "engine": "statistics"}
+                check.update(compare_statistics(reference))
+                checks.append(check)
+                check = {"run": run, "seed": run_seed, "engine": "variant_aggregates"}
+                check.update(compare_variant_aggregates(reference))
+                checks.append(check)
+
+    failures = sum(not check["passed"] for check in checks)
+    return {"checks": checks, "failures": failures, "passed": failures == 0}
@@ -0,0 +1,368 @@
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+
+_current_recorder = contextvars.ContextVar("current_recorder", default=None)
+_memory_frames = contextvars.ContextVar("memory_frames", default=())
+logger = logging.getLogger(__name__)
+
+
+class StageRecorder:
+    """
+    Registra la duración y el número de filas de cada etapa del procesamiento
+    de una solicitud. Las etapas se anidan según el orden en que se abren y, si
+    tracemalloc está activo, incluyen el pico de memoria de cada etapa.
+
+    Methods:
+        report() -> list:
+            Devuelve las etapas registradas.
+            Returns:
+                list: Etapas con name, depth, duration_ms y, si se indicó, rows.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.depth = 0
+
+    def report(self):
+        """
+        Devuelve las etapas registradas en orden de inicio.
+
+        Returns:
+            list: Etapas con name, depth, duration_ms y, si se indicó, rows.
+        """
+        return list(self.stages)
+
+
+class MemoryFrame:
+    """
+    Pico de memoria acumulado de una etapa abierta. tracemalloc tiene un único
+    pico global que cada etapa reinicia, por lo que el pico de las etapas
+    internas se traslada a la etapa que las contiene.
+    """
+
+    def __init__(self, start_bytes):
+        self.start_bytes = start_bytes
+        self.carried_peak = 0
+
+
+@contextmanager
+def track_memory(record):
+    """
+    Registra en record el pico de memoria de tracemalloc durante el bloque.
+
+    Args:
+        record (dict): Registro de la etapa donde se agregan peak_mb y
+        peak_increase_mb.
+    """
+    frames = _memory_frames.get()
+    current, peak_before = tracemalloc.get_traced_memory()
+    if frames:
+        frames[-1].carried_peak = max(frames[-1].carried_peak, peak_before)
+    tracemalloc.reset_peak()
+    frame = MemoryFrame(current)
+    token = _memory_frames.set(frames + (frame,))
+    try:
+        yield
+    finally:
+        _memory_frames.reset(token)
+        peak = max(tracemalloc.get_traced_memory()[1], frame.carried_peak)
+        if frames:
+            frames[-1].carried_peak = max(frames[-1].carried_peak, peak)
+        record["peak_mb"] = peak / 2**20
+        record["peak_increase_mb"] = (peak - frame.start_bytes) / 2**20
+
+
+@contextmanager
+def stage(name):
+    """
+    Mide una etapa del procesamiento si hay un perfilado activo en el contexto
+    actual. Si además tracemalloc está activo se registra el pico de memoria de
+    la etapa, y sin perfilado activo ese pico solo se escribe en el log. En otro
+    caso no registra nada.
+
+    Args:
+        name (str): Nombre de la etapa.
+
+    Yields:
+        dict: Registro de la etapa, donde se puede indicar rows con el número de
+        filas resultantes.
+    """
+    recorder = _current_recorder.get()
+    record = {"name": name}
+    tracing = tracemalloc.is_tracing()
+    if recorder is None and not tracing:
+        yield record
+        return
+
+    if recorder is not None:
+        record["depth"] = recorder.depth
+        recorder.stages.append(record)
+        recorder.depth += 1
+    start = time.perf_counter()
+    try:
+        if tracing:
+            with track_memory(record):
+                yield record
+        else:
+            yield record
+    finally:
+        record["duration_ms"] = (time.perf_counter() - start) * 1000
+        if recorder is not None:
+            recorder.depth -= 1
+        elif tracing:
+            logger.info(
+                "Stage %s: %.1f ms, peak %.1f MB (+%.1f MB), rows %s",
+                name,
+                record["duration_ms"],
+                record["peak_mb"],
+                record["peak_increase_mb"],
+                record.get("rows"),
+            )
+
+
+@contextmanager
+def record_stages():
+    """
+    Registra las etapas que se ejecuten dentro del bloque en el contexto actual.
+
+    Yields:
+        StageRecorder: Registro de las etapas.
+    """
+    recorder = StageRecorder()
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+def frame_label(frame):
+    """
+    Construye la etiqueta de un frame para el árbol de llamadas y las pilas plegadas.
+
+    Args:
+        frame (frame): Frame de Python.
+
+    Returns:
+        str: Función, archivo y línea de definición.
+    """
+    code = frame.f_code
+    file_name = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({file_name}:{code.co_firstlineno})".replace(";", ",")
+
+
+class SamplingProfiler:
+    """
+    Perfilador por muestreo: un hilo en segundo plano lee periódicamente la pila
+    del hilo perfilado con sys._current_frames, sin instrumentar cada llamada.
+
+    Args:
+        thread_id (int): Id del hilo a perfilar.
+        interval (float, opcional): Segundos entre muestras.
+        root_function (str, opcional): Si se indica, las pilas empiezan en la
+        primera llamada a esta función y se descartan las muestras fuera de ella.
+
+    Methods:
+        start():
+            Inicia el muestreo.
+        stop():
+            Detiene el muestreo.
+        folded_stacks() -> str:
+            Pilas en formato plegado (compatible con flamegraph.pl, speedscope, inferno).
+        call_tree(min_share=0.01) -> dict:
+            Árbol de llamadas con el número de muestras por nodo.
+    """
+
+    def __init__(self, thread_id, interval=0.005, root_function=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_function = root_function
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(frame)
+            frame = frame.f_back
+        stack.reverse()
+
+        if self.root_function is not None:
+            names = [frame.f_code.co_name for frame in stack]
+            if self.root_function not in names:
+                return
+            stack = stack[names.index(self.root_function) :]
+
+        key = tuple(frame_label(frame) for frame in stack)
+        if key:
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        """
+        Inicia el muestreo en un hilo en segundo plano.
+        """
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Detiene el muestreo.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded_stacks(self):
+        """
+        Devuelve las pilas muestreadas en formato plegado: una línea por pila con
+        los frames separados por ';' y el número de muestras.
+
+        Returns:
+            str: Pilas plegadas.
+        """
+        return "".join(
+            f"{';'.join(stack)} {count}\n"
+            for stack, count in sorted(self.stacks.items())
+        )
+
+    def call_tree(self, min_share=0.01):
+        """
+        Construye el árbol de llamadas con las muestras de cada nodo, omitiendo
+        los nodos con menos de min_share del total de muestras.
+
+        Args:
+            min_share (float, opcional): Fracción mínima de muestras por nodo.
+
+        Returns:
+            dict: Nodo raíz con name, samples, share y children.
+        """
+        root = {"name": "root", "samples": 0, "children": {}}
+        for stack, count in self.stacks.items():
+            node = root
+            node["samples"] += count
+            for label in stack:
+                node = node["children"].setdefault(
+                    label, {"name": label, "samples": 0, "children": {}}
+                )
+                node["samples"] += count
+
+        min_samples = max(self.samples * min_share, 1)
+
+        def prune(node):
+            children = [
+                prune(child)
+                for child in node["children"].values()
+                if child["samples"] >= min_samples
+            ]
+            return {
+                "name": node["name"],
+                "samples": node["samples"],
+                "share": node["samples"] / self.samples if self.samples else 0.0,
+                "children": sorted(children, key=lambda child: -child["samples"]),
+            }
+
+        return prune(root)
+
+
+class RequestProfile:
+    """
+    Perfil de una solicitud: etapas con filas y tiempos, y el muestreo de la pila.
+
+    Args:
+        recorder (StageRecorder): Registro de etapas.
+        profiler (SamplingProfiler): Perfilador por muestreo.
+        output_dir (str, opcional): Carpeta donde se guardan las pilas plegadas.
+    """
+
+    def __init__(self, recorder, profiler, output_dir=None):
+        self.recorder = recorder
+        self.profiler = profiler
+        self.output_dir = output_dir
+        self.id = uuid.uuid4().hex
+        self.duration_ms = None
+        self.folded_file = None
+
+    def save(self):
+        """
+        Guarda las pilas plegadas en output_dir, si se indicó.
+        """
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self.folded_file = os.path.join(self.output_dir, f"{self.id}.folded")
+            with open(self.folded_file, "w") as file:
+                file.write(self.profiler.folded_stacks())
+
+    def report(self):
+        """
+        Resume el perfil de la solicitud.
+
+        Returns:
+            dict: Duración, etapas, árbol de llamadas, muestras y archivo de pilas plegadas.
+        """
+        return {
+            "profile_id": self.id,
+            "duration_ms": self.duration_ms,
+            "interval_ms": self.profiler.interval * 1000,
+            "samples": self.profiler.samples,
+            "stages": self.recorder.report(),
+            "call_tree": self.profiler.call_tree(),
+            "folded_stacks_file": self.folded_file,
+        }
+
+
+@contextmanager
+def profile_request(
+    root_function=None, interval=0.005, output_dir=None, trace_memory=False
+):
+    """
+    Perfila el bloque de código: activa el registro de etapas en el contexto
+    actual y muestrea la pila del hilo actual.
+
+    Args:
+        root_function (str, opcional): Función desde la que se muestran las pilas.
+        interval (float, opcional): Segundos entre muestras.
+        output_dir (str, opcional): Carpeta donde se guardan las pilas plegadas.
+        trace_memory (bool, opcional): Si es True, activa tracemalloc durante el
+        bloque para registrar el pico de memoria de cada etapa. tracemalloc es
+        global al proceso, por lo que incluye la memoria de otras solicitudes
+        concurrentes y hace más lento el procesamiento.
+
+    Yields:
+        RequestProfile: Perfil, disponible completo al salir del bloque.
+    """
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    recorder = StageRecorder()
+    profiler = SamplingProfiler(threading.get_ident(), interval, root_function)
+    profile = RequestProfile(recorder, profiler, output_dir)
+    token = _current_recorder.set(recorder)
+    start = time.perf_counter()
+    profiler.start()
+    try:
+        yield profile
+    finally:
+        profiler.stop()
+        profile.duration_ms = (time.perf_counter() - start) * 1000
+        _current_recorder.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+        profile.save()
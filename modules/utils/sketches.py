@@ -0,0 +1,350 @@
+import numpy as np
+import pandas as pd
+
+
+HLL_PRECISION = 12
+
+
+def hash_values(values):
+    """
+    Calcula un hash estable de 64 bits para cada valor, igual entre procesos y
+    ejecuciones (a diferencia de hash() de Python).
+
+    Args:
+        values (array-like): Valores a hashear (por ejemplo user_id).
+
+    Returns:
+        np.ndarray: Hashes uint64.
+    """
+    return pd.util.hash_array(np.asarray(values))
+
+
+def hll_registers(hashes, group_codes=None, n_groups=1, precision=HLL_PRECISION):
+    """
+    Construye los registros HyperLogLog de varios grupos en una sola pasada:
+    los primeros bits del hash eligen el registro y el registro guarda la
+    posición máxima del primer bit en 1 del resto del hash.
+
+    Args:
+        hashes (np.ndarray): Hashes uint64 de los valores.
+        group_codes (np.ndarray, opcional): Grupo de cada valor (0..n_groups-1).
+        Por defecto todos en el grupo 0.
+        n_groups (int, opcional): Número de grupos.
+        precision (int, opcional): Bits usados para elegir el registro.
+
+    Returns:
+        np.ndarray: Registros uint8 de forma (n_groups, 2**precision).
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    registers = np.zeros((n_groups, 2**precision), dtype=np.uint8)
+    if len(hashes) == 0:
+        return registers
+    if group_codes is None:
+        group_codes = np.zeros(len(hashes), dtype=np.int64)
+
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    remainder = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # frexp devuelve la cantidad de bits del resto (exacta porque el resto tiene
+    # menos de 53 bits), de donde sale la posición del primer bit en 1.
+    bit_length = np.frexp(remainder.astype(np.float64))[1]
+    rank = (64 - precision - bit_length + 1).astype(np.uint8)
+    np.maximum.at(registers, (np.asarray(group_codes, dtype=np.int64), index), rank)
+    return registers
+
+
+class HyperLogLog:
+    """
+    Sketch HyperLogLog para contar valores distintos con memoria constante
+    (2**precision bytes). Dos sketches con la misma precisión se unen tomando el
+    máximo de cada registro, por lo que los sketches por día u hora se combinan
+    sin volver a leer los datos.
+
+    Args:
+        precision (int, opcional): Bits usados para elegir el registro.
+        registers (np.ndarray, opcional): Registros ya construidos.
+
+    Methods:
+        add(values):
+            Agrega valores al sketch.
+
+        merge(other) -> HyperLogLog:
+            Devuelve la unión de dos sketches.
+
+        count() -> float:
+            Estima el número de valores distintos.
+
+        relative_error() -> float:
+            Error estándar relativo de la estimación.
+
+        estimate(z=1.96) -> dict:
+            Estimación con su intervalo.
+    """
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        if registers is None:
+            registers = np.zeros(2**precision, dtype=np.uint8)
+        self.registers = registers
+
+    @property
+    def m(self):
+        return 2**self.precision
+
+    def add(self, values):
+        """
+        Agrega valores al sketch.
+
+        Args:
+            values (array-like): Valores a contar.
+        """
+        registers = hll_registers(hash_values(values), precision=self.precision)[0]
+        np.maximum(self.registers, registers, out=self.registers)
+
+    def merge(self, other):
+        """
+        Devuelve la unión de dos sketches.
+
+        Args:
+            other (HyperLogLog): Sketch con la misma precisión.
+
+        Returns:
+            HyperLogLog: Sketch de la unión.
+
+        Raises:
+            ValueError: Si las precisiones no coinciden.
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def count(self):
+        """
+        Estima el número de valores distintos, con la corrección de conteo lineal
+        para cardinalidades bajas.
+
+        Returns:
+            float: Número estimado de valores distintos.
+        """
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * np.log(m / zeros)
+        return float(raw)
+
+    def relative_error(self):
+        """
+        Error estándar relativo de la estimación.
+
+        Returns:
+            float: 1.04 / sqrt(m).
+        """
+        return 1.04 / np.sqrt(self.m)
+
+    def estimate(self, z=1.96):
+        """
+        Estima el número de valores distintos con su intervalo.
+
+        Args:
+            z (float, opcional): Cuantil normal del intervalo (1.96 para 95%).
+
+        Returns:
+            dict: estimate, lower, upper y relative_error.
+        """
+        count = self.count()
+        error = self.relative_error()
+        return {
+            "estimate": count,
+            "lower": max(count * (1 - z * error), 0.0),
+            "upper": count * (1 + z * error),
+            "relative_error": error,
+        }
+
+
+QUANTILE_RELATIVE_ACCURACY = 0.01
+
+
+def quantile_sketch_bins(values, relative_accuracy=QUANTILE_RELATIVE_ACCURACY):
+    """
+    Calcula el bucket logarítmico de cada valor positivo: el bucket i cubre
+    (gamma**(i-1), gamma**i], con gamma = (1 + a) / (1 - a), de modo que
+    cualquier valor del bucket está a una distancia relativa menor que a de
+    su representante.
+
+    Args:
+        values (np.ndarray): Valores positivos.
+        relative_accuracy (float, opcional): Error relativo máximo (a).
+
+    Returns:
+        np.ndarray: Índices int64 de los buckets.
+    """
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    values = np.asarray(values, dtype=np.float64)
+    return np.ceil(np.log(values) / np.log(gamma)).astype(np.int64)
+
+
+class QuantileSketch:
+    """
+    Sketch de cuantiles con error relativo acotado (al estilo DDSketch): cada
+    valor positivo se cuenta en un bucket logarítmico y los ceros por separado.
+    Dos sketches con la misma precisión se unen sumando los conteos de cada
+    bucket, por lo que los sketches por hora se combinan en cualquier rango sin
+    volver a leer los datos, y el resultado no depende del orden de la unión.
+
+    Args:
+        relative_accuracy (float, opcional): Error relativo máximo de los cuantiles.
+        bins (dict, opcional): Conteo por índice de bucket.
+        zero_count (int, opcional): Número de valores iguales a cero.
+
+    Methods:
+        add(values):
+            Agrega valores (no negativos) al sketch.
+
+        merge(other) -> QuantileSketch:
+            Devuelve la unión de dos sketches.
+
+        count() -> int:
+            Número de valores del sketch.
+
+        quantile(q) -> float:
+            Estima el cuantil q.
+
+        rank(value) -> float:
+            Estima la proporción de valores menores o iguales a value.
+
+        to_dict() -> dict:
+            Representación serializable en JSON.
+
+        from_dict(payload) -> QuantileSketch:
+            Reconstruye un sketch desde to_dict.
+    """
+
+    def __init__(
+        self, relative_accuracy=QUANTILE_RELATIVE_ACCURACY, bins=None, zero_count=0
+    ):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.bins = dict(bins or {})
+        self.zero_count = int(zero_count)
+
+    def add(self, values):
+        """
+        Agrega valores al sketch. Los valores nulos se ignoran.
+
+        Args:
+            values (array-like): Valores no negativos.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        indexes, counts = np.unique(
+            quantile_sketch_bins(positive, self.relative_accuracy), return_counts=True
+        )
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.bins[index] = self.bins.get(index, 0) + count
+
+    def merge(self, other):
+        """
+        Devuelve la unión de dos sketches.
+
+        Args:
+            other (QuantileSketch): Sketch con la misma precisión.
+
+        Returns:
+            QuantileSketch: Sketch de la unión.
+
+        Raises:
+            ValueError: Si las precisiones no coinciden.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        bins = dict(self.bins)
+        for index, count in other.bins.items():
+            bins[index] = bins.get(index, 0) + count
+        return QuantileSketch(
+            self.relative_accuracy, bins, self.zero_count + other.zero_count
+        )
+
+    def count(self):
+        """
+        Número de valores del sketch.
+
+        Returns:
+            int: Valores agregados.
+        """
+        return self.zero_count + sum(self.bins.values())
+
+    def quantile(self, q):
+        """
+        Estima el cuantil q con el representante de su bucket, a una distancia
+        relativa menor que relative_accuracy del valor real.
+
+        Args:
+            q (float): Cuantil entre 0 y 1.
+
+        Returns:
+            float: Cuantil estimado, o NaN si el sketch está vacío.
+        """
+        total = self.count()
+        if total == 0:
+            return float("nan")
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        indexes = np.array(sorted(self.bins), dtype=np.int64)
+        counts = np.array([self.bins[index] for index in indexes], dtype=np.int64)
+        position = np.searchsorted(np.cumsum(counts) + self.zero_count, rank, side="right")
+        index = indexes[min(position, len(indexes) - 1)]
+        return float(2 * self.gamma**index / (self.gamma + 1))
+
+    def rank(self, value):
+        """
+        Estima la proporción de valores menores o iguales a value (exacta salvo
+        por el bucket que contiene a value, que se cuenta completo).
+
+        Args:
+            value (float): Valor límite.
+
+        Returns:
+            float: Proporción entre 0 y 1, o NaN si el sketch está vacío.
+        """
+        total = self.count()
+        if total == 0:
+            return float("nan")
+        below = self.zero_count
+        if value > 0:
+            limit = int(quantile_sketch_bins([value], self.relative_accuracy)[0])
+            below += sum(count for index, count in self.bins.items() if index <= limit)
+        return below / total
+
+    def to_dict(self):
+        """
+        Representación serializable en JSON del sketch.
+
+        Returns:
+            dict: relative_accuracy, zero_count y bins (índice como texto).
+        """
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "bins": {str(index): count for index, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        """
+        Reconstruye un sketch desde to_dict.
+
+        Args:
+            payload (dict): Resultado de to_dict.
+
+        Returns:
+            QuantileSketch: Sketch reconstruido.
+        """
+        return cls(
+            payload["relative_accuracy"],
+            {int(index): count for index, count in payload["bins"].items()},
+            payload["zero_count"],
+        )
@@ -1,3 +1,10 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy.stats import chi2, norm
+from statsmodels.stats.power import GofChisquarePower, NormalIndPower
+
+
 def normal_approximation(n, p):
     """
     Verifica si la aproximación normal es válida para una proporción muestral.
@@ -12,4 +19,121 @@ def normal_approximation(n, p):
     if n * p >= 5 and n * (1 - p) >= 5:
         return True
     else:
-        return False
\ No newline at end of file
+        return False
+
+@lru_cache(maxsize=64)
+def required_sample_size(two_variants, alpha=0.05, power=0.8, effect_size=0.2):
+    """
+    Calcula el tamaño de muestra requerido por variante con la prueba de
+    potencia de check_sample_size (NormalIndPower para dos variantes y
+    GofChisquarePower para más). Solo depende de sus parámetros, por lo que se
+    guarda en caché y la búsqueda de la raíz se hace una vez por combinación.
+
+    Parámetros:
+    two_variants (bool): Si el experimento tiene exactamente dos variantes.
+    alpha (float): Nivel de significancia.
+    power (float): Poder estadístico.
+    effect_size (float): Tamaño del efecto.
+
+    Retorna:
+    float: Observaciones requeridas por variante.
+    """
+    if two_variants:
+        return NormalIndPower().solve_power(
+            effect_size=effect_size, alpha=alpha, power=power, alternative="two-sided"
+        )
+    return GofChisquarePower().solve_power(
+        effect_size=effect_size, alpha=alpha, power=power
+    )
+
+
+def variant_totals(data):
+    """
+    Calcula las observaciones y compras de cada variante, que son todo lo que
+    necesitan las pruebas y los checks por variante.
+
+    Parámetros:
+    data (DataFrame): Datos etiquetados con las columnas variant_id y with_purchase.
+
+    Retorna:
+    DataFrame: Columnas rows y conversions por variant_id, en el orden en que
+    aparecen las variantes en los datos.
+    """
+    totals = data.groupby("variant_id", sort=False)["with_purchase"].agg(
+        rows="count", conversions="sum"
+    )
+    totals["conversions"] = totals["conversions"].astype(np.int64)
+    return totals
+
+
+def proportions_ztest_vectorized(count1, nobs1, count2, nobs2):
+    """
+    Calcula en forma vectorizada el z-test de dos proporciones con varianza
+    agrupada y alternativa "larger", equivalente a proportions_ztest de
+    statsmodels, junto con el intervalo de confianza del 95% de la diferencia.
+
+    Parámetros:
+    count1 (np.ndarray): Conversiones del primer grupo.
+    nobs1 (np.ndarray): Observaciones del primer grupo.
+    count2 (np.ndarray): Conversiones del segundo grupo.
+    nobs2 (np.ndarray): Observaciones del segundo grupo.
+
+    Retorna:
+    tuple: Arreglos con el estadístico z, el p-valor, y los límites inferior
+    y superior del intervalo de confianza (NaN cuando el error estándar es 0).
+    """
+    count1, nobs1, count2, nobs2 = (
+        np.asarray(x, dtype=float) for x in (count1, nobs1, count2, nobs2)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prop1 = count1 / nobs1
+        prop2 = count2 / nobs2
+        pooled = (count1 + count2) / (nobs1 + nobs2)
+        se_pooled = np.sqrt(pooled * (1 - pooled) * (1 / nobs1 + 1 / nobs2))
+        stat = (prop1 - prop2) / se_pooled
+        pval = norm.sf(stat)
+
+        se = np.sqrt(prop1 * (1 - prop1) / nobs1 + prop2 * (1 - prop2) / nobs2)
+        margin = np.where(se > 0, norm.ppf(0.975) * se, np.nan)
+        ci_low = prop1 - prop2 - margin
+        ci_high = prop1 - prop2 + margin
+
+    no_conversions = (prop1 == 0) & (prop2 == 0)
+    stat = np.where(no_conversions, 0.0, stat)
+    pval = np.where(no_conversions, 1.0, pval)
+    ci_low = np.where(no_conversions, 0.0, ci_low)
+    ci_high = np.where(no_conversions, 0.0, ci_high)
+    return stat, pval, ci_low, ci_high
+
+
+def chi_square_vectorized(counts, nobs):
+    """
+    Calcula en forma vectorizada la prueba Chi-cuadrado de independencia
+    variante x compra para varios grupos a la vez, equivalente a
+    chi2_contingency sin corrección de continuidad.
+
+    Parámetros:
+    counts (np.ndarray): Matriz grupos x variantes con las conversiones.
+    nobs (np.ndarray): Matriz grupos x variantes con las observaciones. Las
+    variantes con 0 observaciones no se consideran en el grupo.
+
+    Retorna:
+    tuple: Arreglos con el estadístico Chi-cuadrado y el p-valor por grupo.
+    """
+    counts = np.asarray(counts, dtype=float)
+    nobs = np.asarray(nobs, dtype=float)
+    table = np.stack([nobs - counts, counts], axis=-1)
+    row_totals = table.sum(axis=2, keepdims=True)
+    col_totals = table.sum(axis=1, keepdims=True)
+    total = row_totals.sum(axis=1, keepdims=True)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = row_totals * col_totals / total
+        terms = np.where(expected > 0, (table - expected) ** 2 / expected, 0.0)
+    chi2_stat = terms.sum(axis=(1, 2))
+
+    present_rows = (nobs > 0).sum(axis=1)
+    present_cols = (col_totals[:, 0, :] > 0).sum(axis=1)
+    dof = np.clip(present_rows - 1, 0, None) * np.clip(present_cols - 1, 0, None)
+    pval = np.where(dof > 0, chi2.sf(chi2_stat, np.maximum(dof, 1)), 1.0)
+    return chi2_stat, pval
@@ -0,0 +1,219 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from modules.data_processing.data_processor import resolve_time_windows
+
+
+DEFAULT_EXPERIMENTS = {
+    "filters/sort-by-ranking": ["6971", "6972", "7057"],
+    "search/back-filters": ["5059", "5060"],
+    "pdp/view": ["1", "2", "DEFAULT"],
+    "qadb|sa-on-vip": ["DEFAULT", "1"],
+}
+
+DEFAULT_EVENT_SHARES = {
+    "SEARCH": 0.35,
+    "ITEM_PAGE": 0.3,
+    "CHECKOUT_1": 0.1,
+    "BUY": 0.25,
+}
+
+
+def generate_events(
+    n_users=1000,
+    n_events=20000,
+    days=3,
+    start_date=datetime(2021, 8, 1),
+    experiments=None,
+    event_shares=None,
+    n_items=50,
+    contamination_share=0.01,
+    utc_offset="-04:00",
+    seed=0,
+):
+    """
+    Genera eventos sintéticos con el mismo formato del dataset crudo (columnas
+    event_name, item_id, timestamp, site, experiments y user_id), para pruebas de
+    carga y de consistencia sin depender de GCS.
+
+    Cada usuario tiene asignada una variante por experimento; una fracción de los
+    eventos se registra con otra variante para simular usuarios contaminados.
+
+    Args:
+        n_users (int, opcional): Número de usuarios.
+        n_events (int, opcional): Número de eventos.
+        days (int, opcional): Días cubiertos desde start_date.
+        start_date (datetime, opcional): Primer día de los eventos (hora local).
+        experiments (dict, opcional): Variantes por experimento.
+        event_shares (dict, opcional): Proporción de cada tipo de evento.
+        n_items (int, opcional): Número de items distintos.
+        contamination_share (float, opcional): Fracción de eventos con una variante
+        distinta a la asignada al usuario.
+        utc_offset (str, opcional): Desfase horario de los timestamps.
+        seed (int, opcional): Semilla aleatoria.
+
+    Returns:
+        pd.DataFrame: Eventos crudos sintéticos.
+    """
+    rng = np.random.default_rng(seed)
+    experiments = experiments or DEFAULT_EXPERIMENTS
+    event_shares = event_shares or DEFAULT_EVENT_SHARES
+
+    user_ids = rng.integers(100000, 100000 + n_users, n_events)
+    shares = np.array(list(event_shares.values()), dtype=float)
+    event_names = rng.choice(
+        list(event_shares), size=n_events, p=shares / shares.sum()
+    )
+    item_ids = rng.integers(1, n_items + 1, n_events).astype(float)
+    item_ids[event_names == "SEARCH"] = np.nan
+
+    seconds = np.sort(rng.integers(0, days * 86400, n_events))
+    timestamps = pd.Timestamp(start_date) + pd.to_timedelta(seconds, unit="s")
+    milliseconds = rng.integers(0, 1000, n_events)
+    timestamps = (
+        timestamps.strftime("%Y-%m-%d %H:%M:%S.")
+        + pd.Index(milliseconds).astype(str).str.zfill(3)
+        + "000"
+        + utc_offset
+    )
+
+    contaminated = rng.random(n_events) < contamination_share
+    experiment_strings = pd.Series("", index=range(n_events))
+    for position, (experiment_name, variants) in enumerate(experiments.items()):
+        variant_index = (user_ids * (position + 7) + contaminated) % len(variants)
+        separator = ", " if position else ""
+        variant_ids = np.asarray(variants, dtype=object)[variant_index]
+        experiment_strings += separator + experiment_name + "=" + variant_ids
+    experiment_strings = "{" + experiment_strings + "}"
+
+    return pd.DataFrame(
+        {
+            "event_name": event_names,
+            "item_id": item_ids,
+            "timestamp": np.asarray(timestamps),
+            "site": "MLA",
+            "experiments": experiment_strings.to_numpy(),
+            "user_id": user_ids,
+        }
+    )
+
+
+def shifted_events(anchors, minutes, event_name, item_ids=None, utc_offset="-04:00"):
+    """
+    Crea eventos a partir de eventos ancla (mismo usuario y experimentos),
+    desplazados una cantidad de minutos.
+
+    Args:
+        anchors (pd.DataFrame): Eventos ancla.
+        minutes (float): Minutos desde el timestamp de cada ancla.
+        event_name (str): Nombre de los eventos creados.
+        item_ids (array-like, opcional): Items de los eventos. Por defecto los de
+        las anclas.
+        utc_offset (str, opcional): Desfase horario de los timestamps.
+
+    Returns:
+        pd.DataFrame: Eventos creados con el formato del dataset crudo.
+    """
+    local_times = pd.to_datetime(anchors["timestamp"].str.slice(0, 26))
+    timestamps = local_times + pd.to_timedelta(minutes, unit="m")
+    events = anchors.copy()
+    events["event_name"] = event_name
+    events["timestamp"] = (
+        timestamps.dt.strftime("%Y-%m-%d %H:%M:%S.%f") + utc_offset
+    ).to_numpy()
+    if item_ids is not None:
+        events["item_id"] = item_ids
+    return events
+
+
+def generate_edge_case_events(
+    n_users=150,
+    n_events=2000,
+    days=2,
+    start_date=datetime(2021, 8, 1),
+    time_windows=None,
+    n_cases=30,
+    utc_offset="-04:00",
+    seed=0,
+):
+    """
+    Genera eventos sintéticos con los casos límite de la atribución, para
+    comparar implementaciones del etiquetado:
+
+    - Búsquedas con una compra exactamente al final de su ventana y 1 ms después.
+    - Eventos de producto con la compra del mismo item exactamente al final de
+      su ventana y 1 ms después.
+    - Compras repetidas del mismo item y de otro item dentro de la ventana.
+    - Compras con el mismo timestamp que el evento.
+    - Eventos al final del día con la compra al día siguiente.
+    - Un experimento con una sola variante y variantes DEFAULT.
+
+    Los eventos se devuelven en orden aleatorio.
+
+    Args:
+        n_users (int, opcional): Número de usuarios.
+        n_events (int, opcional): Número de eventos base.
+        days (int, opcional): Días cubiertos desde start_date.
+        start_date (datetime, opcional): Primer día de los eventos (hora local).
+        time_windows (dict, opcional): Ventanas de atribución de los casos límite.
+        n_cases (int, opcional): Eventos de cada caso límite.
+        utc_offset (str, opcional): Desfase horario de los timestamps.
+        seed (int, opcional): Semilla aleatoria.
+
+    Returns:
+        pd.DataFrame: Eventos crudos sintéticos.
+    """
+    rng = np.random.default_rng(seed)
+    windows = resolve_time_windows(time_windows)
+    search_window = windows["SEARCH"]
+    product_window = windows.get("ITEM_PAGE", windows["default"])
+    experiments = dict(DEFAULT_EXPERIMENTS, **{"solo/one": ["9"]})
+    data = generate_events(
+        n_users=n_users,
+        n_events=n_events,
+        days=days,
+        start_date=start_date,
+        experiments=experiments,
+        n_items=20,
+        utc_offset=utc_offset,
+        seed=seed,
+    )
+
+    anchors = data[data["event_name"] != "BUY"]
+    n_cases = min(n_cases, len(anchors) // 6)
+    anchors = anchors.iloc[rng.permutation(len(anchors))[: n_cases * 6]]
+    cases = [anchors[i * n_cases : (i + 1) * n_cases] for i in range(6)]
+    other_items = rng.integers(1, 21, n_cases).astype(float)
+    one_ms = 1 / 60000
+
+    edge_events = [
+        # Búsqueda con compra en el límite de la ventana y 1 ms después.
+        shifted_events(cases[0], 0, "SEARCH", np.nan, utc_offset),
+        shifted_events(cases[0], search_window, "BUY", other_items, utc_offset),
+        shifted_events(cases[1], 0, "SEARCH", np.nan, utc_offset),
+        shifted_events(cases[1], search_window + one_ms, "BUY", other_items, utc_offset),
+        # Producto con compra del mismo item en el límite y 1 ms después.
+        shifted_events(cases[2], 0, "ITEM_PAGE", other_items, utc_offset),
+        shifted_events(cases[2], product_window, "BUY", other_items, utc_offset),
+        shifted_events(cases[3], 0, "ITEM_PAGE", other_items, utc_offset),
+        shifted_events(
+            cases[3], product_window + one_ms, "BUY", other_items, utc_offset
+        ),
+        # Compras repetidas del mismo item y de otro item, y compra simultánea.
+        shifted_events(cases[4], 0, "CHECKOUT_1", other_items, utc_offset),
+        shifted_events(cases[4], 0, "BUY", other_items, utc_offset),
+        shifted_events(cases[4], 1, "BUY", other_items, utc_offset),
+        shifted_events(cases[4], 2, "BUY", other_items % 20 + 1, utc_offset),
+    ]
+
+    # Eventos al final del primer día con la compra al día siguiente.
+    end_of_day = start_date + timedelta(days=1) - timedelta(milliseconds=1)
+    late = cases[5].copy()
+    late["timestamp"] = end_of_day.strftime("%Y-%m-%d %H:%M:%S.%f") + utc_offset
+    edge_events.append(shifted_events(late, 0, "ITEM_PAGE", other_items, utc_offset))
+    edge_events.append(shifted_events(late, 30, "BUY", other_items, utc_offset))
+
+    data = pd.concat([data] + edge_events, ignore_index=True)
+    return data.iloc[rng.permutation(len(data))].reset_index(drop=True)
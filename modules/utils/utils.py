@@ -1,22 +1,136 @@
+import json
+import math
+
 import numpy as np
 
 def convert_to_serializable(obj):
     """
     Recursively converts non-serializable objects (e.g., numpy types) to serializable types.
 
+    Non finite floats (NaN, inf) are converted to None so the result is valid JSON.
+
     Args:
         obj: The object to be converted.
 
     Returns:
         The converted object.
     """
-    if isinstance(obj, np.float64):
-        return float(obj)
-    elif isinstance(obj, np.bool_):
-        return bool(obj)
-    elif isinstance(obj, list):
+    if isinstance(obj, float):
+        return float(obj) if math.isfinite(obj) else None
+    elif isinstance(obj, np.generic):
+        return convert_to_serializable(obj.item())
+    elif isinstance(obj, np.ndarray):
+        return convert_to_serializable(obj.tolist())
+    elif isinstance(obj, (list, tuple)):
         return [convert_to_serializable(item) for item in obj]
     elif isinstance(obj, dict):
         return {key: convert_to_serializable(value) for key, value in obj.items()}
     else:
         return obj
+
+
+def json_default(obj):
+    """
+    Fallback used by json.dumps for NumPy scalars and arrays.
+
+    Args:
+        obj: The object that the standard encoder could not serialize.
+
+    Returns:
+        The equivalent native Python object.
+
+    Raises:
+        TypeError: If the object is not a NumPy type.
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def records_without_nan(frame):
+    """
+    Converts a DataFrame to a list of records with missing values (NaN) as None.
+
+    Result tables (segments, portfolio health) are normalized once here, so
+    dumps_json encodes them on the first try instead of falling back to
+    convert_to_serializable.
+
+    Args:
+        frame (pd.DataFrame): The table to be converted.
+
+    Returns:
+        list: One dict per row.
+    """
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+
+
+def without_nan(mapping):
+    """
+    Replaces NaN float values of a dict (and of its nested dicts) with None.
+
+    Args:
+        mapping (dict): Statistical test results.
+
+    Returns:
+        dict: The same results with NaN as None.
+    """
+    return {
+        key: without_nan(value)
+        if isinstance(value, dict)
+        else None
+        if isinstance(value, float) and math.isnan(value)
+        else value
+        for key, value in mapping.items()
+    }
+
+
+def dumps_json(obj, default=json_default, **kwargs):
+    """
+    Serializes an object to JSON using the C encoder directly.
+
+    NumPy floats and tuples are handled natively by the encoder and the rest of
+    NumPy types through `default`, so no recursive Python pass is needed. Result
+    tables and tests are normalized with records_without_nan and without_nan
+    before reaching this point; the fallback to convert_to_serializable is only
+    a guard so a stray NaN is returned as null instead of invalid JSON.
+
+    Args:
+        obj: The object to be serialized.
+        default (callable, optional): Fallback for non native types.
+        **kwargs: Extra arguments passed to json.dumps.
+
+    Returns:
+        str: The JSON document.
+    """
+    kwargs.setdefault("sort_keys", True)
+    try:
+        return json.dumps(obj, default=default, allow_nan=False, **kwargs)
+    except ValueError:
+        return json.dumps(
+            convert_to_serializable(obj), default=default, allow_nan=False, **kwargs
+        )
+
+
+def parse_time_windows(value):
+    """
+    Parses an attribution windows string such as "SEARCH:210,default:81".
+
+    Args:
+        value (str): Comma separated list of event_name:minutes pairs.
+
+    Returns:
+        dict: Attribution window in minutes by event name.
+
+    Raises:
+        ValueError: If a pair is malformed or minutes is not a positive finite number.
+    """
+    time_windows = {}
+    for pair in value.split(","):
+        event_name, _, minutes = pair.partition(":")
+        minutes = float(minutes)
+        if not event_name.strip() or not math.isfinite(minutes) or minutes <= 0:
+            raise ValueError(f"Invalid time window: {pair}")
+        time_windows[event_name.strip()] = minutes
+    return time_windows